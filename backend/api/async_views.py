@@ -0,0 +1,256 @@
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from rest_framework import status
+from rest_framework.authentication import (TokenAuthentication,
+                                           get_authorization_header)
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.routers import DefaultRouter
+
+from api.connections import check_thread_connections
+from api.utils import (get_not_modified_response, get_recipe_etag,
+                       set_validators)
+from foodgram.settings import ASYNC_USER_FLAGS, ASYNC_VIEW_WORKERS
+from recipe.models import Favorit, ShoppingCartUser
+from user.models import Subscription
+
+# Маршруты (basename-действие) читающих эндпоинтов, которые под ASGI
+# обслуживаются асинхронно.
+ASYNC_ROUTES = frozenset((
+    'recipes-list',
+    'recipes-detail',
+    'tags-list',
+    'tags-detail',
+    'ingridients-list',
+    'ingridients-detail',
+    'user-subscriptions',
+))
+# Маршруты рецептов, флаги пользователя которых запрашиваются
+# одновременно с представлением (см. async_view).
+USER_FLAG_ROUTES = frozenset(('recipes-list', 'recipes-detail'))
+# Флаги пользователя в представлении рецепта: (модель, поле пользователя,
+# путь к рецепту, поле объекта). Флаг подписки относится к автору рецепта.
+USER_FLAGS = {
+    'is_favorited': (Favorit, 'favoriter', 'recipe', 'recipe_id'),
+    'is_in_shopping_cart': (ShoppingCartUser, 'owner', 'recipe', 'recipe_id'),
+    'is_subscribed': (Subscription, 'user', 'author__recipes', 'author_id'),
+}
+
+# Флаги пользователя запрашиваются отдельно от представления: RecipeViewSet
+# не аннотирует ими queryset, а в представлении они равны False.
+defer_user_flags = ContextVar('defer_user_flags', default=False)
+
+_executor = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=ASYNC_VIEW_WORKERS, thread_name_prefix='api-read'
+        )
+    return _executor
+
+
+def run_in_thread(func, *args, **kwargs):
+    """
+    Выполняет func в потоке пула.
+    Сигналы request_started и request_finished обрабатываются в другом
+    потоке, поэтому соединения с БД потока пула проверяются перед
+    вызовом и закрываются по истечении CONN_MAX_AGE после него здесь.
+    """
+    check_thread_connections()
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def in_pool(func, *args, **kwargs):
+    """
+    Выполняет func в пуле из ASYNC_VIEW_WORKERS потоков. Переменные
+    контекста (счётчик запросов PerformanceMiddleware, выбор реплики)
+    передаются в поток пула.
+    """
+    return await sync_to_async(
+        run_in_thread, thread_sensitive=False, executor=get_executor()
+    )(func, *args, **kwargs)
+
+
+def render_response(request, response):
+    """
+    Рендерит ответ в потоке пула, чтобы сериализация не занимала общий
+    поток Django.
+    """
+    if hasattr(response, 'render') and not response.is_rendered:
+        request.render_started = time.perf_counter()
+        response.render()
+    return response
+
+
+def run_view(view, request, *args, **kwargs):
+    return render_response(request, view(request, *args, **kwargs))
+
+
+def get_token_key(request):
+    """ Ключ токена из заголовка Authorization или None."""
+    auth = get_authorization_header(request).split()
+    keyword = TokenAuthentication.keyword.lower().encode()
+    if len(auth) != 2 or auth[0].lower() != keyword:
+        return None
+    try:
+        return auth[1].decode()
+    except UnicodeError:
+        return None
+
+
+def get_user_flag_ids(flag: str, token_key: str, recipe_ids) -> frozenset:
+    """
+    id объектов флага flag пользователя с токеном token_key среди
+    рецептов recipe_ids: рецептов в избранном или в списке покупок,
+    авторов этих рецептов в подписках.
+    Пользователь определяется по токену в том же запросе, поэтому
+    поиск не ждёт аутентификации в представлении.
+    """
+    model, user_field, recipe_lookup, target_field = USER_FLAGS[flag]
+    return frozenset(model.objects.filter(**{
+        f'{user_field}__auth_token__key': token_key,
+        f'{recipe_lookup}__in': recipe_ids,
+    }).values_list(target_field, flat=True))
+
+
+def get_user_flags(token_key: str, recipe_ids) -> list:
+    """
+    Запросы флагов пользователя для рецептов recipe_ids, выполняемые
+    одновременно в потоках пула.
+    """
+    return [
+        in_pool(get_user_flag_ids, flag, token_key, recipe_ids)
+        for flag in USER_FLAGS
+    ]
+
+
+def set_user_flags(data: dict, flag_ids: dict) -> None:
+    """
+    Заполняет флаги пользователя в представлении рецепта или страницы
+    рецептов по id из get_user_flag_ids.
+    """
+    for recipe in data.get('results', [data]):
+        recipe['is_favorited'] = recipe['id'] in flag_ids['is_favorited']
+        recipe['is_in_shopping_cart'] = (
+            recipe['id'] in flag_ids['is_in_shopping_cart']
+        )
+        recipe['author']['is_subscribed'] = (
+            recipe['author']['id'] in flag_ids['is_subscribed']
+        )
+
+
+def set_recipe_validators(request, response):
+    """
+    Добавляет ETag и заголовки кэширования в ответ представления рецепта,
+    полученного без флагов пользователя (RecipeViewSet.retrieve), после
+    подстановки флагов и проверяет по ним условный запрос.
+    Returns:
+        Ответ 304, если у клиента актуальная версия, иначе response.
+    """
+    version, validators = response.recipe_validators
+    data = response.data
+    etag = get_recipe_etag(data['id'], version, (
+        data['is_favorited'], data['is_in_shopping_cart'],
+        data['author']['is_subscribed']
+    ))
+    not_modified = get_not_modified_response(request, etag, **validators)
+    if not_modified is not None:
+        return not_modified
+    return set_validators(response, etag, **validators)
+
+
+def async_view(view, user_flags: bool = False):
+    """Асинхронная версия представления для ASGI.
+
+    Django 3.2 без асинхронного ORM и DRF без асинхронных представлений
+    выполняют синхронное представление под ASGI в единственном общем
+    потоке. Безопасные запросы (GET, HEAD, OPTIONS) выполняются в пуле
+    из ASYNC_VIEW_WORKERS потоков (in_pool), и цикл событий обслуживает
+    другие запросы, пока поток ждёт БД.
+    С user_flags флаги пользователя с токеном (избранное, список покупок,
+    подписка на автора) запрашиваются тремя одновременными запросами только
+    для рецептов ответа и подставляются в него. Флаги рецепта (его id есть
+    в адресе) запрашиваются одновременно с представлением, флаги страницы
+    рецептов — после него. ETag рецепта строится и условный запрос
+    проверяется по полученным флагам (set_recipe_validators).
+    Изменяющие запросы выполняются, как обычно в Django, в общем потоке.
+
+    Args:
+        view (Callable): Представление DRF (ViewSet.as_view()).
+        user_flags (bool): Представление отдаёт рецепт или страницу
+            рецептов (USER_FLAG_ROUTES).
+
+    Returns:
+        Callable: Асинхронное представление с атрибутами исходного
+            (actions, initkwargs, csrf_exempt).
+    """
+    thread_sensitive_view = sync_to_async(view, thread_sensitive=True)
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return await thread_sensitive_view(request, *args, **kwargs)
+        token_key = (
+            get_token_key(request)
+            if user_flags and request.method != 'OPTIONS' else None
+        )
+        if token_key is None:
+            return await in_pool(run_view, view, request, *args, **kwargs)
+        recipe_id = str(kwargs.get('pk', ''))
+        deferred = defer_user_flags.set(True)
+        try:
+            if recipe_id.isdigit():
+                response, *flag_ids = await asyncio.gather(
+                    in_pool(view, request, *args, **kwargs),
+                    *get_user_flags(token_key, [int(recipe_id)])
+                )
+            else:
+                response = await in_pool(view, request, *args, **kwargs)
+                flag_ids = None
+        finally:
+            defer_user_flags.reset(deferred)
+        if response.status_code != status.HTTP_200_OK:
+            return await in_pool(render_response, request, response)
+        if flag_ids is None:
+            recipe_ids = [
+                recipe['id']
+                for recipe in response.data.get('results', [response.data])
+            ]
+            flag_ids = await asyncio.gather(
+                *get_user_flags(token_key, recipe_ids)
+            )
+        set_user_flags(response.data, dict(zip(USER_FLAGS, flag_ids)))
+        if hasattr(response, 'recipe_validators'):
+            response = set_recipe_validators(request, response)
+        return await in_pool(render_response, request, response)
+
+    return wrapper
+
+
+class AsyncReadRouter(DefaultRouter):
+    """
+    Роутер, заменяющий представления маршрутов ASYNC_ROUTES их
+    асинхронными версиями (async_view).
+    """
+
+    def get_urls(self):
+        urls = super().get_urls()
+        for url in urls:
+            if url.name in ASYNC_ROUTES:
+                url.callback = async_view(
+                    url.callback,
+                    ASYNC_USER_FLAGS and url.name in USER_FLAG_ROUTES
+                )
+        return urls
@@ -0,0 +1,57 @@
+from django.core.cache import cache
+from django.utils import timezone
+
+from foodgram.settings import RECIPE_CACHE_TIMEOUT
+from recipe.models import Recipe
+
+
+def recipe_version(recipe: Recipe) -> int:
+    """
+    Версия представления рецепта — дата его изменения (updated_at)
+    в микросекундах. Версия хранится в БД, поэтому одинакова для всех
+    процессов и не теряется при очистке кэша. Изменения тэгов,
+    ингредиентов и авторов, входящих в представление рецепта, меняют
+    updated_at связанных рецептов (touch_recipes).
+    """
+    return int(recipe.updated_at.timestamp() * 10 ** 6)
+
+
+def recipe_cache_key(recipe: Recipe) -> str:
+    return f'recipe:{recipe.id}:{recipe_version(recipe)}'
+
+
+def touch_recipes(**filters) -> None:
+    """
+    Обновляет дату изменения рецептов, отобранных по filters, одним
+    запросом, чтобы сменить версию их представлений.
+    """
+    Recipe.objects.filter(**filters).update(updated_at=timezone.now())
+
+
+def get_recipe_data(recipe: Recipe):
+    """ Получает из кэша представление рецепта или None."""
+    return cache.get(recipe_cache_key(recipe))
+
+
+def get_recipes_data(recipes) -> dict:
+    """
+    Получает из кэша представления рецептов одним обращением.
+    Returns:
+        dict: {id рецепта: представление} для найденных в кэше рецептов.
+    """
+    keys = {recipe_cache_key(recipe): recipe.id for recipe in recipes}
+    cached = cache.get_many(keys)
+    return {keys[key]: data for key, data in cached.items()}
+
+
+def set_recipes_data(recipes_data: dict) -> None:
+    """ Сохраняет в кэш представления рецептов {рецепт: данные}."""
+    if not recipes_data:
+        return
+    cache.set_many(
+        {
+            recipe_cache_key(recipe): data
+            for recipe, data in recipes_data.items()
+        },
+        timeout=RECIPE_CACHE_TIMEOUT
+    )
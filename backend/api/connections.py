@@ -0,0 +1,86 @@
+import os
+import threading
+from collections import Counter
+
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+class ConnectionStats:
+    """
+    Статистика соединений с БД процесса: колличество обработанных
+    запросов и открытых соединений по каждой БД. Доля запросов,
+    обслуженных без открытия нового соединения, показывает, насколько
+    работает переиспользование соединений (CONN_MAX_AGE).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.created = Counter()
+        self.health_check_failures = Counter()
+
+    def report(self) -> dict:
+        with self.lock:
+            requests = self.requests
+            created = dict(self.created)
+            failures = dict(self.health_check_failures)
+        return {
+            'pid': os.getpid(),
+            'requests': requests,
+            'databases': {
+                alias: {
+                    'conn_max_age': connections[alias].settings_dict[
+                        'CONN_MAX_AGE'
+                    ],
+                    'connections_created': created.get(alias, 0),
+                    'health_check_failures': failures.get(alias, 0),
+                    'reuse_rate': (
+                        max(round(1 - created.get(alias, 0) / requests, 4), 0)
+                        if requests else None
+                    ),
+                }
+                for alias in connections
+            },
+        }
+
+
+connection_stats = ConnectionStats()
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    with connection_stats.lock:
+        connection_stats.created[connection.alias] += 1
+
+
+@receiver(request_started)
+def check_connections(sender, **kwargs):
+    """
+    Проверка постоянных соединений перед запросом (CONN_HEALTH_CHECKS в
+    настройках БД, как в Django 4.1+): соединение, разорванное сервером
+    БД за время простоя, закрывается, и запрос открывает новое, а не
+    завершается ошибкой.
+    """
+    with connection_stats.lock:
+        connection_stats.requests += 1
+    check_thread_connections()
+
+
+def check_thread_connections() -> None:
+    """
+    Закрывает разорванные постоянные соединения текущего потока
+    (соединения Django у каждого потока свои).
+    """
+    for connection in connections.all():
+        if (
+            connection.connection is None
+            or not connection.settings_dict.get('CONN_HEALTH_CHECKS')
+            or connection.is_usable()
+        ):
+            continue
+        with connection_stats.lock:
+            connection_stats.health_check_failures[connection.alias] += 1
+        connection.close()
@@ -0,0 +1,31 @@
+import random
+from contextvars import ContextVar
+
+from foodgram.settings import DATABASE_REPLICAS
+
+# Читать ли в текущем запросе из реплик. Устанавливается
+# ReplicaRoutingMiddleware; вне запросов (команды, потоки обработки
+# изображений) чтение идёт из основной БД.
+use_replica = ContextVar('use_replica', default=False)
+
+
+class ReplicaRouter:
+    """
+    Роутер БД: запись и миграции — в основную БД (default), чтение в
+    безопасных запросах к API (GET, HEAD, OPTIONS) — из случайной реплики
+    из DATABASE_REPLICAS.
+    """
+
+    def db_for_read(self, model, **hints):
+        if DATABASE_REPLICAS and use_replica.get():
+            return random.choice(DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
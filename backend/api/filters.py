@@ -1,6 +1,6 @@
 from django_filters import FilterSet, NumberFilter, filters
-from rest_framework import filters as f
 
+from api.search import search_recipes
 from recipe.models import Recipe
 
 
@@ -8,6 +8,16 @@ class CharFilter(filters.BaseInFilter, filters.CharFilter):
     pass
 
 
+RECIPE_ORDERINGS = {
+    'popular': ('-popular_score', '-id'),
+    'trending': ('-trending_score', '-id'),
+}
+RECIPE_ORDERING_CHOICES = (
+    ('popular', 'Популярные'),
+    ('trending', 'Популярные за последнее время'),
+)
+
+
 class RecipeFilter(FilterSet):
     """
     Кастомный фильтр фильтрует Queryset на основе query_params:
@@ -20,6 +30,15 @@ class RecipeFilter(FilterSet):
                 у текущего пользователя
             is_in_shopping_cart - рецепты, находящихся в корзине
                 текущего пользователя
+
+        Поиск:
+            search - полнотекстовый поиск по названию и описанию,
+                результаты сортируются по релевантности
+
+        Сортировка:
+            ordering=popular - по популярности за всё время
+            ordering=trending - по популярности за последнее время
+            Популярность рассчитывается командой update_recipe_scores.
     """
 
     tags = CharFilter(field_name='tags__slug', lookup_expr='in')
@@ -27,6 +46,11 @@ class RecipeFilter(FilterSet):
                                 method='filter_favorited')
     is_in_shopping_cart = NumberFilter(field_name='in_shopping_cart',
                                        method='filter_in_shopping_cart')
+    # Поиск объявлен до сортировки: сортировка, если она передана,
+    # заменяет сортировку по релевантности.
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(choices=RECIPE_ORDERING_CHOICES,
+                                    method='filter_ordering')
 
     def filter_favorited(self, queryset, name, value):
         """
@@ -48,11 +72,22 @@ class RecipeFilter(FilterSet):
             return queryset.filter(in_shopping_cart__owner=self.request.user)
         return queryset
 
+    def filter_search(self, queryset, name, value):
+        """
+        Полнотекстовый поиск по индексу: в PostgreSQL — по столбцу
+        search_vector (GIN, русская морфология), в SQLite — по таблице
+        FTS5. Найденные рецепты сортируются по релевантности.
+        """
+        return search_recipes(queryset, value)
+
+    def filter_ordering(self, queryset, name, value):
+        """
+        Сортирует рецепты по предрассчитанной популярности. Для каждой
+        сортировки есть индекс (score, id), поэтому страница выбирается
+        по индексу, без агрегации избранного и корзин.
+        """
+        return queryset.order_by(*RECIPE_ORDERINGS[value])
+
     class Meta:
         model = Recipe
         fields = ['author', 'tags', 'favorited', 'in_shopping_cart']
-
-
-class IngredientFilter(f.SearchFilter):
-    """ Фильтр ингредиентов. """
-    search_param = 'name'
@@ -0,0 +1,231 @@
+import hashlib
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from foodgram.settings import (IMAGE_VARIANT_FORMATS, IMAGE_VARIANT_QUALITY,
+                               IMAGE_VARIANTS, IMAGE_VARIANTS_DIR,
+                               IMAGE_WORKERS)
+from recipe.models import ImageFile, Recipe
+
+logger = logging.getLogger(__name__)
+
+# Формат файла варианта: (формат Pillow, расширение файла).
+FORMATS = {
+    'webp': ('WEBP', 'webp'),
+    'jpeg': ('JPEG', 'jpg'),
+}
+# Колличество знаков хэша содержимого в именах файлов вариантов.
+DIGEST_LENGTH = 16
+# Имя файла ContentAddressedStorage: sha256 содержимого.
+CONTENT_ADDRESSED_NAME = re.compile(r'[0-9a-f]{64}')
+
+_executor = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=IMAGE_WORKERS, thread_name_prefix='recipe-images'
+        )
+    return _executor
+
+
+def content_digest(content: bytes) -> str:
+    """ Хэш содержимого изображения для имён файлов его вариантов."""
+    return hashlib.sha256(content).hexdigest()[:DIGEST_LENGTH]
+
+
+def name_digest(name: str):
+    """
+    Хэш содержимого изображения из имени файла ContentAddressedStorage
+    (как content_digest, но без чтения файла) или None для файлов,
+    загруженных до хранения по хэшу.
+    """
+    stem = os.path.splitext(os.path.basename(name))[0]
+    if CONTENT_ADDRESSED_NAME.fullmatch(stem):
+        return stem[:DIGEST_LENGTH]
+    return None
+
+
+def variant_name(digest: str, size_name: str, image_format: str) -> str:
+    return (
+        f'{IMAGE_VARIANTS_DIR}{digest}_{size_name}.'
+        f'{FORMATS[image_format][1]}'
+    )
+
+
+def build_variants(source) -> dict:
+    """Создаёт варианты изображения всех размеров IMAGE_VARIANTS во всех
+    форматах IMAGE_VARIANT_FORMATS.
+
+    Имена файлов содержат хэш содержимого исходного изображения, поэтому
+    уже созданные варианты не пересоздаются, а nginx может отдавать их с
+    неограниченным сроком кэширования.
+
+    Args:
+        source (File): Исходное изображение.
+
+    Returns:
+        dict: Пути вариантов в хранилище {размер: {формат: путь}}.
+    """
+    content = source.read()
+    digest = content_digest(content)
+    image = ImageOps.exif_transpose(Image.open(BytesIO(content)))
+    image = image.convert('RGB')
+    variants = {}
+    for size_name, size in IMAGE_VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail((size, size))
+        variants[size_name] = {}
+        for image_format in IMAGE_VARIANT_FORMATS:
+            name = variant_name(digest, size_name, image_format)
+            if not default_storage.exists(name):
+                buffer = BytesIO()
+                resized.save(buffer, FORMATS[image_format][0],
+                             quality=IMAGE_VARIANT_QUALITY, optimize=True)
+                name = default_storage.save(
+                    name, ContentFile(buffer.getvalue())
+                )
+            variants[size_name][image_format] = name
+    return variants
+
+
+def process_recipe_image(recipe_id: int, image_name: str) -> None:
+    """
+    Создаёт варианты изображения рецепта и сохраняет их пути в
+    Recipe.image_variants вместе с именем исходного файла (source).
+    Если изображение рецепта за время обработки было заменено,
+    результат не сохраняется.
+    """
+    try:
+        with default_storage.open(image_name) as source:
+            variants = build_variants(source)
+        variants['source'] = image_name
+        Recipe.objects.filter(
+            id=recipe_id, image=image_name
+        ).update(image_variants=variants, updated_at=timezone.now())
+    except Exception:
+        logger.exception('Failed to process image %s of recipe %s',
+                         image_name, recipe_id)
+
+
+def process_in_worker(recipe_id: int, image_name: str) -> None:
+    """
+    Обработка изображения в потоке пула: по окончании закрывает
+    соединения с БД, открытые в этом потоке.
+    """
+    try:
+        process_recipe_image(recipe_id, image_name)
+    finally:
+        connections.close_all()
+
+
+def schedule_recipe_image(recipe: Recipe) -> None:
+    """
+    Ставит обработку изображения рецепта в пул потоков после фиксации
+    транзакции, чтобы декодирование и сжатие не задерживали ответ.
+    При IMAGE_WORKERS = 0 обработка выполняется сразу после фиксации.
+    """
+    if not recipe.image:
+        return
+    recipe_id, image_name = recipe.id, recipe.image.name
+    if IMAGE_WORKERS:
+        transaction.on_commit(lambda: get_executor().submit(
+            process_in_worker, recipe_id, image_name
+        ))
+    else:
+        transaction.on_commit(
+            lambda: process_recipe_image(recipe_id, image_name)
+        )
+
+
+def change_image_references(name: str, delta: int) -> None:
+    """
+    Изменяет на delta колличество рецептов, ссылающихся на файл
+    изображения name (ImageFile.references).
+    Запись файла блокируется (select_for_update) так же, как при
+    удалении командой collect_images: изменение ссылок ждёт окончания
+    удаления и не теряется, а удаление перепроверяет колличество ссылок
+    после изменения.
+    """
+    if not name:
+        return
+    with transaction.atomic():
+        image = ImageFile.objects.select_for_update().filter(
+            name=name
+        ).first()
+        if image is None:
+            ImageFile.objects.bulk_create([ImageFile(name=name)],
+                                          ignore_conflicts=True)
+            image = ImageFile.objects.select_for_update().get(name=name)
+        ImageFile.objects.filter(pk=image.pk).update(
+            references=F('references') + delta, updated=timezone.now()
+        )
+
+
+def delete_image_files(name: str) -> None:
+    """
+    Удаляет файл изображения рецепта из хранилища вместе с файлами
+    его вариантов. Хэш для имён вариантов берётся из имени файла, и файл
+    читается только, если он загружен до хранения по хэшу.
+    """
+    storage = Recipe._meta.get_field('image').storage
+    digest = name_digest(name)
+    if digest is None:
+        if not storage.exists(name):
+            return
+        with storage.open(name) as source:
+            digest = content_digest(source.read())
+    for size_name in IMAGE_VARIANTS:
+        for image_format in FORMATS:
+            default_storage.delete(
+                variant_name(digest, size_name, image_format)
+            )
+    storage.delete(name)
+
+
+def get_srcset(recipe: Recipe) -> dict:
+    """Возвращает ссылки на варианты изображения рецепта.
+
+    Args:
+        recipe (Recipe): Рецепт.
+
+    Returns:
+        dict: Относительные ссылки {размер: {формат: url}} или None,
+            если варианты текущего изображения ещё не созданы.
+    """
+    variants = recipe.image_variants
+    if not variants or variants.get('source') != recipe.image.name:
+        return None
+    return {
+        size_name: {
+            image_format: default_storage.url(name)
+            for image_format, name in variants[size_name].items()
+        }
+        for size_name in IMAGE_VARIANTS
+        if size_name in variants
+    }
+
+
+def absolute_srcset(srcset: dict, request) -> dict:
+    """ Делает ссылки на варианты изображения абсолютными для запроса."""
+    if srcset is None or request is None:
+        return srcset
+    return {
+        size_name: {
+            image_format: request.build_absolute_uri(url)
+            for image_format, url in urls.items()
+        }
+        for size_name, urls in srcset.items()
+    }
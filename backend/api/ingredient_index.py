@@ -0,0 +1,98 @@
+import time
+from bisect import bisect_left
+
+from foodgram.settings import INGREDIENT_INDEX_TIMEOUT
+from recipe.models import Ingredient
+
+
+def normalize(name: str) -> str:
+    """ Приводит название к виду для поиска: без регистра, ё -> е."""
+    return name.strip().lower().replace('ё', 'е')
+
+
+class IngredientIndex:
+    """
+    Индекс ингредиентов в памяти процесса для поиска по началу названия.
+    Ингредиенты хранятся отсортированными по нормализованному названию,
+    поэтому все совпадения с префиксом идут подряд и находятся бинарным
+    поиском без обращения к БД.
+
+    Индекс строится при первом поиске, сбрасывается сигналами сохранения и
+    удаления Ingredient и перестраивается не реже, чем раз в
+    INGREDIENT_INDEX_TIMEOUT секунд, чтобы подхватить изменения,
+    сделанные в других процессах (например, командой загрузки).
+    Вместе с индексом запоминается версия ингредиентов, из которых он
+    построен (как api.utils.get_catalog_version): ETag ответов из индекса
+    соответствует их содержимому и не требует запроса к БД.
+    """
+
+    def __init__(self):
+        self._index = None
+
+    def build(self) -> tuple:
+        ingredients = sorted(
+            Ingredient.objects.values(
+                'id', 'name', 'measurement_unit', 'updated_at'
+            ),
+            key=lambda ingredient: (normalize(ingredient['name']),
+                                    ingredient['id'])
+        )
+        updated_at = max(
+            (ingredient.pop('updated_at') for ingredient in ingredients),
+            default=None
+        )
+        version = (len(ingredients), (
+            int(updated_at.timestamp() * 10 ** 6) if updated_at else 0
+        ))
+        keys = [normalize(ingredient['name']) for ingredient in ingredients]
+        by_id = {ingredient['id']: ingredient for ingredient in ingredients}
+        self._index = (keys, ingredients, by_id, version, time.monotonic())
+        return self._index
+
+    def invalidate(self) -> None:
+        self._index = None
+
+    def get_index(self) -> tuple:
+        index = self._index
+        if (
+            index is None
+            or time.monotonic() - index[-1] > INGREDIENT_INDEX_TIMEOUT
+        ):
+            index = self.build()
+        return index
+
+    def version(self) -> tuple:
+        """
+        Версия ингредиентов индекса: (колличество, время последнего
+        изменения в микросекундах).
+        """
+        return self.get_index()[3]
+
+    def get(self, ingredient_id: int):
+        """ Ингредиент (id, name, measurement_unit) по id или None."""
+        return self.get_index()[2].get(ingredient_id)
+
+    def search(self, prefix: str = '', limit: int = None) -> list:
+        """Ищет ингредиенты, название которых начинается с prefix.
+
+        Args:
+            prefix (str): Начало названия, регистр и ё/е не учитываются.
+            limit (int): Максимальное колличество результатов.
+
+        Returns:
+            list: Ингредиенты (id, name, measurement_unit) в алфавитном
+                порядке.
+        """
+        keys, ingredients, *_ = self.get_index()
+        prefix = normalize(prefix)
+        results = []
+        for position in range(bisect_left(keys, prefix), len(keys)):
+            if not keys[position].startswith(prefix):
+                break
+            if limit is not None and len(results) >= limit:
+                break
+            results.append(ingredients[position])
+        return results
+
+
+ingredient_index = IngredientIndex()
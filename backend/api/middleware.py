@@ -0,0 +1,325 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework.permissions import SAFE_METHODS
+
+from api.db_router import use_replica
+from foodgram.settings import DATABASE_REPLICAS, REPLICA_PIN_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# Счётчик SQL запросов текущего запроса к API. Переменная контекста, а не
+# потока: под ASGI запрос выполняется в нескольких потоках (см.
+# api.async_views), и контекст передаётся в каждый из них.
+query_counter = ContextVar('query_counter', default=None)
+
+
+class PerformanceBudgetExceeded(Exception):
+    """ Запрос к API превысил бюджет из API_PERFORMANCE_BUDGETS."""
+
+
+class QueryCounter:
+    """
+    Обёртка выполнения SQL запросов (connection.execute_wrapper),
+    считающая колличество запросов и суммарное время их выполнения.
+    Под ASGI запросы одного запроса к API выполняются одновременно в
+    нескольких потоках (api.async_views), поэтому счётчик под блокировкой.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            with self.lock:
+                self.duration += duration
+                self.count += 1
+
+
+def count_query(execute, sql, params, many, context):
+    """ Передаёт SQL запрос счётчику текущего запроса API, если он есть."""
+    counter = query_counter.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    return counter(execute, sql, params, many, context)
+
+
+def install_query_counter(connection) -> None:
+    """
+    Добавляет count_query в обёртки выполнения запросов соединения.
+    Обёртка ставится первой: connection.execute_wrapper() снимает
+    последнюю добавленную обёртку.
+    """
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, count_query)
+
+
+@receiver(connection_created)
+def count_connection_queries(sender, connection, **kwargs):
+    install_query_counter(connection)
+
+
+class AsyncCapableMiddleware(ABC):
+    """
+    Middleware, работающее и под WSGI, и под ASGI. Под ASGI синхронное
+    middleware Django 3.2 выполняет в единственном общем потоке вместе со
+    всеми вложенными в него представлениями, и запросы обрабатывались бы
+    по одному. Наследники реализуют обработку запроса в обоих вариантах:
+    handle и __acall__.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Django определяет асинхронное middleware по этому атрибуту.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.handle(request)
+
+    @abstractmethod
+    def handle(self, request):
+        """ Обработка запроса под WSGI."""
+
+    @abstractmethod
+    async def __acall__(self, request):
+        """ Обработка запроса под ASGI."""
+
+
+class PerformanceMiddleware(AsyncCapableMiddleware):
+    """
+    Замеряет для каждого запроса к API колличество SQL запросов, время
+    работы с БД, время сериализации ответа (рендеринга DRF Response) и
+    общее время обработки.
+
+    Результаты отдаются в заголовке Server-Timing и сравниваются с
+    бюджетом эндпоинта из настройки API_PERFORMANCE_BUDGETS, где ключ —
+    basename вьюсета и действие (например, recipes-list), а значение —
+    словарь с лимитами queries (колличество запросов) и/или time
+    (общее время, мс). При превышении бюджета пишется предупреждение в лог,
+    а при API_PERFORMANCE_BUDGETS_RAISE = True (в тестах)
+    выбрасывается PerformanceBudgetExceeded.
+    Потоковый ответ (StreamingHttpResponse) формируется после выхода из
+    middleware: в заголовке Server-Timing — запросы до начала отдачи
+    ответа, а бюджет проверяется по всем запросам, когда ответ отдан.
+    """
+
+    def handle(self, request):
+        for connection in connections.all():
+            install_query_counter(connection)
+        counter = QueryCounter()
+        token = query_counter.set(counter)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            query_counter.reset(token)
+        return self.report(request, response, counter, started)
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        token = query_counter.set(counter)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            query_counter.reset(token)
+        return self.report(request, response, counter, started)
+
+    def report(self, request, response, counter: QueryCounter,
+               started: float):
+        """
+        Добавляет к ответу заголовок Server-Timing и проверяет бюджет
+        эндпоинта.
+        """
+        finished = time.perf_counter()
+        match = request.resolver_match
+        if match is None or 'api' not in match.namespaces:
+            return response
+        endpoint = getattr(request, 'endpoint', match.url_name)
+
+        timings = self.get_timings(
+            counter, started, getattr(request, 'render_started', None),
+            finished
+        )
+        response['Server-Timing'] = (
+            f'db;desc="{timings["queries"]} queries'
+            f'{" before streaming" if response.streaming else ""}";'
+            f'dur={timings["db"]:.1f}, '
+            f'serialization;dur={timings["serialization"]:.1f}, '
+            f'total;dur={timings["total"]:.1f}'
+        )
+        if response.streaming:
+            response.streaming_content = self.count_stream(
+                response.streaming_content, endpoint, counter, started
+            )
+            return response
+        logger.debug('%s %s', endpoint, timings)
+        self.check_budget(endpoint, timings)
+        return response
+
+    def get_timings(self, counter: QueryCounter, started: float,
+                    render_started, finished: float) -> dict:
+        return {
+            'queries': counter.count,
+            'db': counter.duration * 1000,
+            'serialization': (
+                (finished - render_started) * 1000
+                if render_started is not None else 0.0
+            ),
+            'total': (finished - started) * 1000,
+        }
+
+    def count_stream(self, content, endpoint: str, counter: QueryCounter,
+                     started: float):
+        """
+        Отдаёт потоковый ответ, считая SQL запросы, выполненные при его
+        формировании, и проверяет бюджет эндпоинта после отдачи ответа
+        целиком. Время сериализации — время отдачи ответа.
+        """
+        content = iter(content)
+        streaming_started = time.perf_counter()
+        while True:
+            token = query_counter.set(counter)
+            try:
+                chunk = next(content)
+            except StopIteration:
+                break
+            finally:
+                query_counter.reset(token)
+            yield chunk
+        timings = self.get_timings(counter, started, streaming_started,
+                                   time.perf_counter())
+        logger.debug('%s %s', endpoint, timings)
+        self.check_budget(endpoint, timings)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """
+        Определяет имя эндпоинта как basename вьюсета и действие,
+        соответствующее методу запроса (recipes-list, recipes-create,
+        user-subscriptions).
+        """
+        actions = getattr(view_func, 'actions', None)
+        initkwargs = getattr(view_func, 'initkwargs', {})
+        if actions and initkwargs.get('basename'):
+            action = actions.get(request.method.lower())
+            if action is not None:
+                request.endpoint = f'{initkwargs["basename"]}-{action}'
+
+    def process_template_response(self, request, response):
+        """
+        Вызывается перед рендерингом DRF Response — от этого момента
+        отсчитывается время сериализации ответа. Ответ, уже отрендеренный
+        в потоке асинхронного представления, отметил начало рендеринга
+        сам.
+        """
+        if not response.is_rendered:
+            request.render_started = time.perf_counter()
+        return response
+
+    def check_budget(self, endpoint: str, timings: dict) -> None:
+        budget = getattr(settings, 'API_PERFORMANCE_BUDGETS', {}).get(
+            endpoint
+        )
+        if not budget:
+            return
+        exceeded = []
+        if 'queries' in budget and timings['queries'] > budget['queries']:
+            exceeded.append(
+                f'{timings["queries"]} queries > {budget["queries"]}'
+            )
+        if 'time' in budget and timings['total'] > budget['time']:
+            exceeded.append(f'{timings["total"]:.1f}ms > {budget["time"]}ms')
+        if not exceeded:
+            return
+        message = f'{endpoint} exceeded its budget: {", ".join(exceeded)}'
+        if getattr(settings, 'API_PERFORMANCE_BUDGETS_RAISE', False):
+            raise PerformanceBudgetExceeded(message)
+        logger.warning(message)
+
+
+class ReplicaRoutingMiddleware(AsyncCapableMiddleware):
+    """
+    Включает чтение из реплик БД (api.db_router.ReplicaRouter) для
+    безопасных запросов (GET, HEAD, OPTIONS).
+
+    После успешного изменяющего запроса клиент закрепляется за основной БД
+    на REPLICA_PIN_TIMEOUT секунд (read-your-writes): в кэш записывается
+    ключ его токена из заголовка Authorization (или IP адреса для запросов
+    без токена), и пока ключ есть, запросы клиента читают из основной БД.
+    Без настроенных реплик (DB_REPLICAS) ничего не делает.
+    """
+
+    def handle(self, request):
+        if not DATABASE_REPLICAS:
+            return self.get_response(request)
+        pin_keys = self.get_pin_keys(request)
+        token = use_replica.set(self.can_use_replica(request, pin_keys))
+        try:
+            response = self.get_response(request)
+        finally:
+            use_replica.reset(token)
+        self.pin(request, response, pin_keys)
+        return response
+
+    async def __acall__(self, request):
+        if not DATABASE_REPLICAS:
+            return await self.get_response(request)
+        pin_keys = self.get_pin_keys(request)
+        token = use_replica.set(await sync_to_async(
+            self.can_use_replica, thread_sensitive=False
+        )(request, pin_keys))
+        try:
+            response = await self.get_response(request)
+        finally:
+            use_replica.reset(token)
+        await sync_to_async(self.pin, thread_sensitive=False)(
+            request, response, pin_keys
+        )
+        return response
+
+    def can_use_replica(self, request, pin_keys: list) -> bool:
+        return (request.method in SAFE_METHODS
+                and not cache.get_many(pin_keys))
+
+    def pin(self, request, response, pin_keys: list) -> None:
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            cache.set(pin_keys[-1], True, timeout=REPLICA_PIN_TIMEOUT)
+
+    def get_pin_keys(self, request) -> list:
+        """
+        Ключи закрепления клиента за основной БД: по IP адресу и, если
+        передан, по токену. Изменяющий запрос закрепляет последний ключ —
+        по токену, а без токена (например, получение токена) — по IP.
+        """
+        address = request.META.get(
+            'HTTP_X_REAL_IP', request.META.get('REMOTE_ADDR')
+        )
+        keys = [f'db:pin:ip:{address}']
+        authorization = request.META.get('HTTP_AUTHORIZATION')
+        if authorization:
+            digest = hashlib.sha256(authorization.encode()).hexdigest()
+            keys.append(f'db:pin:token:{digest}')
+        return keys
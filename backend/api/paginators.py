@@ -1,4 +1,12 @@
-from rest_framework.pagination import PageNumberPagination
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 from foodgram.settings import DEFAULT_PAGE_SIZE
 
@@ -11,3 +19,119 @@ class StandardResultsSetPagination(PageNumberPagination):
 
     page_size = DEFAULT_PAGE_SIZE
     page_size_query_param = 'limit'
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинатор по ключу (pub_date, id) для ленты рецептов.
+    Вместо OFFSET следующая страница выбирается условием
+    (pub_date, id) < (pub_date, id) последнего рецепта предыдущей страницы,
+    поэтому время ответа не зависит от глубины страницы. Условие
+    pub_date <= pub_date задаёт границу диапазона индекса
+    recipe_pub_date_id_idx: без него SQLite просматривает индекс с начала.
+    Общее колличество объектов (COUNT) не считается.
+    Поддерживается только переход вперёд по ссылке next.
+    """
+
+    page_size = DEFAULT_PAGE_SIZE
+    page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by('-pub_date', '-id')
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            pub_date, pk = cursor
+            queryset = queryset.filter(
+                Q(pub_date__lt=pub_date) | Q(id__lt=pk),
+                pub_date__lte=pub_date
+            )
+        results = list(queryset[:page_size + 1])
+        self.has_next = len(results) > page_size
+        self.page = results[:page_size]
+        return self.page
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return page_size
+
+    def decode_cursor(self, request):
+        """
+        Получает из параметра запроса cursor пару (pub_date, id).
+        Пустой курсор означает первую страницу.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = b64decode(encoded.encode('ascii')).decode('ascii')
+            pub_date, pk = position.rsplit('|', 1)
+            pub_date = parse_datetime(pub_date)
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if pub_date is None:
+            raise NotFound(self.invalid_cursor_message)
+        return pub_date, pk
+
+    def encode_cursor(self, recipe) -> str:
+        position = f'{recipe.pub_date.isoformat()}|{recipe.id}'
+        return b64encode(position.encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.page[-1])
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', None),
+            ('results', data),
+        ]))
+
+
+class RecipeResultsSetPagination(StandardResultsSetPagination):
+    """
+    Пагинатор ленты рецептов. По умолчанию работает постранично, как
+    StandardResultsSetPagination. Переключается на KeysetPagination,
+    если в запросе передан параметр cursor (пустой — для первой страницы)
+    или у вьюсета включен атрибут cursor_pagination.
+    Сортировки по популярности (параметр ordering) и результаты поиска
+    по релевантности (параметр search) всегда выдаются постранично.
+    """
+
+    keyset_pagination_class = KeysetPagination
+    ordering_query_params = ('ordering', 'search')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset_paginator = None
+        if not any(
+            request.query_params.get(param)
+            for param in self.ordering_query_params
+        ) and (
+            self.keyset_pagination_class.cursor_query_param
+            in request.query_params
+            or getattr(view, 'cursor_pagination', False)
+        ):
+            self.keyset_paginator = self.keyset_pagination_class()
+            return self.keyset_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset_paginator is not None:
+            return self.keyset_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
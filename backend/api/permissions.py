@@ -1,4 +1,5 @@
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.permissions import (BasePermission,
+                                        IsAuthenticatedOrReadOnly)
 
 
 class IsAuthorAdminOrReadOnly(IsAuthenticatedOrReadOnly):
@@ -12,3 +13,9 @@ class IsAuthorAdminOrReadOnly(IsAuthenticatedOrReadOnly):
         if view.action == 'retrieve' or obj.author == request.user:
             return True
         return request.user.is_admin()
+
+
+class IsAdmin(BasePermission):
+    """ Доступ только для админов."""
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and request.user.is_admin()
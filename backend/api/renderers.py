@@ -0,0 +1,85 @@
+import csv
+import json
+
+from django.utils import timezone
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+DATE_TIME_FORMAT = '%d/%m/%Y %H:%M'
+
+
+class Echo:
+    """
+    Объект с интерфейсом файла для csv.writer: вместо записи
+    возвращает строку, чтобы её можно было сразу отдать в поток ответа.
+    """
+
+    def write(self, value: str) -> str:
+        return value
+
+
+class ShoppingListTextRenderer(BaseRenderer):
+    """
+    Рендерер списка покупок в текстовый файл (?format=txt).
+    Метод stream отдаёт файл построчно, не собирая его целиком в памяти.
+    Метод render используется только для ответов с ошибками.
+    """
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict) and 'detail' in data:
+            data = data['detail']
+        return str(data).encode(self.charset)
+
+    def stream(self, user, ingredients):
+        """Построчно формирует файл списка покупок.
+
+        Args:
+            user (User): Владелец корзины покупок.
+            ingredients (Iterator[dict]): Суммированные ингредиенты
+                с ключами name, measurement, amount.
+
+        Yields:
+            str: Очередная часть файла.
+        """
+        yield (
+            f'Список покупок для:\n\n{user.first_name}\n'
+            f'Дата: {timezone.now().strftime(DATE_TIME_FORMAT)}\n\n'
+        )
+        for ing in ingredients:
+            yield f'{ing["name"]}: {ing["amount"]} {ing["measurement"]}\n'
+        yield '\nХороших покупок! Твой Foodgram'
+
+
+class ShoppingListCSVRenderer(ShoppingListTextRenderer):
+    """ Рендерер списка покупок в CSV файл (?format=csv)."""
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, user, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'amount', 'measurement_unit'))
+        for ing in ingredients:
+            yield writer.writerow(
+                (ing['name'], ing['amount'], ing['measurement'])
+            )
+
+
+class ShoppingListJSONRenderer(JSONRenderer):
+    """ Рендерер списка покупок в JSON файл (?format=json)."""
+
+    def stream(self, user, ingredients):
+        yield '['
+        separator = ''
+        for ing in ingredients:
+            yield separator + json.dumps(
+                {
+                    'name': ing['name'],
+                    'amount': ing['amount'],
+                    'measurement_unit': ing['measurement'],
+                },
+                ensure_ascii=False
+            )
+            separator = ','
+        yield ']'
@@ -0,0 +1,141 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, FloatField
+from django.db.models.expressions import RawSQL
+
+from api.ingredient_index import normalize
+from recipe.models import Recipe
+
+SEARCH_CONFIG = 'russian'
+# Вес совпадений в названии и в описании рецепта в SQLite
+# (в PostgreSQL — веса A и B в search_vector, миграция recipe 0011).
+SQLITE_NAME_WEIGHT, SQLITE_TEXT_WEIGHT = 10.0, 1.0
+
+RECIPE_TABLE = Recipe._meta.db_table
+FTS_TABLE = f'{RECIPE_TABLE}_fts'
+
+
+def normalized(column: str) -> str:
+    """ SQL-выражение: значение столбца с заменой ё на е."""
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+# Таблица FTS5 SQLite и триггеры её синхронизации. Поисковый индекс
+# создаёт миграция recipe 0011 (с копией этих команд на момент её
+# создания), здесь они нужны для восстановления триггеров
+# (ensure_search_index); изменения индекса вносятся новой миграцией.
+SQLITE_CREATE = (
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, text, tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert
+    AFTER INSERT ON {RECIPE_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, text) VALUES (
+            new.id, {normalized('new.name')}, {normalized('new.text')}
+        );
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete
+    AFTER DELETE ON {RECIPE_TABLE} BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+    AFTER UPDATE OF name, text ON {RECIPE_TABLE} BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        INSERT INTO {FTS_TABLE}(rowid, name, text) VALUES (
+            new.id, {normalized('new.name')}, {normalized('new.text')}
+        );
+    END
+    """,
+)
+SQLITE_REBUILD = (
+    f'DELETE FROM {FTS_TABLE}',
+    f"""
+    INSERT INTO {FTS_TABLE}(rowid, name, text)
+    SELECT id, {normalized('name')}, {normalized('text')} FROM {RECIPE_TABLE}
+    """,
+)
+
+
+def ensure_search_index(connection) -> None:
+    """
+    Восстанавливает триггеры FTS5 в SQLite: при изменении схемы таблицы
+    рецептов SQLite пересоздаёт её, и триггеры теряются. Если индекс уже
+    создан миграцией, а триггеры пришлось создать заново, индекс
+    перестраивается.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT type, COUNT(*) FROM sqlite_master '
+            'WHERE name = %s OR (type = %s AND name LIKE %s) GROUP BY type',
+            [FTS_TABLE, 'trigger', f'{FTS_TABLE}_%']
+        )
+        objects = dict(cursor.fetchall())
+        if 'table' not in objects or (
+            objects.get('trigger') == len(SQLITE_CREATE) - 1
+        ):
+            return
+        for statement in (*SQLITE_CREATE, *SQLITE_REBUILD):
+            cursor.execute(statement)
+
+
+def fts_query(value: str) -> str:
+    """
+    Запрос FTS5 из строки поиска: все слова должны встретиться,
+    каждое ищется как префикс, чтобы находить другие формы слова
+    (в SQLite нет русской морфологии).
+    """
+    words = re.findall(r'\w+', normalize(value))
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_recipes(queryset, value: str):
+    """Полнотекстовый поиск рецептов по названию и описанию.
+
+    Args:
+        queryset (QuerySet): Рецепты, среди которых выполняется поиск.
+        value (str): Строка поиска.
+
+    Returns:
+        QuerySet: Найденные рецепты с релевантностью search_rank
+            (больше — релевантнее), отсортированные по ней.
+    """
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        query = SearchQuery(normalize(value), config=SEARCH_CONFIG,
+                            search_type='websearch')
+        queryset = queryset.annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).filter(search_vector=query)
+    elif vendor == 'sqlite':
+        query = fts_query(value)
+        if not query:
+            return queryset.none()
+        # Таблица FTS5 присоединяется к запросу, а не проверяется
+        # подзапросом для каждого рецепта: bm25 в подзапросе пересчитывал
+        # бы статистику совпадений для каждой строки.
+        queryset = queryset.extra(
+            select={'search_rank': (
+                f'-bm25({FTS_TABLE}, {SQLITE_NAME_WEIGHT}, '
+                f'{SQLITE_TEXT_WEIGHT})'
+            )},
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {RECIPE_TABLE}.id',
+                   f'{FTS_TABLE} MATCH %s'],
+            params=[query]
+        )
+    else:
+        queryset = queryset.annotate(
+            search_rank=RawSQL('1', [], output_field=FloatField())
+        ).filter(name__icontains=value)
+    return queryset.order_by('-search_rank', '-id')
@@ -1,15 +1,26 @@
+from copy import deepcopy
+
 from django.contrib.auth import get_user_model
-from django.db.models import F, QuerySet
+from django.db import transaction
+from django.db.models import Manager, prefetch_related_objects
 from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
 from rest_framework import serializers
 from rest_framework.serializers import SerializerMethodField
 
-from foodgram.settings import DEFAULT_RECIPES_LIMIT
+from api.cache import get_recipe_data, get_recipes_data, set_recipes_data
+from api.images import absolute_srcset, get_srcset
+from api.recipe_index import recipe_ingredient_index
+from api.utils import recipe_ingredients_prefetch, update_counter
+from foodgram.settings import (BULK_MAX_IDS, DEFAULT_RECIPES_LIMIT,
+                               IMAGE_MAX_DIMENSION, IMAGE_MAX_UPLOAD_SIZE)
 from recipe.models import Favorit, Ingredient, Recipe, ShoppingCartUser, Tag
 from user.models import Subscription
 
 User = get_user_model()
 
+RECIPE_USER_FIELDS = ('is_favorited', 'is_in_shopping_cart')
+
 
 class UserSerializer(serializers.ModelSerializer):
     """
@@ -46,7 +57,12 @@ class UserSerializer(serializers.ModelSerializer):
         Returns:
             bool: True, если подписка есть. Во всех остальных случаях False.
         """
+        is_subscribed = getattr(obj, 'is_subscribed', None)
+        if is_subscribed is not None:
+            return is_subscribed
         request = self.context['request']
+        if not request.user.is_authenticated:
+            return False
         return Subscription.objects.filter(
             user=request.user.id,
             author=obj.id
@@ -149,12 +165,44 @@ class RecipesShortSerializer(serializers.ModelSerializer):
     Сериализатор для краткого отображения рецептов.
     """
     image = Base64ImageField()
+    images = SerializerMethodField()
 
     class Meta:
-        fields = ('id', 'image', 'cooking_time', 'name')
+        fields = ('id', 'image', 'images', 'cooking_time', 'name')
         model = Recipe
         read_only_fields = ('id', 'image', 'cooking_time', 'name')
 
+    def get_images(self, recipe: Recipe) -> dict:
+        """
+        Ссылки на уменьшенные варианты изображения в форматах WebP и JPEG
+        ({размер: {формат: url}}) или None, если они ещё не созданы.
+        """
+        return absolute_srcset(get_srcset(recipe), self.context.get('request'))
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    """
+    Сериализатор списка id рецептов/авторов для массового добавления и
+    удаления из избранного, корзины покупок и подписок.
+    """
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_MAX_IDS
+    )
+
+
+class CookableSerializer(serializers.Serializer):
+    """
+    Сериализатор списка id имеющихся у пользователя ингредиентов для
+    поиска рецептов, которые можно из них приготовить.
+    """
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_MAX_IDS
+    )
+
 
 class SubscriptionsSerializer(UserSerializer):
     """
@@ -176,20 +224,19 @@ class SubscriptionsSerializer(UserSerializer):
         """ Получает список рецептов автора, на которого оформлена подписка
         и возвращает кол-во, переданное в параметр запроса recipes_limit,
         переданного в URL.
+        Использует рецепты, предзагруженные author_recipes_prefetch.
         Args:
             user (User): Автор на которого подписан пользователь.
         Returns:
             QuerySet: список рецептов автора из подписки.
         """
-        recipes_limit = self.context['recipes_limit']
-        if recipes_limit is None:
-            recipes_limit = DEFAULT_RECIPES_LIMIT
-        else:
-            recipes_limit = int(recipes_limit)
-        serializer = RecipesShortSerializer(
-            obj.recipes.all()[:recipes_limit],
-            many=True
-        )
+        recipes = getattr(obj, 'limited_recipes', None)
+        if recipes is None:
+            recipes_limit = self.context.get('recipes_limit')
+            if recipes_limit is None:
+                recipes_limit = DEFAULT_RECIPES_LIMIT
+            recipes = obj.recipes.all()[:int(recipes_limit)]
+        serializer = RecipesShortSerializer(recipes, many=True)
         return serializer.data
 
     def get_recipes_count(self, obj: User) -> int:
@@ -217,6 +264,39 @@ class IngredientSerializer(serializers.ModelSerializer):
         model = Ingredient
 
 
+class RecipeReadListSerializer(serializers.ListSerializer):
+    """
+    Сериализатор списка рецептов.
+    Получает представления всех рецептов страницы из кэша одним
+    обращением и сохраняет недостающие тоже одним обращением.
+    Тэги и ингредиенты загружаются из БД только для рецептов,
+    которых нет в кэше.
+    """
+
+    def to_representation(self, data) -> list:
+        recipes = data.all() if isinstance(data, Manager) else data
+        cached = get_recipes_data(recipes)
+        prefetch_related_objects(
+            [recipe for recipe in recipes if recipe.id not in cached],
+            'tags', recipe_ingredients_prefetch()
+        )
+        missing = {}
+        representation = []
+        for recipe in recipes:
+            if recipe.id in cached:
+                representation.append(
+                    self.child.add_user_data(recipe, cached[recipe.id])
+                )
+                continue
+            recipe_data = self.child.serialize(recipe)
+            public_data = self.child.get_public_data(recipe, recipe_data)
+            if public_data is not None:
+                missing[recipe] = public_data
+            representation.append(recipe_data)
+        set_recipes_data(missing)
+        return representation
+
+
 class RecipeReadSerializer(serializers.ModelSerializer):
     """
     Сериализатор для полного отображения рецептов.
@@ -226,34 +306,135 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     ingredients = SerializerMethodField()
     author = UserSerializer()
     image = Base64ImageField()
+    images = SerializerMethodField()
     is_favorited = SerializerMethodField()
     is_in_shopping_cart = SerializerMethodField()
 
     class Meta:
         fields = ('id', 'tags', 'author',
-                  'name', 'image', 'text', 'cooking_time',
+                  'name', 'image', 'images', 'text', 'cooking_time',
                   'ingredients', 'is_favorited', 'is_in_shopping_cart'
                   )
         model = Recipe
         read_only_fields = ('id', 'author', 'tags'
                             'name', 'image', 'text', 'cooking_time',
                             'ingredients')
+        list_serializer_class = RecipeReadListSerializer
+
+    def to_representation(self, recipe: Recipe) -> dict:
+        """
+        Берёт не зависящую от пользователя часть представления рецепта
+        из кэша и дополняет её флагами текущего пользователя.
+        При отсутствии в кэше рецепт сериализуется полностью,
+        а его общая часть сохраняется в кэш.
+        """
+        public_data = get_recipe_data(recipe)
+        if public_data is not None:
+            return self.add_user_data(recipe, public_data)
+        data = self.serialize(recipe)
+        public_data = self.get_public_data(recipe, data)
+        if public_data is not None:
+            set_recipes_data({recipe: public_data})
+        return data
+
+    def serialize(self, recipe: Recipe) -> dict:
+        """
+        Полная сериализация рецепта без кэша.
+        Передаёт аннотацию author_is_subscribed из queryset вьюсета автору
+        рецепта, чтобы вложенный UserSerializer не обращался к БД.
+        """
+        self.set_author_subscription(recipe)
+        return super().to_representation(recipe)
+
+    def set_author_subscription(self, recipe: Recipe) -> None:
+        is_subscribed = getattr(recipe, 'author_is_subscribed', None)
+        if is_subscribed is not None:
+            recipe.author.is_subscribed = is_subscribed
+
+    def get_public_data(self, recipe: Recipe, data: dict) -> dict:
+        """Выделяет из представления рецепта данные для кэша.
 
-    def get_ingredients(self, recipe: Recipe) -> QuerySet[dict]:
+        Убирает флаги текущего пользователя, а ссылки на изображение и его
+        варианты сохраняет относительными, так как абсолютные зависят от
+        запроса.
+
+        Args:
+            recipe (Recipe): Сериализованный рецепт.
+            data (dict): Полное представление рецепта.
+
+        Returns:
+            dict: Общая для всех пользователей часть представления или None,
+                если варианты изображения ещё создаются и представление
+                не нужно кэшировать.
+        """
+        srcset = get_srcset(recipe)
+        if recipe.image and srcset is None:
+            return None
+        public_data = deepcopy(data)
+        for field in RECIPE_USER_FIELDS:
+            public_data.pop(field)
+        public_data['author'].pop('is_subscribed')
+        public_data['image'] = recipe.image.url if recipe.image else None
+        public_data['images'] = srcset
+        return public_data
+
+    def add_user_data(self, recipe: Recipe, public_data: dict) -> dict:
+        """Дополняет закэшированное представление рецепта данными,
+        зависящими от текущего пользователя и запроса.
+
+        Args:
+            recipe (Recipe): Сериализуемый рецепт.
+            public_data (dict): Представление рецепта из кэша.
+
+        Returns:
+            dict: Полное представление рецепта.
+        """
+        self.set_author_subscription(recipe)
+        request = self.context.get('request')
+        if request is not None and public_data['image']:
+            public_data['image'] = request.build_absolute_uri(
+                public_data['image']
+            )
+        public_data['images'] = absolute_srcset(public_data['images'],
+                                                request)
+        public_data['author']['is_subscribed'] = self.fields[
+            'author'
+        ].get_is_subscribed(recipe.author)
+        public_data['is_favorited'] = self.get_is_favorited(recipe)
+        public_data['is_in_shopping_cart'] = self.get_is_in_shopping_cart(
+            recipe
+        )
+        return public_data
+
+    def get_images(self, recipe: Recipe) -> dict:
+        """
+        Ссылки на уменьшенные варианты изображения в форматах WebP и JPEG
+        ({размер: {формат: url}}) или None, если они ещё не созданы.
+        """
+        return absolute_srcset(get_srcset(recipe), self.context.get('request'))
+
+    def get_ingredients(self, recipe: Recipe) -> list:
         """Получает список ингридиентов для рецепта.
+        Список собирается из связей RecipeIngredient, предзагруженных
+        через recipe_ingredients_prefetch, без запроса на каждый рецепт.
 
         Args:
             recipe (Recipe): Запрошенный рецепт.
 
         Returns:
-            QuerySet[dict]: Список ингридиентов в рецепте.
+            list: Список ингридиентов в рецепте.
         """
-        return recipe.ingredients.values(
-            'id',
-            'name',
-            'measurement_unit',
-            amount=F('recipe__amount')
-        )
+        prefetch_related_objects([recipe], recipe_ingredients_prefetch())
+        ingredients = []
+        for recipe_ingredient in recipe.ingredient.all():
+            ingredient = recipe_ingredient.ingredient
+            ingredients.append({
+                'id': ingredient.id,
+                'name': ingredient.name,
+                'measurement_unit': ingredient.measurement_unit,
+                'amount': recipe_ingredient.amount,
+            })
+        return ingredients
 
     def get_is_favorited(self, recipe: Recipe) -> bool:
         """Получает булевое значение, если авторизованный пользователь имеет
@@ -263,7 +444,12 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         Returns:
             bool: в избранных или нет.
         """
+        is_favorited = getattr(recipe, 'is_favorited', None)
+        if is_favorited is not None:
+            return is_favorited
         request = self.context['request']
+        if not request.user.is_authenticated:
+            return False
         return Favorit.objects.filter(
             favoriter=request.user.id,
             recipe=recipe.id
@@ -277,7 +463,12 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         Returns:
             bool: в корзине покупок или нет.
         """
+        is_in_shopping_cart = getattr(recipe, 'is_in_shopping_cart', None)
+        if is_in_shopping_cart is not None:
+            return is_in_shopping_cart
         request = self.context['request']
+        if not request.user.is_authenticated:
+            return False
         return ShoppingCartUser.objects.filter(
             owner=request.user.id,
             recipe=recipe.id
@@ -303,6 +494,56 @@ class IngredientAmountSerializer(serializers.Serializer):
         return value
 
 
+class LimitedImageField(serializers.ImageField):
+    """
+    Поле изображения с ограничением размера файла (IMAGE_MAX_UPLOAD_SIZE)
+    и наибольшей стороны изображения (IMAGE_MAX_DIMENSION).
+    Размеры изображения читаются из заголовка файла, поэтому слишком
+    большие изображения отклоняются до полного декодирования.
+    """
+    default_error_messages = {
+        'file_too_large': (
+            f'Размер изображения не должен превышать '
+            f'{IMAGE_MAX_UPLOAD_SIZE // (1024 * 1024)} Мб.'
+        ),
+        'image_too_large': (
+            f'Стороны изображения не должны превышать '
+            f'{IMAGE_MAX_DIMENSION} пикселей.'
+        ),
+    }
+
+    def to_internal_value(self, data):
+        if getattr(data, 'size', 0) > IMAGE_MAX_UPLOAD_SIZE:
+            self.fail('file_too_large')
+        try:
+            with Image.open(data) as image:
+                dimensions = image.size
+        except (OSError, ValueError, AttributeError):
+            dimensions = (0, 0)
+        if hasattr(data, 'seek'):
+            data.seek(0)
+        if max(dimensions) > IMAGE_MAX_DIMENSION:
+            self.fail('image_too_large')
+        return super().to_internal_value(data)
+
+
+class RecipeImageField(Base64ImageField, LimitedImageField):
+    """
+    Изображение рецепта: строка base64 в JSON запросе или файл в
+    multipart/form-data запросе. Файл из multipart запроса не проходит
+    через base64 и читается из временного файла
+    (FILE_UPLOAD_HANDLERS), а не из памяти.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            encoded = data.split(';base64,')[-1]
+            if len(encoded) * 3 // 4 > IMAGE_MAX_UPLOAD_SIZE:
+                self.fail('file_too_large')
+            return super().to_internal_value(data)
+        return LimitedImageField.to_internal_value(self, data)
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     """
     Сериализатор для записи рецептов.
@@ -316,7 +557,7 @@ class RecipeSerializer(serializers.ModelSerializer):
     )
     ingredients = IngredientAmountSerializer(many=True, required=True)
     author = UserSerializer(read_only=True)
-    image = Base64ImageField()
+    image = RecipeImageField()
 
     class Meta:
         fields = ('author', 'name', 'image', 'text', 'cooking_time',
@@ -336,13 +577,13 @@ class RecipeSerializer(serializers.ModelSerializer):
         """
         ingredients = data.get('ingredients')
         tags = data.get('tags')
-        if len(ingredients) == 0:
+        if ingredients is not None and len(ingredients) == 0:
             raise serializers.ValidationError({
                 'ingredients':
                     'Выберите хотя бы 1 ингредиент.'
             })
         ingr_list = []
-        for ingredient in ingredients:
+        for ingredient in ingredients or []:
             if ingredient['id'] in ingr_list:
                 raise serializers.ValidationError({
                     "ingredients": [
@@ -355,7 +596,7 @@ class RecipeSerializer(serializers.ModelSerializer):
                 })
             ingr_list.append(ingredient['id'])
 
-        if len(tags) == 0:
+        if tags is not None and len(tags) == 0:
             raise serializers.ValidationError({
                 'tags': 'Выберите хотя бы 1 тэг.'
             })
@@ -372,27 +613,47 @@ class RecipeSerializer(serializers.ModelSerializer):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         request = self.context['request']
-        recipe = Recipe.objects.create(**validated_data, author=request.user)
-        recipe.load_ingredients(ingredients)
-        recipe.tags.set(tags)
+        with transaction.atomic():
+            recipe = Recipe.objects.create(
+                **validated_data, author=request.user
+            )
+            recipe.load_ingredients(ingredients)
+            recipe_ingredient_index.on_commit(
+                recipe.id, [ingredient['id'].id for ingredient in ingredients]
+            )
+            recipe.tags.set(tags)
+            update_counter(Recipe, 1, author=request.user)
         return recipe
 
     def update(self, instance: Recipe, validated_data: dict) -> Recipe:
         """
         Метод для редакции рецепта.
+        Ингредиенты и тэги не пересоздаются: в БД записываются только
+        отличия от текущих связей рецепта. Не переданные при PATCH
+        ингредиенты или тэги остаются без изменений.
+        Сохраняются только переданные поля и дата изменения, чтобы не
+        затереть счётчики и популярность, которые параллельно обновляются
+        F() выражениями.
         Args:
             instance (Recipe): изменяемый рецепт
             validated_data (dict): проверенные данные из запроса.
         Returns:
             Recipe: созданный рецепт.
         """
-        ingredients = validated_data.pop('ingredients')
-        tags = validated_data.pop('tags')
-        super().update(instance, validated_data)
-        instance.ingredients.clear()
-        instance.load_ingredients(ingredients)
-        instance.tags.clear()
-        instance.tags.set(tags)
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        with transaction.atomic():
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save(update_fields=[*validated_data, 'updated_at'])
+            if ingredients is not None:
+                instance.update_ingredients(ingredients)
+                recipe_ingredient_index.on_commit(
+                    instance.id,
+                    [ingredient['id'].id for ingredient in ingredients]
+                )
+            if tags is not None:
+                instance.tags.set(tags)
         return instance
 
     def to_representation(self, instance: Recipe) -> dict:
@@ -0,0 +1,171 @@
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from api.cache import touch_recipes
+from api.images import change_image_references, schedule_recipe_image
+from api.ingredient_index import ingredient_index
+from api.recipe_index import recipe_ingredient_index
+from api.search import ensure_search_index
+from recipe.models import Ingredient, Recipe, RecipeIngredient, RecipeTag, Tag
+
+User = get_user_model()
+
+AUTHOR_FIELDS = {'id', 'username', 'email', 'first_name', 'last_name'}
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_recipe_image(sender, instance, update_fields=None, **kwargs):
+    """
+    Запоминает файл изображения рецепта до сохранения, если изображение
+    может измениться, чтобы пересчитать ссылки на файлы.
+    """
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    instance._previous_image = '' if instance.pk is None else (
+        Recipe.objects.filter(pk=instance.pk).values_list(
+            'image', flat=True
+        ).first() or ''
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def update_image_references(sender, instance, **kwargs):
+    """
+    Переносит ссылку рецепта со старого файла изображения на новый.
+    Повторная загрузка того же изображения ссылки не меняет.
+    """
+    previous = getattr(instance, '_previous_image', None)
+    if previous is None:
+        return
+    del instance._previous_image
+    if previous == instance.image.name:
+        return
+    change_image_references(instance.image.name, 1)
+    change_image_references(previous, -1)
+
+
+@receiver(post_delete, sender=Recipe)
+def release_image_reference(sender, instance, **kwargs):
+    """ Убирает ссылку удалённого рецепта на файл изображения."""
+    change_image_references(instance.image.name, -1)
+
+
+@receiver(post_save, sender=Recipe)
+def process_recipe_image(sender, instance, created=False, update_fields=None,
+                         **kwargs):
+    """
+    Ставит в очередь создание вариантов изображения нового рецепта или
+    рецепта, изображение которого могло измениться. Для файла, варианты
+    которого уже созданы, обработка не повторяется.
+    """
+    if instance.image_variants.get('source') == instance.image.name:
+        return
+    if created or update_fields is None or 'image' in update_fields:
+        schedule_recipe_image(instance)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(post_save, sender=RecipeTag)
+@receiver(post_delete, sender=RecipeTag)
+def touch_relation_recipe(sender, instance, **kwargs):
+    """
+    Меняет версию представления рецепта при изменении его ингредиентов
+    или тэгов по отдельности (например, через админку).
+    """
+    touch_recipes(id=instance.recipe_id)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def add_to_recipe_index(sender, instance, created=False, **kwargs):
+    """
+    Добавляет ингредиент рецепта в индекс поиска рецептов по ингредиентам.
+    Связи, созданные bulk_create, добавляет RecipeSerializer.
+    """
+    if created:
+        recipe_ingredient_index.on_commit(
+            instance.recipe_id, [instance.ingredient_id]
+        )
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def remove_from_recipe_index(sender, instance, **kwargs):
+    """
+    Удаляет ингредиент рецепта из индекса поиска рецептов по
+    ингредиентам, в том числе при удалении самого рецепта.
+    """
+    recipe_ingredient_index.on_commit(
+        instance.recipe_id, [instance.ingredient_id], added=False
+    )
+
+
+@receiver(post_save, sender=Tag)
+def touch_tag_recipes(sender, instance, created=False, **kwargs):
+    """
+    Меняет версию представлений рецептов с изменённым тэгом.
+    Удаление тэга, используемого в рецептах, запрещено (PROTECT).
+    """
+    if not created:
+        touch_recipes(tags=instance)
+
+
+@receiver(post_save, sender=Ingredient)
+def touch_ingredient_recipes(sender, instance, created=False, **kwargs):
+    """
+    Меняет версию представлений рецептов с изменённым ингредиентом.
+    Удаление ингредиента, используемого в рецептах, запрещено (PROTECT).
+    """
+    if not created:
+        touch_recipes(ingredients=instance)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_index(sender, instance, **kwargs):
+    """ Сбрасывает индекс поиска ингредиентов по названию."""
+    ingredient_index.invalidate()
+
+
+@receiver(pre_save, sender=User)
+def remember_author_data(sender, instance, update_fields=None, **kwargs):
+    """
+    Запоминает данные пользователя, отображаемые в рецептах как данные
+    автора, до сохранения, если они могут измениться.
+    """
+    if instance.pk is None:
+        return
+    if update_fields is not None and not AUTHOR_FIELDS & set(update_fields):
+        return
+    instance._previous_author_data = User.objects.filter(
+        pk=instance.pk
+    ).values(*AUTHOR_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def touch_author_recipes(sender, instance, **kwargs):
+    """
+    Меняет версию представлений рецептов пользователя, только если его
+    данные автора действительно изменились. Сохранения, не меняющие их
+    (last_login, set_password, полное сохранение без правок), как и
+    регистрация нового пользователя, версию не меняют.
+    """
+    previous = getattr(instance, '_previous_author_data', None)
+    if previous is None:
+        return
+    del instance._previous_author_data
+    if any(getattr(instance, field) != value
+           for field, value in previous.items()):
+        touch_recipes(author=instance)
+
+
+@receiver(post_migrate)
+def restore_search_index(sender, app_config, using, **kwargs):
+    """
+    После миграций приложения recipe восстанавливает триггеры поискового
+    индекса SQLite, если таблица рецептов была пересоздана.
+    """
+    if app_config.label == 'recipe':
+        ensure_search_index(connections[using])
@@ -0,0 +1,88 @@
+import shutil
+import tempfile
+from io import BytesIO
+from itertools import count
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import override_settings
+from PIL import Image
+
+from recipe.models import Ingredient, Recipe, RecipeIngredient, RecipeTag, Tag
+
+User = get_user_model()
+
+_numbers = count(1)
+
+
+def create_user(**fields) -> User:
+    number = next(_numbers)
+    fields.setdefault('username', f'user{number}')
+    fields.setdefault('email', f'user{number}@example.com')
+    fields.setdefault('first_name', f'Имя{number}')
+    fields.setdefault('last_name', f'Фамилия{number}')
+    return User.objects.create(**fields)
+
+
+def create_tag(**fields) -> Tag:
+    number = next(_numbers)
+    fields.setdefault('name', f'тэг{number}')
+    fields.setdefault('color', f'#{number:06x}')
+    fields.setdefault('slug', f'tag{number}')
+    return Tag.objects.create(**fields)
+
+
+def create_ingredient(**fields) -> Ingredient:
+    number = next(_numbers)
+    fields.setdefault('name', f'ингредиент{number}')
+    fields.setdefault('measurement_unit', 'г')
+    return Ingredient.objects.create(**fields)
+
+
+def use_temporary_media(test_case) -> None:
+    """
+    Подменяет MEDIA_ROOT на время теста временным каталогом, который
+    удаляется после теста.
+    """
+    media_root = tempfile.mkdtemp()
+    test_case.addCleanup(shutil.rmtree, media_root)
+    settings = override_settings(MEDIA_ROOT=media_root)
+    settings.enable()
+    test_case.addCleanup(settings.disable)
+
+
+def image_file(size=(40, 30), color='red', image_format='PNG',
+               exif=None) -> ContentFile:
+    """ Файл изображения размера size (ширина, высота)."""
+    buffer = BytesIO()
+    image = Image.new('RGB', size, color)
+    if exif is None:
+        image.save(buffer, image_format)
+    else:
+        image.save(buffer, image_format, exif=exif)
+    return ContentFile(buffer.getvalue(), name=f'image.{image_format}')
+
+
+def create_recipe(author: User, tags=(), ingredients=(), **fields) -> Recipe:
+    """
+    Создаёт рецепт с тэгами и ингредиентами ({ингредиент: колличество}).
+    Варианты изображения отмечаются созданными, чтобы представление
+    рецепта кэшировалось, а обработка изображения не запускалась.
+    """
+    number = next(_numbers)
+    image = fields.pop('image', f'recipe/images/{number}.jpg')
+    fields.setdefault('name', f'рецепт{number}')
+    fields.setdefault('text', f'описание{number}')
+    fields.setdefault('cooking_time', 10)
+    recipe = Recipe.objects.create(
+        author=author, image=image, image_variants={'source': image},
+        **fields
+    )
+    RecipeTag.objects.bulk_create(
+        RecipeTag(recipe=recipe, tag=tag) for tag in tags
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=amount)
+        for ingredient, amount in dict(ingredients).items()
+    )
+    return recipe
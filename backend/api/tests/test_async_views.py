@@ -0,0 +1,113 @@
+import json
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import AsyncRequestFactory, TransactionTestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from api.async_views import async_view
+from api.tests.factories import create_recipe, create_user
+from api.views import RecipeViewSet
+from recipe.models import Favorit, ShoppingCartUser
+from user.models import Subscription
+
+
+class AsyncUserFlagsTest(TransactionTestCase):
+    """
+    Флаги пользователя (избранное, список покупок, подписка на автора),
+    запрошенные одновременно с представлением рецептов под ASGI,
+    совпадают с флагами синхронного представления.
+    Потоки пула работают со своими соединениями, поэтому данные теста
+    сохраняются в БД (TransactionTestCase).
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.token = Token.objects.create(user=self.user).key
+        self.author, other_author = create_user(), create_user()
+        self.favorite = create_recipe(self.author)
+        self.in_cart = create_recipe(other_author)
+        create_recipe(other_author)
+        Favorit.objects.create(favoriter=self.user, recipe=self.favorite)
+        ShoppingCartUser.objects.create(owner=self.user, recipe=self.in_cart)
+        Subscription.objects.create(user=self.user, author=self.author)
+
+    def get(self, actions: dict, path: str, token=None, **kwargs) -> tuple:
+        """
+        Выполняет запрос синхронным и асинхронным представлением и
+        возвращает их ответы: ((статус, данные, ETag), (статус, данные,
+        ETag)).
+        """
+        # AsyncRequestFactory Django 3.2 принимает заголовки без HTTP_.
+        headers = {'AUTHORIZATION': f'Token {token}'} if token else {}
+        view = RecipeViewSet.as_view(actions)
+        responses = (
+            view(APIRequestFactory().get(
+                path, **{f'HTTP_{key}': value
+                         for key, value in headers.items()}
+            ), **kwargs),
+            async_to_sync(async_view(view, user_flags=True))(
+                AsyncRequestFactory().get(path, **headers), **kwargs
+            ),
+        )
+        return tuple(
+            (response.render().status_code, json.loads(response.content),
+             response.get('ETag'))
+            for response in responses
+        )
+
+    def test_list(self):
+        for _ in range(2):
+            sync, async_ = self.get({'get': 'list'}, '/api/recipes/',
+                                    self.token)
+            self.assertEqual(async_, sync)
+        flags = {
+            recipe['id']: (recipe['is_favorited'],
+                           recipe['is_in_shopping_cart'],
+                           recipe['author']['is_subscribed'])
+            for recipe in async_[1]['results']
+        }
+        self.assertEqual(flags[self.favorite.id], (True, False, True))
+        self.assertEqual(flags[self.in_cart.id], (False, True, False))
+
+    def test_detail(self):
+        for recipe in (self.favorite, self.in_cart):
+            with self.subTest(recipe=recipe.id):
+                sync, async_ = self.get({'get': 'retrieve'},
+                                        f'/api/recipes/{recipe.id}/',
+                                        self.token, pk=recipe.id)
+                self.assertEqual(sync[0], 200)
+                self.assertEqual(async_, sync)
+
+    def test_anonymous_and_invalid_token(self):
+        for token in (None, 'invalid'):
+            with self.subTest(token=token):
+                sync, async_ = self.get({'get': 'list'}, '/api/recipes/',
+                                        token)
+                self.assertEqual(async_, sync)
+        self.assertEqual(async_[0], 401)
+
+    def test_detail_not_modified_after_flag_change(self):
+        """
+        ETag рецепта строится по флагам, полученным после представления,
+        поэтому изменение флага не даёт ответа 304 с устаревшими флагами.
+        """
+        view = async_to_sync(async_view(
+            RecipeViewSet.as_view({'get': 'retrieve'}), user_flags=True
+        ))
+
+        def get(**headers):
+            return view(AsyncRequestFactory().get(
+                f'/api/recipes/{self.in_cart.id}/',
+                AUTHORIZATION=f'Token {self.token}', **headers
+            ), pk=self.in_cart.id)
+
+        etag = get()['ETag']
+        self.assertEqual(get(IF_NONE_MATCH=etag).status_code, 304)
+        Favorit.objects.create(favoriter=self.user, recipe=self.in_cart)
+        response = get(IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertTrue(json.loads(response.content)['is_favorited'])
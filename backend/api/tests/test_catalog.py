@@ -0,0 +1,96 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.ingredient_index import ingredient_index
+from api.tests.factories import create_ingredient, create_tag
+from recipe.models import Ingredient, Tag
+
+
+class CatalogConditionalRequestTest(TestCase):
+    """
+    ETag справочников (тэги, ингредиенты) строится по состоянию БД и
+    не зависит от кэша процесса. Ингредиенты отдаются из индекса в
+    памяти процесса, и их ETag — версия ингредиентов индекса.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = create_tag()
+        cls.ingredient = create_ingredient()
+
+    def setUp(self):
+        ingredient_index.invalidate()
+        self.client = APIClient()
+
+    def etag(self, url: str) -> str:
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_not_modified(self):
+        for url, queries in (('/api/tags/', 1),
+                             ('/api/ingredients/?name=и', 0),
+                             (f'/api/ingredients/{self.ingredient.id}/', 0)):
+            with self.subTest(url=url):
+                etag = self.etag(url)
+                with self.assertNumQueries(queries):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_ingredients_from_index(self):
+        self.etag('/api/ingredients/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/ingredients/?name=и')
+            detail = self.client.get(
+                f'/api/ingredients/{self.ingredient.id}/'
+            )
+        self.assertEqual(response.data[0]['id'], self.ingredient.id)
+        self.assertEqual(detail.data, {
+            'id': self.ingredient.id,
+            'name': self.ingredient.name,
+            'measurement_unit': self.ingredient.measurement_unit,
+        })
+        for pk in (0, 'abc'):
+            with self.subTest(pk=pk):
+                response = self.client.get(f'/api/ingredients/{pk}/')
+                self.assertEqual(response.status_code, 404)
+
+    def test_etag_does_not_depend_on_cache(self):
+        etag = self.etag('/api/ingredients/')
+        cache.clear()
+        ingredient_index.invalidate()
+        self.assertEqual(self.etag('/api/ingredients/'), etag)
+
+    def test_bulk_create_changes_etag(self):
+        """
+        bulk_create не отправляет сигналов: изменения тэгов видны сразу,
+        ингредиентов — после перестроения индекса по таймауту.
+        """
+        tags_etag = self.etag('/api/tags/')
+        ingredients_etag = self.etag('/api/ingredients/')
+        Tag.objects.bulk_create([
+            Tag(name='новый', color='#ABCDEF', slug='new')
+        ])
+        Ingredient.objects.bulk_create([
+            Ingredient(name='новый', measurement_unit='г')
+        ])
+        self.assertNotEqual(self.etag('/api/tags/'), tags_etag)
+        self.assertEqual(self.etag('/api/ingredients/'), ingredients_etag)
+        with mock.patch('api.ingredient_index.INGREDIENT_INDEX_TIMEOUT', -1):
+            self.assertNotEqual(self.etag('/api/ingredients/'),
+                                ingredients_etag)
+
+    def test_update_and_delete_change_etag(self):
+        etag = self.etag('/api/tags/')
+        self.tag.name = 'другой'
+        self.tag.save()
+        updated = self.etag('/api/tags/')
+        self.assertNotEqual(updated, etag)
+        Tag.objects.filter(id=self.tag.id).delete()
+        self.assertNotEqual(self.etag('/api/tags/'), updated)
+        etag = self.etag('/api/ingredients/')
+        self.ingredient.delete()
+        self.assertNotEqual(self.etag('/api/ingredients/'), etag)
@@ -0,0 +1,76 @@
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.connections import check_thread_connections, connection_stats
+from api.tests.factories import create_user
+
+
+class FakeConnection:
+    """ Соединение Django с открытым соединением БД и его состоянием."""
+
+    def __init__(self, usable: bool, health_checks: bool = True,
+                 opened: bool = True):
+        self.alias = 'fake'
+        self.settings_dict = {'CONN_HEALTH_CHECKS': health_checks}
+        self.connection = object() if opened else None
+        self.usable = usable
+        self.close = mock.Mock()
+
+    def is_usable(self) -> bool:
+        return self.usable
+
+
+class ConnectionHealthCheckTest(TestCase):
+    """
+    Проверка постоянных соединений (CONN_MAX_AGE) перед запросом
+    (api.connections) и статистика их переиспользования.
+    """
+
+    def check(self, connection: FakeConnection) -> int:
+        """
+        Проверяет соединение и возвращает прирост колличества
+        неудачных проверок.
+        """
+        failures = connection_stats.health_check_failures['fake']
+        with mock.patch('api.connections.connections.all',
+                        return_value=[connection]):
+            check_thread_connections()
+        return connection_stats.health_check_failures['fake'] - failures
+
+    def test_broken_connection_closed(self):
+        connection = FakeConnection(usable=False)
+        self.assertEqual(self.check(connection), 1)
+        connection.close.assert_called_once()
+
+    def test_usable_connection_kept(self):
+        for connection in (FakeConnection(usable=True),
+                           FakeConnection(usable=False, health_checks=False),
+                           FakeConnection(usable=False, opened=False)):
+            with self.subTest(settings=connection.settings_dict,
+                              opened=connection.connection is not None):
+                self.assertEqual(self.check(connection), 0)
+                connection.close.assert_not_called()
+
+    def test_checked_before_request(self):
+        requests = connection_stats.requests
+        with mock.patch('api.connections.check_thread_connections') as check:
+            self.client.get('/api/tags/')
+        check.assert_called_once_with()
+        self.assertEqual(connection_stats.requests, requests + 1)
+
+    def test_report(self):
+        client = APIClient()
+        client.force_authenticate(create_user())
+        self.assertEqual(client.get('/api/connections/').status_code, 403)
+        client.force_authenticate(create_user(is_superuser=True))
+        response = client.get('/api/connections/')
+        self.assertEqual(response.status_code, 200)
+        default = response.data['databases']['default']
+        self.assertEqual(set(default), {
+            'conn_max_age', 'connections_created', 'health_check_failures',
+            'reuse_rate'
+        })
+        self.assertGreater(response.data['requests'], 0)
+        self.assertGreaterEqual(default['reuse_rate'], 0)
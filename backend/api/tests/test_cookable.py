@@ -0,0 +1,125 @@
+from array import array
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.recipe_index import IndexData, recipe_ingredient_index
+from api.tests.factories import create_ingredient, create_recipe, create_user
+from recipe.models import RecipeIngredient
+
+URL = '/api/recipes/cookable/'
+
+
+class CookableTest(TestCase):
+    """
+    Поиск рецептов по имеющимся ингредиентам (/api/recipes/cookable/)
+    по инвертированному индексу api.recipe_index.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user()
+        cls.a, cls.b, cls.c, cls.d, cls.e = (
+            create_ingredient() for _ in range(5)
+        )
+        cls.full = create_recipe(author, ingredients={cls.a: 1, cls.b: 1})
+        cls.partial = create_recipe(
+            author, ingredients={cls.a: 1, cls.b: 1, cls.c: 1, cls.d: 1}
+        )
+        cls.single = create_recipe(author, ingredients={cls.c: 1})
+        cls.other = create_recipe(author, ingredients={cls.e: 1})
+
+    def setUp(self):
+        # Рецепты созданы bulk_create без сигналов: индекс строится по БД.
+        recipe_ingredient_index.build()
+        self.client = APIClient()
+
+    def cookable(self, *ingredients, **params) -> dict:
+        response = self.client.get(URL, {
+            'ingredients': ','.join(str(ingredient.id)
+                                    for ingredient in ingredients),
+            **params
+        })
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def ranking(self, *ingredients, **params) -> list:
+        return [
+            (recipe['id'], recipe['matched_count'],
+             recipe['ingredients_count'])
+            for recipe in self.cookable(*ingredients, **params)['results']
+        ]
+
+    def test_ranked_by_coverage(self):
+        data = self.cookable(self.a, self.b, self.c)
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(
+            [(recipe['id'], recipe['matched_count'],
+              recipe['ingredients_count']) for recipe in data['results']],
+            [(self.full.id, 2, 2), (self.single.id, 1, 1),
+             (self.partial.id, 3, 4)]
+        )
+        self.assertEqual(
+            [ingredient['id']
+             for ingredient in data['results'][2]['missing_ingredients']],
+            [self.d.id]
+        )
+
+    def test_pagination(self):
+        pages = [
+            self.ranking(self.a, self.b, self.c, limit=2, page=page)
+            for page in (1, 2)
+        ]
+        self.assertEqual([len(page) for page in pages], [2, 1])
+        self.assertEqual(pages[1][0][0], self.partial.id)
+
+    def test_unknown_ingredients(self):
+        self.assertEqual(self.cookable(create_ingredient())['count'], 0)
+        for value in ('', 'abc', '0'):
+            with self.subTest(value=value):
+                response = self.client.get(URL, {'ingredients': value})
+                self.assertEqual(response.status_code, 400)
+
+    def test_index_follows_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeIngredient.objects.create(
+                recipe=self.other, ingredient=self.a, amount=1
+            )
+        self.assertIn((self.other.id, 1, 2), self.ranking(self.a))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.full.delete()
+        self.assertNotIn(self.full.id,
+                         [recipe_id for recipe_id, *_ in
+                          self.ranking(self.a, self.b)])
+
+
+class IndexDataTest(TestCase):
+    """
+    Рецепты частых ингредиентов хранятся битовыми множествами, редких —
+    массивами id, и поиск по ним одинаков.
+    """
+
+    def test_bitsets_and_postings(self):
+        index = IndexData(1000)
+        index.postings = {
+            1: array('I', range(0, 1000, 10)),
+            2: array('I', [5, 10, 999]),
+        }
+        for recipe_id in range(1000):
+            index.sizes[recipe_id] = (
+                (recipe_id % 10 == 0) + (recipe_id in (5, 10, 999))
+            )
+        index.compact()
+        self.assertEqual(set(index.bitsets), {1})
+        self.assertEqual(set(index.postings), {2})
+        self.assertEqual(index.get_bitset(2),
+                         (1 << 5) | (1 << 10) | (1 << 999))
+        index.change(999, 1, added=True)
+        index.change(20, 2, added=True)
+        index.change(5, 2, added=False)
+        self.assertTrue(index.get_bitset(1) >> 999 & 1)
+        self.assertEqual(index.get_bitset(2),
+                         (1 << 10) | (1 << 20) | (1 << 999))
+        self.assertEqual(index.sizes[999], 2)
+        self.assertTrue(index.by_size[2] >> 999 & 1)
+        self.assertEqual(index.sizes[5], 0)
@@ -0,0 +1,39 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.tests.factories import create_recipe, create_user
+from api.utils import update_counter, update_counters
+from recipe.models import Favorit, Recipe
+
+
+class CounterTest(TestCase):
+    """
+    Денормализованные счётчики (api.utils.COUNTERS) не опускаются ниже
+    нуля, даже если разошлись с фактическим колличеством записей.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.recipe = create_recipe(create_user())
+
+    def favorites_count(self) -> int:
+        return Recipe.objects.get(pk=self.recipe.pk).favorites_count
+
+    def test_decrement_stops_at_zero(self):
+        update_counter(Favorit, 1, recipe=self.recipe)
+        update_counter(Favorit, -1, recipe=self.recipe)
+        update_counter(Favorit, -1, recipe=self.recipe)
+        self.assertEqual(self.favorites_count(), 0)
+        update_counters(Favorit, 2, [self.recipe.id])
+        update_counters(Favorit, -3, [self.recipe.id])
+        self.assertEqual(self.favorites_count(), 0)
+
+    def test_unfavorite_with_stale_counter(self):
+        # Связь создана в обход API: счётчик остался нулевым.
+        Favorit.objects.create(favoriter=self.user, recipe=self.recipe)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.delete(f'/api/recipes/{self.recipe.id}/favorite/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.favorites_count(), 0)
@@ -0,0 +1,92 @@
+import base64
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.tests.factories import (create_ingredient, create_tag, create_user,
+                                 image_file, use_temporary_media)
+from recipe.models import ImageFile, Recipe
+
+URL = '/api/recipes/'
+
+
+class ImageUploadTest(TestCase):
+    """
+    Загрузка изображения рецепта строкой base64 (JSON) и файлом
+    (multipart/form-data) с ограничениями размера файла
+    (IMAGE_MAX_UPLOAD_SIZE) и сторон изображения (IMAGE_MAX_DIMENSION).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user()
+        cls.tag = create_tag()
+        cls.ingredient = create_ingredient()
+
+    def setUp(self):
+        use_temporary_media(self)
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def post_json(self, content: bytes, media_type: str = 'image/png'):
+        encoded = base64.b64encode(content).decode()
+        return self.client.post(URL, {
+            'name': 'рецепт', 'text': 'описание', 'cooking_time': 10,
+            'tags': [self.tag.id],
+            'ingredients': [{'id': self.ingredient.id, 'amount': 10}],
+            'image': f'data:{media_type};base64,{encoded}',
+        }, format='json')
+
+    def post_multipart(self, image):
+        return self.client.post(URL, {
+            'name': 'рецепт', 'text': 'описание', 'cooking_time': 10,
+            'tags': [self.tag.id],
+            'ingredients[0]id': self.ingredient.id,
+            'ingredients[0]amount': 10,
+            'image': image,
+        }, format='multipart')
+
+    def post(self, image):
+        """ Отправляет изображение обоими способами и возвращает ответы."""
+        content = image.read()
+        image.seek(0)
+        return {'json': self.post_json(content),
+                'multipart': self.post_multipart(image)}
+
+    def assert_rejected(self, responses: dict, *codes: str):
+        """ Изображение отклонено с одним из кодов ошибки codes."""
+        for upload, response in responses.items():
+            with self.subTest(upload=upload):
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(response.data['image'][0].code, codes)
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(ImageFile.objects.exists())
+
+    def test_accepted(self):
+        for upload, response in self.post(image_file()).items():
+            with self.subTest(upload=upload):
+                self.assertEqual(response.status_code, 201)
+        # Одинаковое содержимое сохраняется одним файлом.
+        self.assertEqual(
+            Recipe.objects.values('image').distinct().count(), 1
+        )
+        self.assertEqual(ImageFile.objects.get().references, 2)
+
+    @mock.patch('api.serializers.IMAGE_MAX_UPLOAD_SIZE', 1024)
+    def test_file_too_large(self):
+        image = ContentFile(image_file().read() + b'\0' * 1024,
+                            name='image.png')
+        self.assert_rejected(self.post(image), 'file_too_large')
+
+    @mock.patch('api.serializers.IMAGE_MAX_DIMENSION', 100)
+    def test_image_too_large(self):
+        self.assert_rejected(self.post(image_file(size=(101, 20))),
+                             'image_too_large')
+
+    def test_not_an_image(self):
+        self.assert_rejected(
+            self.post(ContentFile(b'not an image', name='image.png')),
+            'invalid', 'invalid_image'
+        )
@@ -0,0 +1,101 @@
+from django.core.files.storage import default_storage
+from django.test import TestCase
+from PIL import Image
+from rest_framework.test import APIClient
+
+from api.images import build_variants, process_recipe_image
+from api.tests.factories import (create_recipe, create_user, image_file,
+                                 use_temporary_media)
+from foodgram.settings import IMAGE_VARIANT_FORMATS, IMAGE_VARIANTS
+from recipe.models import Recipe
+from recipe.storage import content_addressed_storage
+
+# Тэг EXIF Orientation: 6 — изображение повёрнуто на 90° по часовой.
+EXIF_ORIENTATION = 0x0112
+
+
+class ImageVariantsTest(TestCase):
+    """ Варианты изображений рецептов разных размеров и форматов."""
+
+    def setUp(self):
+        use_temporary_media(self)
+
+    def save_image(self, **kwargs) -> str:
+        return content_addressed_storage.save('recipe/images/image.jpg',
+                                              image_file(**kwargs))
+
+    def variant_sizes(self, variants: dict) -> dict:
+        sizes = {}
+        for size_name, formats in variants.items():
+            self.assertEqual(set(formats), set(IMAGE_VARIANT_FORMATS))
+            for image_format, name in formats.items():
+                with default_storage.open(name) as file, \
+                        Image.open(file) as image:
+                    self.assertEqual(image.format.lower(), image_format)
+                    sizes[size_name] = image.size
+        return sizes
+
+    def build(self, name: str) -> dict:
+        with content_addressed_storage.open(name) as source:
+            return build_variants(source)
+
+    def test_sizes(self):
+        variants = self.build(self.save_image(size=(2000, 1000)))
+        self.assertEqual(self.variant_sizes(variants), {
+            size_name: (size, size // 2)
+            for size_name, size in IMAGE_VARIANTS.items()
+        })
+
+    def test_small_image_not_upscaled(self):
+        variants = self.build(self.save_image(size=(100, 50)))
+        self.assertEqual(
+            set(self.variant_sizes(variants).values()), {(100, 50)}
+        )
+
+    def test_exif_orientation(self):
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = 6
+        variants = self.build(self.save_image(
+            size=(400, 200), image_format='JPEG', exif=exif
+        ))
+        self.assertEqual(self.variant_sizes(variants)['thumb'],
+                         (IMAGE_VARIANTS['thumb'] // 2,
+                          IMAGE_VARIANTS['thumb']))
+
+    def test_same_content_reuses_variants(self):
+        name = self.save_image(color='green')
+        variants = self.build(name)
+        modified = default_storage.get_modified_time(
+            variants['thumb']['webp']
+        )
+        self.assertEqual(self.build(name), variants)
+        self.assertEqual(
+            default_storage.get_modified_time(variants['thumb']['webp']),
+            modified
+        )
+
+    def test_recipe_images(self):
+        name = self.save_image()
+        recipe = create_recipe(create_user(), image=name)
+        Recipe.objects.filter(pk=recipe.pk).update(image_variants={})
+        response = APIClient().get(f'/api/recipes/{recipe.id}/')
+        self.assertIsNone(response.data['images'])
+
+        process_recipe_image(recipe.id, name)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_variants['source'], name)
+        response = APIClient().get(f'/api/recipes/{recipe.id}/')
+        images = response.data['images']
+        self.assertEqual(set(images), set(IMAGE_VARIANTS))
+        self.assertTrue(images['card']['webp'].startswith('http://'))
+        self.assertTrue(images['card']['webp'].endswith(
+            recipe.image_variants['card']['webp']
+        ))
+
+    def test_replaced_image_not_saved(self):
+        recipe = create_recipe(create_user(),
+                               image=self.save_image(color='blue'))
+        Recipe.objects.filter(pk=recipe.pk).update(image_variants={})
+        process_recipe_image(recipe.id, self.save_image(color='white'))
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_variants, {})
@@ -0,0 +1,59 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.ingredient_index import ingredient_index
+from api.tests.factories import create_ingredient
+
+
+class IngredientIndexTest(TestCase):
+    """
+    Поиск ингредиентов по началу названия (/api/ingredients/?name=) по
+    индексу в памяти процесса (api.ingredient_index).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.beet = create_ingredient(name='Свёкла')
+        cls.cream = create_ingredient(name='сливки')
+        cls.butter = create_ingredient(name='Сливочное масло')
+        cls.salt = create_ingredient(name='соль')
+
+    def setUp(self):
+        ingredient_index.invalidate()
+        self.client = APIClient()
+
+    def search(self, **params) -> list:
+        response = self.client.get('/api/ingredients/', params)
+        self.assertEqual(response.status_code, 200)
+        return [ingredient['name'] for ingredient in response.data]
+
+    def test_prefix_in_alphabetical_order(self):
+        self.assertEqual(self.search(name='сли'),
+                         ['сливки', 'Сливочное масло'])
+        self.assertEqual(self.search(name='С'),
+                         ['Свёкла', 'сливки', 'Сливочное масло', 'соль'])
+        self.assertEqual(self.search(name='перец'), [])
+
+    def test_yo_folding(self):
+        for name in ('свек', 'СВЁК', 'свёкла'):
+            with self.subTest(name=name):
+                self.assertEqual(self.search(name=name), ['Свёкла'])
+
+    def test_limit(self):
+        self.assertEqual(self.search(name='с', limit=2),
+                         ['Свёкла', 'сливки'])
+        self.assertEqual(len(self.search(name='с', limit=10)), 4)
+        for limit in (0, -1, 'abc'):
+            with self.subTest(limit=limit):
+                self.assertEqual(len(self.search(name='с', limit=limit)), 4)
+
+    def test_refreshed_after_change(self):
+        self.assertEqual(self.search(name='соль'), ['соль'])
+        self.salt.name = 'Морская соль'
+        self.salt.save()
+        self.assertEqual(self.search(name='соль'), [])
+        self.assertEqual(self.search(name='мор'), ['Морская соль'])
+        create_ingredient(name='Сахар')
+        self.assertEqual(self.search(name='са'), ['Сахар'])
+        self.beet.delete()
+        self.assertEqual(self.search(name='свекла'), [])
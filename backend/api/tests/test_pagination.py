@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.tests.factories import create_recipe, create_user
+from recipe.models import Recipe
+
+
+class KeysetPaginationTest(TestCase):
+    """ Лента рецептов с пагинацией по ключу (pub_date, id)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user()
+        recipes = [create_recipe(author) for _ in range(20)]
+        now = timezone.now()
+        # Рецепты с одинаковой датой публикации идут подряд и попадают
+        # на границы страниц.
+        for number, recipe in enumerate(recipes):
+            Recipe.objects.filter(id=recipe.id).update(
+                pub_date=now - timedelta(minutes=number // 4)
+            )
+
+    def test_pages_follow_feed_order(self):
+        client = APIClient()
+        expected = list(
+            Recipe.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            )
+        )
+        received = []
+        url = '/api/recipes/?cursor=&limit=3'
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            received.extend(recipe['id']
+                            for recipe in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(received, expected)
+
+    def test_invalid_cursor(self):
+        response = APIClient().get('/api/recipes/?cursor=bad')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,86 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.middleware import PerformanceBudgetExceeded
+from api.tests.factories import (create_ingredient, create_recipe,
+                                 create_tag, create_user)
+from foodgram.settings import API_PERFORMANCE_BUDGETS
+from recipe.models import ShoppingCartUser
+
+CART_URL = '/api/recipes/download_shopping_cart/'
+
+
+class PerformanceMiddlewareTest(TestCase):
+    """
+    Заголовок Server-Timing и бюджеты эндпоинтов
+    (API_PERFORMANCE_BUDGETS). Тесты запускаются с
+    API_PERFORMANCE_BUDGETS_RAISE = True (foodgram.test_runner).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        create_tag()
+        cls.user = create_user()
+        recipe = create_recipe(create_user(),
+                               ingredients={create_ingredient(): 100})
+        ShoppingCartUser.objects.create(owner=cls.user, recipe=recipe)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user)}'
+        )
+
+    def queries_reported(self, response) -> int:
+        return int(response['Server-Timing'].split('"')[1].split()[0])
+
+    def test_server_timing(self):
+        for url in ('/api/tags/', '/api/recipes/', '/api/ingredients/'):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(self.queries_reported(response),
+                                 len(queries))
+                self.assertIn('total;dur=', response['Server-Timing'])
+
+    @override_settings(API_PERFORMANCE_BUDGETS={'tags-list': {'queries': 0}})
+    def test_budget_exceeded(self):
+        with self.assertRaisesMessage(PerformanceBudgetExceeded,
+                                      'tags-list exceeded its budget'):
+            self.client.get('/api/tags/')
+
+    @override_settings(API_PERFORMANCE_BUDGETS={'tags-list': {'queries': 0}},
+                       API_PERFORMANCE_BUDGETS_RAISE=False)
+    def test_budget_exceeded_logged(self):
+        with self.assertLogs('api.middleware', 'WARNING') as logs:
+            response = self.client.get('/api/tags/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('tags-list exceeded its budget', logs.output[0])
+
+    def test_streaming_queries_counted(self):
+        """
+        Запросы, выполненные при отдаче потокового ответа, учитываются
+        в бюджете, а заголовок помечает число запросов как неполное.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(CART_URL)
+            b''.join(response.streaming_content)
+        self.assertLess(self.queries_reported(response), len(queries))
+        self.assertIn('before streaming', response['Server-Timing'])
+        self.assertLessEqual(
+            len(queries),
+            API_PERFORMANCE_BUDGETS['recipes-download_shopping_cart'][
+                'queries'
+            ]
+        )
+        budgets = {'recipes-download_shopping_cart': {
+            'queries': len(queries) - 1
+        }}
+        with override_settings(API_PERFORMANCE_BUDGETS=budgets):
+            response = self.client.get(CART_URL)
+            with self.assertRaises(PerformanceBudgetExceeded):
+                b''.join(response.streaming_content)
@@ -0,0 +1,192 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.cache import get_recipes_data, recipe_cache_key
+from api.serializers import RECIPE_USER_FIELDS
+from api.tests.factories import (create_ingredient, create_recipe,
+                                 create_tag, create_user)
+from recipe.models import Favorit, Recipe, RecipeIngredient, RecipeTag
+
+LOCMEM_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'recipe-cache-tests',
+    }
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class RecipeCacheTest(TestCase):
+    """
+    Кэш не зависящих от пользователя представлений рецептов
+    (RecipeReadListSerializer, RecipeReadSerializer).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.author = create_user()
+        cls.tag = create_tag()
+        cls.ingredient = create_ingredient()
+        cls.recipes = [
+            create_recipe(cls.author, tags=[cls.tag],
+                          ingredients={cls.ingredient: 100})
+            for _ in range(3)
+        ]
+        cls.recipe = cls.recipes[0]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_cached(self, recipe_ids) -> dict:
+        """ Представления рецептов в кэше для их текущих версий."""
+        return get_recipes_data(Recipe.objects.filter(id__in=recipe_ids))
+
+    def get_list(self, client=None):
+        response = (client or self.client).get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        return {recipe['id']: recipe for recipe in response.data['results']}
+
+    def test_list_is_served_by_one_get_many(self):
+        self.get_list()
+        recipe_ids = [recipe.id for recipe in self.recipes]
+        self.assertEqual(set(self.get_cached(recipe_ids)), set(recipe_ids))
+        with mock.patch.object(cache, 'get_many',
+                               wraps=cache.get_many) as get_many, \
+                mock.patch.object(cache, 'set_many') as set_many:
+            with self.assertNumQueries(2):
+                self.get_list()
+        self.assertEqual(get_many.call_count, 1)
+        self.assertEqual(
+            set(get_many.call_args[0][0]),
+            {recipe_cache_key(recipe)
+             for recipe in Recipe.objects.filter(id__in=recipe_ids)}
+        )
+        set_many.assert_not_called()
+
+    def test_user_fields_are_not_cached(self):
+        Favorit.objects.create(favoriter=self.user, recipe=self.recipe)
+        self.assertTrue(self.get_list()[self.recipe.id]['is_favorited'])
+        for data in self.get_cached([self.recipe.id]).values():
+            for field in RECIPE_USER_FIELDS:
+                self.assertNotIn(field, data)
+            self.assertNotIn('is_subscribed', data['author'])
+            self.assertFalse(data['image'].startswith('http'))
+        anonymous = self.get_list(APIClient())[self.recipe.id]
+        self.assertFalse(anonymous['is_favorited'])
+        self.assertFalse(anonymous['is_in_shopping_cart'])
+        other_client = APIClient()
+        other_client.force_authenticate(create_user())
+        self.assertFalse(
+            self.get_list(other_client)[self.recipe.id]['is_favorited']
+        )
+        self.assertTrue(self.get_list()[self.recipe.id]['is_favorited'])
+
+    def assert_invalidated(self, change, recipe_ids):
+        self.get_list()
+        change()
+        self.assertFalse(self.get_cached(recipe_ids))
+        return self.get_list()
+
+    def test_recipe_save_invalidates(self):
+        def change():
+            self.recipe.name = 'новое название'
+            self.recipe.save()
+
+        recipes = self.assert_invalidated(change, [self.recipe.id])
+        self.assertEqual(recipes[self.recipe.id]['name'], 'новое название')
+        self.assertEqual(
+            len(self.get_cached([self.recipes[1].id])), 1
+        )
+
+    def test_recipe_ingredient_save_invalidates(self):
+        def change():
+            recipe_ingredient = RecipeIngredient.objects.get(
+                recipe=self.recipe
+            )
+            recipe_ingredient.amount = 5
+            recipe_ingredient.save()
+
+        recipes = self.assert_invalidated(change, [self.recipe.id])
+        self.assertEqual(
+            recipes[self.recipe.id]['ingredients'][0]['amount'], 5
+        )
+
+    def test_recipe_tag_save_invalidates(self):
+        tag = create_tag()
+        recipes = self.assert_invalidated(
+            lambda: RecipeTag.objects.create(recipe=self.recipe, tag=tag),
+            [self.recipe.id]
+        )
+        self.assertIn(
+            tag.id, [tag['id'] for tag in recipes[self.recipe.id]['tags']]
+        )
+
+    def test_ingredient_save_invalidates_all(self):
+        def change():
+            self.ingredient.name = 'соль'
+            self.ingredient.save()
+
+        recipes = self.assert_invalidated(
+            change, [recipe.id for recipe in self.recipes]
+        )
+        for recipe in recipes.values():
+            self.assertEqual(recipe['ingredients'][0]['name'], 'соль')
+
+    def test_tag_save_invalidates_all(self):
+        def change():
+            self.tag.name = 'завтрак'
+            self.tag.save()
+
+        recipes = self.assert_invalidated(
+            change, [recipe.id for recipe in self.recipes]
+        )
+        for recipe in recipes.values():
+            self.assertEqual(recipe['tags'][0]['name'], 'завтрак')
+
+    def test_author_save_invalidates_own_recipes(self):
+        other = create_recipe(create_user())
+
+        def change():
+            self.author.first_name = 'Пётр'
+            self.author.save()
+
+        recipes = self.assert_invalidated(
+            change, [recipe.id for recipe in self.recipes]
+        )
+        self.assertEqual(
+            recipes[self.recipe.id]['author']['first_name'], 'Пётр'
+        )
+        self.assertEqual(len(self.get_cached([other.id])), 1)
+
+    def test_etag_does_not_depend_on_cache(self):
+        """
+        Версия рецепта хранится в БД: ETag одинаков для всех процессов
+        и не меняется при очистке кэша, но меняется при изменении тэга.
+        """
+        url = f'/api/recipes/{self.recipe.id}/'
+        etag = self.client.get(url)['ETag']
+        cache.clear()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.tag.name = 'ужин'
+        self.tag.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['tags'][0]['name'], 'ужин')
+
+    def test_author_save_without_changes_keeps_cache(self):
+        self.get_list()
+        self.author.set_password('new-password')
+        self.author.save()
+        self.author.last_login = timezone.now()
+        self.author.save(update_fields=['last_login'])
+        self.assertEqual(
+            len(self.get_cached([recipe.id for recipe in self.recipes])), 3
+        )
@@ -0,0 +1,94 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.tests.factories import (create_ingredient, create_recipe,
+                                 create_tag, create_user)
+from recipe.models import Favorit, ShoppingCartUser
+from user.models import Subscription
+
+RECIPES = 200
+PAGE_SIZES = (6, 50, 200)
+
+
+class RecipeListQueriesTest(TestCase):
+    """
+    Колличество запросов к БД при получении списка рецептов не зависит
+    от размера страницы ни с пустым кэшем представлений, ни с
+    заполненным.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        authors = [create_user() for _ in range(5)]
+        tags = [create_tag() for _ in range(3)]
+        ingredients = [create_ingredient() for _ in range(10)]
+        cls.recipes = [
+            create_recipe(
+                authors[number % len(authors)],
+                tags=tags[:number % len(tags) + 1],
+                ingredients={
+                    ingredient: number + 1
+                    for ingredient in ingredients[:number % 4 + 1]
+                }
+            )
+            for number in range(RECIPES)
+        ]
+        Favorit.objects.bulk_create(
+            Favorit(favoriter=cls.user, recipe=recipe)
+            for recipe in cls.recipes[::3]
+        )
+        ShoppingCartUser.objects.bulk_create(
+            ShoppingCartUser(owner=cls.user, recipe=recipe)
+            for recipe in cls.recipes[::4]
+        )
+        Subscription.objects.create(user=cls.user, author=authors[0])
+
+    def setUp(self):
+        cache.clear()
+        self.anonymous_client = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_list_queries(self, client, limit, queries):
+        # count, страница рецептов с авторами, тэги и ингредиенты.
+        with self.assertNumQueries(queries):
+            response = client.get('/api/recipes/', {'limit': limit})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), limit)
+        # Представления рецептов уже в кэше: тэги и ингредиенты
+        # не загружаются.
+        with self.assertNumQueries(queries - 2):
+            response = client.get('/api/recipes/', {'limit': limit})
+        self.assertEqual(len(response.data['results']), limit)
+        return response
+
+    def test_anonymous(self):
+        for limit in PAGE_SIZES:
+            with self.subTest(limit=limit):
+                cache.clear()
+                response = self.assert_list_queries(
+                    self.anonymous_client, limit, 4
+                )
+                self.assertFalse(any(
+                    recipe['is_favorited']
+                    or recipe['is_in_shopping_cart']
+                    or recipe['author']['is_subscribed']
+                    for recipe in response.data['results']
+                ))
+
+    def test_authenticated(self):
+        favorites = set(
+            Favorit.objects.values_list('recipe_id', flat=True)
+        )
+        for limit in PAGE_SIZES:
+            with self.subTest(limit=limit):
+                cache.clear()
+                response = self.assert_list_queries(self.client, limit, 4)
+                self.assertEqual(
+                    {recipe['id'] for recipe in response.data['results']
+                     if recipe['is_favorited']},
+                    favorites & {recipe['id']
+                                 for recipe in response.data['results']}
+                )
@@ -0,0 +1,108 @@
+import re
+from collections import Counter
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.tests.factories import (create_ingredient, create_recipe,
+                                 create_tag, create_user)
+from recipe.models import RecipeIngredient
+
+WRITE = re.compile(
+    r'^(INSERT INTO|UPDATE|DELETE FROM) "(\w+)"', re.IGNORECASE
+)
+
+
+class RecipeIngredientsUpdateTest(TestCase):
+    """
+    Редактирование ингредиентов рецепта записывает в БД только
+    отличия от текущего списка.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user()
+        cls.tag = create_tag()
+        cls.ingredients = [create_ingredient() for _ in range(4)]
+        cls.recipe = create_recipe(
+            cls.author, tags=[cls.tag],
+            ingredients={ingredient: 10 * number
+                         for number, ingredient in enumerate(
+                             cls.ingredients[:3], start=1
+                         )}
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def patch_ingredients(self, amounts: dict) -> Counter:
+        """
+        Изменяет ингредиенты рецепта ({ингредиент: колличество}) и
+        возвращает колличество изменяющих запросов к таблице
+        ингредиентов рецептов по видам.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                f'/api/recipes/{self.recipe.id}/',
+                {'ingredients': [
+                    {'id': ingredient.id, 'amount': amount}
+                    for ingredient, amount in amounts.items()
+                ]},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            dict(RecipeIngredient.objects.filter(
+                recipe=self.recipe
+            ).values_list('ingredient_id', 'amount')),
+            {ingredient.id: amount for ingredient, amount in amounts.items()}
+        )
+        writes = Counter()
+        for query in queries.captured_queries:
+            match = WRITE.match(query['sql'])
+            if match and match[2] == RecipeIngredient._meta.db_table:
+                writes[match[1].split()[0].upper()] += 1
+        return writes
+
+    def current(self) -> dict:
+        return {ingredient: 10 * number
+                for number, ingredient in enumerate(self.ingredients[:3],
+                                                    start=1)}
+
+    def test_no_change(self):
+        self.assertEqual(self.patch_ingredients(self.current()), Counter())
+
+    def test_change_amount(self):
+        amounts = self.current()
+        amounts[self.ingredients[0]] = 15
+        self.assertEqual(self.patch_ingredients(amounts),
+                         Counter({'UPDATE': 1}))
+
+    def test_add_ingredient(self):
+        amounts = self.current()
+        amounts[self.ingredients[3]] = 40
+        self.assertEqual(self.patch_ingredients(amounts),
+                         Counter({'INSERT': 1}))
+
+    def test_remove_ingredient(self):
+        amounts = self.current()
+        del amounts[self.ingredients[2]]
+        self.assertEqual(self.patch_ingredients(amounts),
+                         Counter({'DELETE': 1}))
+
+    def test_tags_and_other_fields_keep_ingredients(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                f'/api/recipes/{self.recipe.id}/',
+                {'name': 'новое название', 'tags': [self.tag.id]},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if WRITE.match(query['sql'])
+            and RecipeIngredient._meta.db_table in query['sql']
+        ])
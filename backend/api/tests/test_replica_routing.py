@@ -0,0 +1,67 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connections
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+
+from api.tests.factories import create_recipe, create_tag, create_user
+from foodgram.test_runner import TEST_REPLICA
+from recipe.models import Favorit, Tag
+
+
+@mock.patch('api.middleware.DATABASE_REPLICAS', [TEST_REPLICA])
+@mock.patch('api.db_router.DATABASE_REPLICAS', [TEST_REPLICA])
+class ReplicaRoutingTest(TransactionTestCase):
+    """
+    Чтение в безопасных запросах — из реплики, запись — в основную БД,
+    после изменяющего запроса клиент читает из основной БД.
+    Реплика — отдельная тестовая БД (foodgram.test_runner.TEST_REPLICA).
+    """
+    databases = {'default', TEST_REPLICA}
+
+    def setUp(self):
+        cache.clear()
+        with connections[TEST_REPLICA].schema_editor() as editor:
+            editor.create_model(Tag)
+        create_tag(name='основная', slug='primary')
+        Tag.objects.using(TEST_REPLICA).create(
+            name='реплика', slug='replica', color='#000000'
+        )
+        self.user = create_user()
+        self.recipe = create_recipe(create_user())
+        self.client = APIClient(REMOTE_ADDR='10.0.0.1')
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        # flush не очищает реплику: таблицы в неё не мигрируются.
+        with connections[TEST_REPLICA].schema_editor() as editor:
+            editor.delete_model(Tag)
+
+    def get_tags(self, client) -> list:
+        response = client.get('/api/tags/')
+        self.assertEqual(response.status_code, 200)
+        return [tag['slug'] for tag in response.data]
+
+    def test_reads_from_replica(self):
+        self.assertEqual(self.get_tags(self.client), ['replica'])
+        self.assertEqual(self.get_tags(APIClient()), ['replica'])
+
+    def test_writes_to_primary_and_pins(self):
+        response = self.client.post(
+            f'/api/recipes/{self.recipe.id}/favorite/'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Favorit.objects.using('default').filter(
+            favoriter=self.user, recipe=self.recipe
+        ).exists())
+        self.assertEqual(self.get_tags(self.client), ['primary'])
+        other_client = APIClient(REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(self.get_tags(other_client), ['replica'])
+
+    def test_failed_write_does_not_pin(self):
+        response = self.client.delete(
+            f'/api/recipes/{self.recipe.id}/favorite/'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.get_tags(self.client), ['replica'])
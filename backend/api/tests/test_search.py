@@ -0,0 +1,69 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.tests.factories import create_recipe, create_tag, create_user
+
+
+class RecipeSearchTest(TestCase):
+    """
+    Полнотекстовый поиск рецептов (?search=) по индексу, который создаёт
+    миграция recipe 0011: в SQLite — таблица FTS5.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user()
+        cls.tag = create_tag()
+        # Рецепт с совпадением в описании создан позже: без учёта
+        # релевантности он был бы первым (сортировка по -id).
+        cls.borsch = create_recipe(
+            create_user(), name='Борщ', text='Свекла и капуста.'
+        )
+        cls.soup = create_recipe(
+            cls.author, tags=[cls.tag], name='Суп',
+            text='Лёгкий суп, к которому подают борщ.'
+        )
+        cls.pancakes = create_recipe(
+            cls.author, name='Блинчики с творогом', text='Тесто на молоке.'
+        )
+        cls.hedgehogs = create_recipe(
+            cls.author, tags=[cls.tag], name='Ёжики', text='Рис и фарш.'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def search(self, value: str, **params) -> list:
+        response = self.client.get('/api/recipes/',
+                                   {'search': value, **params})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_name_ranks_above_text(self):
+        self.assertEqual(self.search('борщ'),
+                         [self.borsch.id, self.soup.id])
+
+    def test_yo_folding(self):
+        for value in ('ежики', 'ЁЖИКИ'):
+            with self.subTest(value=value):
+                self.assertEqual(self.search(value), [self.hedgehogs.id])
+        self.assertEqual(self.search('легкий'), [self.soup.id])
+
+    def test_prefix(self):
+        self.assertEqual(self.search('блин'), [self.pancakes.id])
+        self.assertEqual(self.search('блин твор'), [self.pancakes.id])
+        self.assertEqual(self.search('блин борщ'), [])
+
+    def test_with_filters(self):
+        self.assertEqual(
+            self.search('суп', tags=self.tag.slug), [self.soup.id]
+        )
+        self.assertEqual(self.search('борщ', author=self.author.id),
+                         [self.soup.id])
+        self.assertEqual(
+            self.search('рис', tags=self.tag.slug, author=self.author.id),
+            [self.hedgehogs.id]
+        )
+
+    def test_query_without_words(self):
+        self.assertEqual(self.search('!!!'), [])
@@ -0,0 +1,63 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.tests.factories import create_ingredient, create_recipe, create_user
+from recipe.models import RecipeIngredient, ShoppingCartUser
+
+URL = '/api/recipes/download_shopping_cart/'
+
+
+class DownloadShoppingCartTest(TestCase):
+    """ Условные запросы к списку покупок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.ingredient = create_ingredient(name='мука')
+        cls.recipe = create_recipe(create_user(),
+                                   ingredients={cls.ingredient: 200})
+        ShoppingCartUser.objects.create(owner=cls.user, recipe=cls.recipe)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self, **headers):
+        response = self.client.get(URL, **headers)
+        if response.status_code == 200:
+            response.text = b''.join(response.streaming_content).decode()
+        return response
+
+    def test_not_modified(self):
+        response = self.download()
+        self.assertIn('200', response.text)
+        self.assertIn('Accept', response['Vary'])
+        not_modified = self.download(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        self.assertIn('Accept', not_modified['Vary'])
+
+    def test_format_changes_etag(self):
+        etag = self.download()['ETag']
+        response = self.download(HTTP_ACCEPT='text/csv',
+                                 HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+
+    def test_recipe_edit_changes_etag(self):
+        etag = self.download()['ETag']
+        RecipeIngredient.objects.filter(recipe=self.recipe).update(
+            amount=300
+        )
+        self.recipe.save()
+        response = self.download(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('300', response.text)
+
+    def test_ingredient_rename_changes_etag(self):
+        etag = self.download()['ETag']
+        self.ingredient.name = 'мука пшеничная'
+        self.ingredient.save()
+        response = self.download(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('мука пшеничная', response.text)
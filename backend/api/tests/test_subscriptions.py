@@ -0,0 +1,43 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.tests.factories import create_recipe, create_user
+from foodgram.settings import DEFAULT_RECIPES_LIMIT
+from user.models import Subscription
+
+URL = '/api/users/subscriptions/'
+
+
+class SubscriptionsRecipesLimitTest(TestCase):
+    """ Параметр recipes_limit списка подписок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        for _ in range(3):
+            author = create_user()
+            for _ in range(DEFAULT_RECIPES_LIMIT + 2):
+                create_recipe(author)
+            Subscription.objects.create(user=cls.user, author=author)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_recipes_count(self, params: dict, count: int):
+        response = self.client.get(URL, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 3)
+        for author in response.data['results']:
+            self.assertEqual(len(author['recipes']), count)
+
+    def test_limit(self):
+        self.assert_recipes_count({'recipes_limit': 1}, 1)
+        self.assert_recipes_count({'recipes_limit': 100},
+                                  DEFAULT_RECIPES_LIMIT + 2)
+
+    def test_default_limit(self):
+        for params in ({}, {'recipes_limit': 'abc'}, {'recipes_limit': 0},
+                       {'recipes_limit': -1}):
+            with self.subTest(params=params):
+                self.assert_recipes_count(params, DEFAULT_RECIPES_LIMIT)
@@ -0,0 +1,104 @@
+import threading
+from collections import Counter
+
+from django.db import connections
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+
+from api.tests.factories import create_recipe, create_user
+from recipe.models import Favorit, Recipe, ShoppingCartUser
+
+THREADS = 8
+
+
+class ToggleConcurrencyTest(TransactionTestCase):
+    """
+    Одновременные запросы на добавление/удаление одной и той же записи
+    избранного или списка покупок: запись создаётся/удаляется ровно один
+    раз, остальные запросы получают 400, счётчик рецепта совпадает с
+    колличеством записей.
+    """
+
+    def setUp(self):
+        self.user = create_user()
+        self.recipe = create_recipe(create_user())
+
+    def hammer(self, method: str, url: str, data_list=(None,)) -> Counter:
+        """
+        Выполняет запрос method к url одновременно из THREADS потоков
+        и возвращает колличество ответов по статусам. Потоки по очереди
+        передают данные из data_list.
+        """
+        barrier = threading.Barrier(THREADS)
+        statuses = Counter()
+        lock = threading.Lock()
+
+        def request(data):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            try:
+                barrier.wait()
+                status = getattr(client, method)(
+                    url, data, format='json'
+                ).status_code
+                with lock:
+                    statuses[status] += 1
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=request,
+                             args=(data_list[number % len(data_list)],))
+            for number in range(THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return statuses
+
+    def assert_toggle(self, action: str, model, counter: str):
+        url = f'/api/recipes/{self.recipe.id}/{action}/'
+        for _ in range(3):
+            self.assertEqual(self.hammer('post', url),
+                             Counter({200: 1, 400: THREADS - 1}))
+            self.assertEqual(model.objects.count(), 1)
+            self.assertEqual(
+                getattr(Recipe.objects.get(id=self.recipe.id), counter), 1
+            )
+            self.assertEqual(self.hammer('delete', url),
+                             Counter({204: 1, 400: THREADS - 1}))
+            self.assertEqual(model.objects.count(), 0)
+            self.assertEqual(
+                getattr(Recipe.objects.get(id=self.recipe.id), counter), 0
+            )
+
+    def test_favorite(self):
+        self.assert_toggle('favorite', Favorit, 'favorites_count')
+
+    def test_shopping_cart(self):
+        self.assert_toggle('shopping_cart', ShoppingCartUser, 'cart_count')
+
+    def test_bulk(self):
+        """
+        Массовые запросы с пересекающимися списками рецептов: счётчики
+        совпадают с колличеством записей после каждого шага.
+        """
+        author = create_user()
+        recipes = [self.recipe] + [create_recipe(author) for _ in range(5)]
+        ids = [recipe.id for recipe in recipes]
+        data_list = [{'ids': ids[number:] + ids[:number]}
+                     for number in range(len(ids))]
+        for _ in range(3):
+            for method in ('post', 'delete'):
+                statuses = self.hammer(method, '/api/recipes/favorite/bulk/',
+                                       data_list)
+                self.assertEqual(statuses, Counter({200: THREADS}))
+                expected = len(ids) if method == 'post' else 0
+                self.assertEqual(Favorit.objects.count(), expected)
+                self.assertEqual(
+                    set(Recipe.objects.filter(id__in=ids).values_list(
+                        'favorites_count', flat=True
+                    )),
+                    {expected // len(ids)}
+                )
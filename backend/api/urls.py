@@ -1,11 +1,15 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import IngredientViewSet, MyUserViewSet, RecipeViewSet, TagViewSet
+from foodgram.settings import ASYNC_VIEWS
+
+from .async_views import AsyncReadRouter
+from .views import (ConnectionStatsViewSet, IngredientViewSet, MyUserViewSet,
+                    RecipeViewSet, TagViewSet)
 
 app_name = 'api'
 
-v1_router = DefaultRouter()
+v1_router = AsyncReadRouter() if ASYNC_VIEWS else DefaultRouter()
 
 v1_router.register('users', MyUserViewSet)
 
@@ -24,6 +28,11 @@ v1_router.register(
     IngredientViewSet,
     basename='ingridients'
 )
+v1_router.register(
+    'connections',
+    ConnectionStatsViewSet,
+    basename='connections'
+)
 
 urlpatterns = [
     path('', include(v1_router.urls)),
@@ -1,6 +1,148 @@
+from django.db import connections, router, transaction
+from django.db.models import (Count, F, IntegerField, Max, OuterRef,
+                              Prefetch, Subquery)
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.sql import InsertQuery
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date
 from rest_framework import status
 from rest_framework.response import Response
 
+from recipe.models import Favorit, Recipe, RecipeIngredient, ShoppingCartUser
+from user.models import Subscription
+
+# Модель связи: (поле со связанным объектом, счётчик связанного объекта).
+COUNTERS = {
+    Favorit: ('recipe', 'favorites_count'),
+    ShoppingCartUser: ('recipe', 'cart_count'),
+    Subscription: ('author', 'followers_count'),
+    Recipe: ('author', 'recipes_count'),
+}
+
+
+def changed_counter(counter: str, delta: int):
+    """
+    Значение счётчика counter, изменённое на delta, но не меньше нуля:
+    счётчики — PositiveIntegerField, и уменьшение счётчика, разошедшегося
+    с фактическим колличеством записей (до reconcile_counters), не должно
+    нарушать ограничение поля.
+    """
+    return Greatest(F(counter) + delta, 0)
+
+
+def update_counter(model, delta: int, **kwargs) -> None:
+    """
+    Изменяет на delta счётчик объекта, на который ссылается созданная или
+    удалённая запись model (например, favorites_count рецепта для Favorit).
+    Обновление выполняется одним UPDATE с F() выражением (changed_counter)
+    и должно вызываться в той же транзакции, что и создание/удаление
+    записи.
+    """
+    if model not in COUNTERS:
+        return
+    field, counter = COUNTERS[model]
+    target = kwargs[field]
+    type(target).objects.filter(pk=target.pk).update(
+        **{counter: changed_counter(counter, delta)}
+    )
+
+
+def update_counters(model, delta: int, ids) -> None:
+    """
+    Изменяет на delta счётчики объектов с id из ids, на которые ссылаются
+    созданные или удалённые записи model, одним UPDATE (массовый вариант
+    update_counter).
+    """
+    if model not in COUNTERS or not ids:
+        return
+    field, counter = COUNTERS[model]
+    model._meta.get_field(field).related_model.objects.filter(
+        pk__in=ids
+    ).update(**{counter: changed_counter(counter, delta)})
+
+
+def actual_count(related_model, field):
+    """ Подзапрос фактического колличества связанных записей объекта."""
+    count = related_model.objects.filter(
+        **{field: OuterRef('pk')}
+    ).order_by().values(field).annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(count, output_field=IntegerField()), 0)
+
+
+def recount_counters(model, ids) -> None:
+    """
+    Пересчитывает по фактическому колличеству записей model счётчики
+    объектов с id из ids, если неизвестно, какие из записей изменены
+    текущей транзакцией, а какие — параллельными запросами.
+    Вызывается в транзакции после создания/удаления записей. Объекты
+    сначала блокируются (SELECT ... FOR UPDATE), и пересчёт следующим
+    запросом учитывает все завершённые изменения: update_counter меняет
+    счётчик после записи связи, поэтому незавершённые применят свою
+    разницу уже к пересчитанному значению.
+    """
+    if model not in COUNTERS or not ids:
+        return
+    field, counter = COUNTERS[model]
+    objects = model._meta.get_field(field).related_model.objects.filter(
+        pk__in=ids
+    )
+    list(objects.select_for_update().order_by('pk').values_list('pk'))
+    objects.update(**{counter: actual_count(model, field)})
+
+
+def author_recipes_prefetch(limit: int) -> Prefetch:
+    """
+    Prefetch последних limit рецептов каждого автора в атрибут
+    limited_recipes. Рецепты всех авторов загружаются одним запросом:
+    для каждого автора отбор ограничивается коррелированным подзапросом
+    с LIMIT.
+    """
+    latest_recipes = Recipe.objects.filter(
+        author=OuterRef('author')
+    ).order_by('-pub_date', '-id').values('id')[:limit]
+    return Prefetch(
+        'recipes',
+        queryset=Recipe.objects.filter(
+            id__in=Subquery(latest_recipes)
+        ).order_by('-pub_date', '-id'),
+        to_attr='limited_recipes'
+    )
+
+
+def recipe_ingredients_prefetch() -> Prefetch:
+    """
+    Prefetch связей рецепта с ингредиентами вместе с самими ингредиентами
+    и их колличеством. Позволяет собрать список ингредиентов рецепта без
+    дополнительных запросов к БД.
+    """
+    return Prefetch(
+        'ingredient',
+        queryset=RecipeIngredient.objects.select_related(
+            'ingredient'
+        ).order_by('ingredient_id')
+    )
+
+
+def insert_ignore(model, **kwargs) -> bool:
+    """
+    Создаёт запись model одним запросом INSERT ... ON CONFLICT DO NOTHING
+    (INSERT OR IGNORE в SQLite).
+    Returns:
+        bool: True, если запись создана, False, если такая запись уже есть.
+    """
+    using = router.db_for_write(model)
+    fields = [
+        field for field in model._meta.local_concrete_fields
+        if not field.primary_key
+    ]
+    query = InsertQuery(model, ignore_conflicts=True)
+    query.insert_values(fields, [model(**kwargs)])
+    with connections[using].cursor() as cursor:
+        for sql, params in query.get_compiler(using=using).as_sql():
+            cursor.execute(sql, params)
+        return cursor.rowcount == 1
+
 
 def check_existance_create_delete(model, method, response,
                                   serializer=None, instance=None,
@@ -12,31 +154,181 @@ def check_existance_create_delete(model, method, response,
     в зависимости от требуемой формы ответа response и сериализатора.
 
     Создание, метод POST:
-    Проверяет отсутствие экземпляра класса в переданной модели по
-    параметрам, передаваемым в **kwargs, чтобы избежать дублирования при
-    создании. В зависимости от значения response (response/redirect) может
-    сформировать Response с данными сериализатора, указанного в serializer.
+    Создаёт экземпляр класса в переданной модели по параметрам,
+    передаваемым в **kwargs, одним запросом INSERT ... ON CONFLICT DO
+    NOTHING (insert_ignore): если запись уже есть, возвращается 400, в том
+    числе при одновременных запросах. В зависимости от значения response
+    (response/redirect) может сформировать Response с данными
+    сериализатора, указанного в serializer.
 
     Удаление, метод DELETE:
-    Проверяет существование экземпляра класса в переданной модели по
-    параметрам, передаваемым в **kwargs, чтобы убедиться, что его можно
-    удалить. Возвращает Response объект с данными статуса.
+    Удаляет экземпляр класса в переданной модели по параметрам,
+    передаваемым в **kwargs, одним запросом DELETE; если ни одна запись не
+    удалена, возвращается 400. Иначе возвращает Response объект с данными
+    статуса.
+
+    Создание и удаление выполняются в одной транзакции с изменением
+    счётчика связанного объекта (update_counter).
     """
     if method == 'POST':
-        if model.objects.filter(**kwargs).exists():
+        with transaction.atomic():
+            created = insert_ignore(model, **kwargs)
+            if created:
+                update_counter(model, 1, **kwargs)
+        if not created:
             return Response('Данная запись уже существует.',
                             status=status.HTTP_400_BAD_REQUEST)
-        model.objects.create(**kwargs)
         if response == 'response':
             return Response(serializer(instance).data)
         return 'redirect'
 
-    if not model.objects.filter(**kwargs).exists():
+    with transaction.atomic():
+        deleted, _ = model.objects.filter(**kwargs).delete()
+        if deleted:
+            update_counter(model, -1, **kwargs)
+    if not deleted:
         return Response('Такой записи нет, удаление невозможно.',
                         status=status.HTTP_400_BAD_REQUEST)
-    model.objects.filter(**kwargs).delete()
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+def bulk_create_delete(model, method, field, ids, exclude=(), **kwargs):
+    """
+    Массовый вариант check_existance_create_delete: создаёт/удаляет записи
+    model, связывающие объект из **kwargs (пользователя) с объектами из
+    ids по полю field (рецепты, авторы).
+
+    Существование объектов из ids и уже созданных связей проверяется двумя
+    запросами до транзакции, создание выполняется одним
+    bulk_create(ignore_conflicts=True), удаление — одним DELETE ... IN.
+    Счётчики связанных объектов изменяются в той же транзакции: после
+    удаления — на колличество удалённых записей (update_counters), если
+    удалены все найденные связи, иначе, как и после создания,
+    пересчитываются (recount_counters).
+
+    Returns:
+        list: Результат по каждому id: {'id': id, 'status': status}, где
+            status — created/exists (POST), deleted/missing (DELETE),
+            not_found (объекта с таким id нет) или forbidden (id из exclude).
+    """
+    related_model = model._meta.get_field(field).related_model
+    ids = list(dict.fromkeys(ids))
+    found = set(
+        related_model.objects.filter(pk__in=ids).exclude(
+            pk__in=exclude
+        ).values_list('pk', flat=True)
+    )
+    existing = set(
+        model.objects.filter(
+            **kwargs, **{f'{field}__in': found}
+        ).values_list(f'{field}_id', flat=True)
+    )
+    # Транзакция начинается с записи: в SQLite чтение перед записью в
+    # одной транзакции при параллельной записи завершается ошибкой
+    # "database is locked" без ожидания блокировки.
+    with transaction.atomic():
+        if method == 'POST':
+            changed = sorted(
+                pk for pk in ids if pk in found and pk not in existing
+            )
+            model.objects.bulk_create(
+                [model(**kwargs, **{f'{field}_id': pk}) for pk in changed],
+                ignore_conflicts=True
+            )
+            # Записи, которые параллельный запрос создал после проверки,
+            # пропущены, но не отличимы от созданных.
+            recount_counters(model, changed)
+            statuses = ('created', 'exists')
+        else:
+            changed = [pk for pk in ids if pk in existing]
+            deleted = 0
+            if changed:
+                deleted, _ = model.objects.filter(
+                    **kwargs, **{f'{field}__in': changed}
+                ).delete()
+            if deleted == len(changed):
+                update_counters(model, -1, changed)
+            else:
+                # Часть записей удалил параллельный запрос.
+                recount_counters(model, changed)
+            statuses = ('deleted', 'missing')
+
+    changed = set(changed)
+    results = []
+    for pk in ids:
+        if pk in exclude:
+            result = 'forbidden'
+        elif pk not in found:
+            result = 'not_found'
+        else:
+            result = statuses[0] if pk in changed else statuses[1]
+        results.append({'id': pk, 'status': result})
+    return results
+
+
+def get_catalog_version(model) -> tuple:
+    """
+    Версия справочника (тэги, ингредиенты) по состоянию БД: колличество
+    записей и время последнего изменения (updated_at) в микросекундах.
+    Одинакова во всех процессах и меняется и при изменениях без сигналов
+    (bulk_create команд загрузки данных). Удаление меняет колличество,
+    QuerySet.update должен задавать updated_at явно.
+    Максимум updated_at берётся из индекса поля.
+    Returns:
+        tuple: (колличество, время изменения).
+    """
+    state = model.objects.order_by().aggregate(
+        count=Count('id'), updated_at=Max('updated_at')
+    )
+    updated_at = state['updated_at']
+    return state['count'], (
+        int(updated_at.timestamp() * 10 ** 6) if updated_at else 0
+    )
+
+
+def get_recipe_etag(recipe_id: int, version: int, flags) -> str:
+    """
+    ETag представления рецепта: версия представления
+    (api.cache.recipe_version) и флаги текущего пользователя
+    (избранное, список покупок, подписка на автора).
+    """
+    flags = ''.join(str(int(bool(flag))) for flag in flags)
+    return f'W/"recipe-{recipe_id}-{version}-{flags}"'
+
+
+def get_not_modified_response(request, etag: str, last_modified=None,
+                              vary=(), **cache_control):
+    """
+    Проверяет условный запрос (If-None-Match, If-Modified-Since) до
+    сериализации ответа.
+    Returns:
+        HttpResponseNotModified: Ответ 304 с заголовками set_validators,
+            если у клиента актуальная версия, иначе None.
+    """
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        return None
+    return set_validators(response, etag, last_modified, vary,
+                          **cache_control)
+
+
+def set_validators(response, etag: str, last_modified=None, vary=(),
+                   **cache_control):
+    """
+    Добавляет в ответ ETag, Last-Modified (время, сек., если передано),
+    Cache-Control с параметрами cache_control и Vary по заголовкам vary.
+    """
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    if cache_control:
+        patch_cache_control(response, **cache_control)
+    if vary:
+        patch_vary_headers(response, vary)
+    return response
+
+
 if __name__ == '__main__':
     pass
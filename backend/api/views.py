@@ -1,30 +1,45 @@
 from django.contrib.auth import get_user_model
-from django.db.models import Count, F, Sum
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import (BooleanField, Count, Exists, F, Max, OuterRef,
+                              Sum, Value)
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
-from django.utils import timezone
+from django.utils.http import quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
-from api.filters import IngredientFilter, RecipeFilter
-from api.permissions import IsAuthorAdminOrReadOnly
-from api.serializers import (IngredientSerializer, PasswordSerializer,
-                             RecipeSerializer, RecipesShortSerializer,
-                             SignUpSerializer, SubscriptionsSerializer,
-                             TagSerializer, UserSerializer)
-from api.utils import check_existance_create_delete
+from api.async_views import defer_user_flags
+from api.cache import recipe_version
+from api.connections import connection_stats
+from api.filters import RecipeFilter
+from api.ingredient_index import ingredient_index
+from api.paginators import (RecipeResultsSetPagination,
+                            StandardResultsSetPagination)
+from api.permissions import IsAdmin, IsAuthorAdminOrReadOnly
+from api.recipe_index import recipe_ingredient_index
+from api.renderers import (ShoppingListCSVRenderer, ShoppingListJSONRenderer,
+                           ShoppingListTextRenderer)
+from api.serializers import (BulkIdsSerializer, CookableSerializer,
+                             IngredientSerializer, PasswordSerializer,
+                             RecipeReadSerializer, RecipeSerializer,
+                             RecipesShortSerializer, SignUpSerializer,
+                             SubscriptionsSerializer, TagSerializer,
+                             UserSerializer)
+from api.utils import (author_recipes_prefetch, bulk_create_delete,
+                       check_existance_create_delete, get_catalog_version,
+                       get_not_modified_response, get_recipe_etag,
+                       set_validators, update_counter)
+from foodgram.settings import (CATALOG_MAX_AGE, DEFAULT_RECIPES_LIMIT,
+                               RECIPE_MAX_AGE)
 from recipe.models import Favorit, Ingredient, Recipe, ShoppingCartUser, Tag
 from user.models import Subscription
 
 User = get_user_model()
 
 
-DATE_TIME_FORMAT = '%d/%m/%Y %H:%M'
-
-
 class MyUserViewSet(mixins.CreateModelMixin,
                     mixins.RetrieveModelMixin,
                     mixins.ListModelMixin,
@@ -79,7 +94,7 @@ class MyUserViewSet(mixins.CreateModelMixin,
         serializer = PasswordSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user.set_password(request.data['new_password'])
-        user.save()
+        user.save(update_fields=['password'])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False,
@@ -90,25 +105,35 @@ class MyUserViewSet(mixins.CreateModelMixin,
         """
         Экшен для получения данных об авторах, находящихся в подписках у
         актуального пользователя, а так же их подписках.
+        Последние recipes_limit рецептов всех авторов страницы загружаются
+        одним запросом, флаг подписки берётся из queryset.
+        Нечисловой или неположительный recipes_limit заменяется значением
+        по умолчанию.
         Только GET запросы.
         """
+        try:
+            recipes_limit = int(request.query_params['recipes_limit'])
+        except (KeyError, ValueError):
+            recipes_limit = DEFAULT_RECIPES_LIMIT
+        if recipes_limit <= 0:
+            recipes_limit = DEFAULT_RECIPES_LIMIT
         queryset = User.objects.filter(
             following__user=self.request.user
-        ).annotate(recipes_count=Count('recipes'))
+        ).annotate(
+            is_subscribed=Value(True, output_field=BooleanField())
+        ).prefetch_related(
+            author_recipes_prefetch(recipes_limit)
+        ).order_by('id')
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = SubscriptionsSerializer(page, many=True)
             serializer.context['request'] = request
-            serializer.context[
-                'recipes_limit'
-            ] = request.query_params.get('recipes_limit')
+            serializer.context['recipes_limit'] = recipes_limit
             return self.get_paginated_response(serializer.data)
 
         serializer = SubscriptionsSerializer(queryset, many=True)
         serializer.context['request'] = request
-        serializer.context[
-            'recipes_limit'
-        ] = request.query_params.get('recipes_limit')
+        serializer.context['recipes_limit'] = recipes_limit
         return Response(serializer.data)
 
     @action(detail=True,
@@ -143,6 +168,26 @@ class MyUserViewSet(mixins.CreateModelMixin,
             pk=author.id
         )
 
+    @action(detail=False,
+            methods=['post', 'delete'],
+            permission_classes=[IsAuthenticated],
+            url_path='subscribe/bulk'
+            )
+    def subscribe_bulk(self, request):
+        """
+        Экшен для массовой подписки на авторов/отписки от авторов
+        api/users/subscribe/bulk/ со списком id авторов {"ids": [...]}.
+        Возвращает результат по каждому id (bulk_create_delete).
+        Только POST, DELETE запросы.
+        """
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = bulk_create_delete(Subscription, request.method, 'author',
+                                     serializer.validated_data['ids'],
+                                     exclude=(request.user.id,),
+                                     user=request.user)
+        return Response({'results': results})
+
 
 class RecipeViewSet(mixins.CreateModelMixin,
                     mixins.DestroyModelMixin,
@@ -166,12 +211,44 @@ class RecipeViewSet(mixins.CreateModelMixin,
     serializer_class = RecipeSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    pagination_class = RecipeResultsSetPagination
+    cursor_pagination = False
     queryset = Recipe.objects.select_related(
         'author'
-    ).all(
-    ).prefetch_related(
-        'tags', 'ingredients'
-    )
+    ).all()
+
+    def get_serializer_class(self):
+        if self.action in ('list', 'retrieve', 'cookable'):
+            return RecipeReadSerializer
+        return self.serializer_class
+
+    def get_queryset(self):
+        """
+        Аннотирует queryset флагами is_favorited, is_in_shopping_cart и
+        author_is_subscribed для текущего пользователя, чтобы сериализатор
+        не делал отдельных запросов к БД для каждого рецепта.
+        Под ASGI флаги запрашиваются одновременно с представлением
+        (api.async_views), и queryset ими не аннотируется.
+        """
+        queryset = super().get_queryset()
+        user = self.request.user
+        if not user.is_authenticated or defer_user_flags.get():
+            return queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+                author_is_subscribed=Value(False, output_field=BooleanField())
+            )
+        return queryset.annotate(
+            is_favorited=Exists(Favorit.objects.filter(
+                favoriter=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCartUser.objects.filter(
+                owner=user, recipe=OuterRef('pk')
+            )),
+            author_is_subscribed=Exists(Subscription.objects.filter(
+                user=user, author=OuterRef('author')
+            ))
+        )
 
     @action(detail=True,
             methods=['post', 'delete'])
@@ -221,57 +298,203 @@ class RecipeViewSet(mixins.CreateModelMixin,
                                              owner=current_user,
                                              recipe=recipe)
 
+    @action(detail=False)
+    def cookable(self, request):
+        """Рецепты, которые можно приготовить из имеющихся ингредиентов.
+
+        Рецепты ищутся в инвертированном индексе ингредиентов
+        (api.recipe_index) и ранжируются по покрытию: доле ингредиентов
+        рецепта, которые есть у пользователя. Из БД загружаются только
+        рецепты страницы.
+
+        Args:
+            request (WSGIRequest): Объект запроса с id имеющихся
+                ингредиентов через запятую ?ingredients=1,2,3.
+
+        Returns:
+            Responce: Страница рецептов, каждый дополнен колличеством
+                ингредиентов (ingredients_count), имеющихся из них
+                (matched_count) и списком недостающих
+                (missing_ingredients).
+        """
+        serializer = CookableSerializer(data={'ingredients': [
+            value
+            for param in request.query_params.getlist('ingredients')
+            for value in param.split(',') if value
+        ]})
+        serializer.is_valid(raise_exception=True)
+        available = set(serializer.validated_data['ingredients'])
+        paginator = StandardResultsSetPagination()
+        page = paginator.paginate_queryset(
+            recipe_ingredient_index.search(available), request, view=self
+        )
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _ in page]
+        )
+        data = self.get_serializer(
+            [recipes[recipe_id] for recipe_id, _ in page
+             if recipe_id in recipes],
+            many=True
+        ).data
+        for recipe_data in data:
+            missing = [
+                ingredient for ingredient in recipe_data['ingredients']
+                if ingredient['id'] not in available
+            ]
+            recipe_data['ingredients_count'] = len(
+                recipe_data['ingredients']
+            )
+            recipe_data['matched_count'] = (
+                recipe_data['ingredients_count'] - len(missing)
+            )
+            recipe_data['missing_ingredients'] = missing
+        return paginator.get_paginated_response(data)
+
+    @action(detail=False,
+            methods=['post', 'delete'],
+            url_path='favorite/bulk')
+    def favorite_bulk(self, request):
+        """Добавляет/удалет список рецептов в `избранное`.
+
+        Args:
+            request (WSGIRequest): Объект запроса со списком id рецептов
+                {"ids": [...]}.
+
+        Returns:
+            Responce: Результат по каждому id (bulk_create_delete).
+        """
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = bulk_create_delete(Favorit, request.method, 'recipe',
+                                     serializer.validated_data['ids'],
+                                     favoriter=request.user)
+        return Response({'results': results})
+
+    @action(detail=False,
+            methods=['post', 'delete'],
+            url_path='shopping_cart/bulk')
+    def shopping_cart_bulk(self, request):
+        """Добавляет/удалет список рецептов в `список покупок`.
+
+        Args:
+            request (WSGIRequest): Объект запроса со списком id рецептов
+                {"ids": [...]}.
+
+        Returns:
+            Responce: Результат по каждому id (bulk_create_delete).
+        """
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = bulk_create_delete(ShoppingCartUser, request.method,
+                                     'recipe',
+                                     serializer.validated_data['ids'],
+                                     owner=request.user)
+        return Response({'results': results})
+
     @action(detail=False,
             methods=['get'],
-            permission_classes=[IsAuthenticated])
+            permission_classes=[IsAuthenticated],
+            renderer_classes=[ShoppingListTextRenderer,
+                              ShoppingListCSVRenderer,
+                              ShoppingListJSONRenderer])
     def download_shopping_cart(self, request):
-        """Скачивает файл *.txt со списком покупок.
+        """Скачивает файл со списком покупок.
 
-        Возвращает текстовый файл со списком ингредиентов из рецептов,
+        Возвращает файл со списком ингредиентов из рецептов,
         добавленных в корзину для покупки.
-        Колличесвто повторяющихся ингридиентов суммированно.
+        Колличесвто повторяющихся ингридиентов суммированно одним
+        агрегирующим запросом, результат которого отдаётся потоком.
+        Формат файла выбирается параметром запроса format: txt (по умолчанию),
+        csv или json.
+        Ответ содержит ETag состояния корзины: её размера, последнего
+        добавленного рецепта, даты изменения рецептов корзины и версии
+        ингредиентов. При совпадении с переданным If-None-Match
+        возвращается 304 без построения списка.
         Вызов метода через url:  */recipes/download_shopping_cart/.
 
         Args:
             request (WSGIRequest): Объект запроса.
 
         Returns:
-            Responce: Ответ с текстовым файлом.
+            StreamingHttpResponse: Ответ с файлом списка покупок.
         """
         user = self.request.user
-        if not ShoppingCartUser.objects.filter(
-                owner=user
-        ).exists():
+        cart = ShoppingCartUser.objects.filter(owner=user).aggregate(
+            count=Count('id'), last_id=Max('id'),
+            updated_at=Max('recipe__updated_at')
+        )
+        if not cart['count']:
             return Response(
                 'Корзина покупок пользователя пуста.',
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        filename = f'{user.username}_shopping_list.txt'
-        shopping_list = [
-            f'Список покупок для:\n\n{user.first_name}\n'
-            f'Дата: {timezone.now().strftime(DATE_TIME_FORMAT)}\n'
-        ]
+        renderer = request.accepted_renderer
+        etag = quote_etag('-'.join(map(str, (
+            renderer.format, cart['count'], cart['last_id'],
+            int(cart['updated_at'].timestamp() * 10 ** 6),
+            *get_catalog_version(Ingredient)
+        ))))
+        # Формат файла может выбираться заголовком Accept.
+        validators = {'private': True, 'no_cache': True,
+                      'vary': ('Accept', 'Authorization')}
+        response = get_not_modified_response(request, etag, **validators)
+        if response is not None:
+            return response
 
         ingredients = Ingredient.objects.filter(
             recipe__recipe__in_shopping_cart__owner=user
         ).values(
             'name',
             measurement=F('measurement_unit')
-        ).annotate(amount=Sum('recipe__amount'))
-
-        for ing in ingredients:
-            shopping_list.append(
-                f'{ing["name"]}: {ing["amount"]} {ing["measurement"]}'
-            )
+        ).annotate(amount=Sum('recipe__amount')).order_by('name')
 
-        shopping_list.append('\nХороших покупок! Твой Foodgram')
-        shopping_list = '\n'.join(shopping_list)
-        response = HttpResponse(
-            shopping_list, content_type='text.txt; charset=utf-8'
+        filename = f'{user.username}_shopping_list.{renderer.format}'
+        response = StreamingHttpResponse(
+            renderer.stream(user, ingredients.iterator()),
+            content_type=f'{renderer.media_type}; charset=utf-8'
         )
         response['Content-Disposition'] = f'attachment; filename={filename}'
-        return response
+        return set_validators(response, etag, **validators)
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Рецепт с поддержкой условных запросов: ETag строится по версии
+        представления рецепта (дате изменения, которую меняют и правки
+        его тэгов, ингредиентов и автора) и флагам текущего пользователя
+        из queryset, поэтому ответ 304 отдаётся без сериализации.
+        Last-Modified и публичное кэширование — только для анонимных
+        пользователей: флаги пользователя не меняют дату изменения.
+        """
+        recipe = self.get_object()
+        version = recipe_version(recipe)
+        if request.user.is_authenticated:
+            validators = {'last_modified': None, 'private': True,
+                          'no_cache': True}
+        else:
+            validators = {'last_modified': version // 10 ** 6, 'public': True,
+                          'max_age': RECIPE_MAX_AGE}
+        validators['vary'] = ('Authorization',)
+        if defer_user_flags.get():
+            # Флаги пользователя ещё не получены: ETag и условный запрос
+            # проверяет async_view после их подстановки.
+            response = Response(self.get_serializer(recipe).data)
+            response.recipe_validators = (version, validators)
+            return response
+        etag = get_recipe_etag(recipe.id, version, (
+            recipe.is_favorited, recipe.is_in_shopping_cart,
+            recipe.author_is_subscribed
+        ))
+        response = get_not_modified_response(request, etag, **validators)
+        if response is not None:
+            return response
+        serializer = self.get_serializer(recipe)
+        return set_validators(Response(serializer.data), etag, **validators)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            update_counter(Recipe, -1, author=instance.author)
 
     def update(self, request, *args, **kwargs):
         """
@@ -284,7 +507,39 @@ class RecipeViewSet(mixins.CreateModelMixin,
         return super().update(request, *args, **kwargs)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class VersionedCatalogMixin:
+    """
+    Условные запросы к справочникам (тэги, ингредиенты): ETag и
+    Last-Modified строятся по версии справочника (get_version):
+    колличеству записей и времени последнего изменения. Ответ 304
+    отдаётся без сериализации.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
+
+    def get_version(self) -> tuple:
+        """ Версия справочника в БД (один агрегирующий запрос)."""
+        return get_catalog_version(self.queryset.model)
+
+    def conditional(self, view, request, *args, **kwargs):
+        count, updated_at = self.get_version()
+        etag = f'W/"{self.basename}-{count}-{updated_at}"'
+        validators = {'last_modified': updated_at // 10 ** 6,
+                      'public': True, 'max_age': CATALOG_MAX_AGE}
+        response = get_not_modified_response(request, etag, **validators)
+        if response is not None:
+            return response
+        response = view(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            set_validators(response, etag, **validators)
+        return response
+
+
+class TagViewSet(VersionedCatalogMixin, viewsets.ReadOnlyModelViewSet):
     """
     Работает с тэгами.
     Изменение и создание тэгов разрешено только админам.
@@ -294,7 +549,8 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(VersionedCatalogMixin,
+                        viewsets.ReadOnlyModelViewSet):
     """
     Работет с ингредиентами.
     Изменение и создание ингредиентов разрешено только админам.
@@ -302,5 +558,59 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
-    filter_backends = [IngredientFilter]
-    search_fields = ('^name',)
+
+    def get_version(self) -> tuple:
+        """
+        Версия ингредиентов, из которых построен индекс в памяти процесса:
+        ответы отдаются из индекса, и 304 отдаётся без запросов к БД.
+        """
+        return ingredient_index.version()
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(self.search, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(self.get_ingredient, request, *args,
+                                **kwargs)
+
+    def get_ingredient(self, request, pk=None):
+        """ Ингредиент по id из индекса в памяти процесса."""
+        try:
+            ingredient = ingredient_index.get(int(pk))
+        except ValueError:
+            ingredient = None
+        if ingredient is None:
+            raise Http404
+        return Response(ingredient)
+
+    def search(self, request, *args, **kwargs):
+        """
+        Список ингредиентов для автодополнения.
+        Ищет по началу названия (параметр name) в индексе в памяти процесса
+        без обращения к БД. Параметр limit ограничивает колличество
+        результатов. Ингредиенты отдаются в алфавитном порядке, а не по id,
+        как при выборке из БД: для автодополнения сначала идут ближайшие
+        к введённому началу названия.
+        """
+        try:
+            limit = int(request.query_params['limit'])
+        except (KeyError, ValueError):
+            limit = None
+        if limit is not None and limit <= 0:
+            limit = None
+        return Response(ingredient_index.search(
+            request.query_params.get('name', ''), limit
+        ))
+
+
+class ConnectionStatsViewSet(viewsets.ViewSet):
+    """
+    Статистика соединений с БД процесса, обработавшего запрос:
+    колличество запросов, открытых соединений и доля запросов,
+    обслуженных уже открытым соединением (api.connections).
+    Только для админов.
+    """
+    permission_classes = [IsAdmin]
+
+    def list(self, request):
+        return Response(connection_stats.report())
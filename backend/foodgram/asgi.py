@@ -0,0 +1,9 @@
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+# Читающие эндпоинты API обслуживаются асинхронно (api.async_views).
+os.environ.setdefault('ASYNC_VIEWS', 'true')
+
+application = get_asgi_application()
@@ -34,6 +34,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.PerformanceMiddleware',
+    'api.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,6 +65,8 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+TEST_RUNNER = 'foodgram.test_runner.FoodgramTestRunner'
+
 
 DATABASES = {
     'default': {
@@ -72,6 +76,70 @@ DATABASES = {
         'PASSWORD': os.environ.get('POSTGRES_PASSWORD'),
         'HOST': os.environ.get('DB_HOST'),
         'PORT': os.environ.get('DB_PORT'),
+        # Постоянные соединения: время жизни соединения, сек. (0 — новое
+        # соединение на каждый запрос) и проверка соединения перед
+        # запросом (api.connections).
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': (
+            os.environ.get('DB_CONN_HEALTH_CHECKS', 'true').lower() == 'true'
+        ),
+        # За пулером соединений в режиме transaction (PgBouncer) курсоры
+        # на стороне сервера (QuerySet.iterator()) не работают.
+        'DISABLE_SERVER_SIDE_CURSORS': (
+            os.environ.get('DB_POOLER', '').lower() == 'pgbouncer'
+        ),
+    }
+}
+if not DATABASES['default']['ENGINE'].endswith('sqlite3'):
+    DATABASES['default']['OPTIONS'] = {
+        'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+    }
+
+# Реплики основной БД для чтения (api.db_router.ReplicaRouter):
+# DB_REPLICAS — список через запятую адресов host[:port] реплик PostgreSQL
+# (для SQLite — путей к файлам копий БД).
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+    filter(None, os.environ.get('DB_REPLICAS', '').split(',')), start=1
+):
+    DATABASES[f'replica{number}'] = dict(
+        DATABASES['default'], TEST={'MIRROR': 'default'}
+    )
+    if DATABASES['default']['ENGINE'].endswith('sqlite3'):
+        DATABASES[f'replica{number}']['NAME'] = replica.strip()
+    else:
+        host, _, port = replica.strip().partition(':')
+        DATABASES[f'replica{number}']['HOST'] = host
+        DATABASES[f'replica{number}']['PORT'] = (
+            port or DATABASES['default']['PORT']
+        )
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['api.db_router.ReplicaRouter']
+
+# После изменяющего запроса пользователь (по токену, а без токена — по
+# IP адресу) читает из основной БД в течение этого срока, чтобы видеть
+# свои изменения, пока они доходят до реплик, сек.
+REPLICA_PIN_TIMEOUT = 10
+
+# Обслуживание через ASGI (foodgram.asgi включает ASYNC_VIEWS): читающие
+# эндпоинты API выполняются в пуле из ASYNC_VIEW_WORKERS потоков
+# (api.async_views), у каждого потока своё постоянное соединение с БД.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'false').lower() == 'true'
+ASYNC_VIEW_WORKERS = int(os.environ.get('ASYNC_VIEW_WORKERS', 8))
+# Флаги пользователя в рецептах запрашиваются отдельными одновременными
+# запросами (api.async_views.async_view), а не подзапросами в запросе
+# рецептов. Выигрыш есть только при сетевой задержке до БД, поэтому для
+# SQLite по умолчанию выключено.
+ASYNC_USER_FLAGS = os.environ.get(
+    'ASYNC_USER_FLAGS',
+    str(not DATABASES['default']['ENGINE'].endswith('sqlite3'))
+).lower() == 'true'
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
@@ -135,3 +203,72 @@ PASSWORD_RESET_TIMEOUT = 60 * 60  # 1 hour
 DEFAULT_RECIPES_LIMIT = 2
 
 DEFAULT_PAGE_SIZE = 6
+
+RECIPE_CACHE_TIMEOUT = 60 * 60 * 24  # 1 day
+
+INGREDIENT_INDEX_TIMEOUT = 60 * 5  # 5 minutes
+
+# Период перестройки индекса поиска рецептов по ингредиентам
+# (api.recipe_index) для учёта изменений из других процессов.
+RECIPE_INDEX_TIMEOUT = 60 * 5  # 5 minutes
+
+# Время кэширования ответов (Cache-Control: max-age), сек.: тэги и
+# ингредиенты, рецепт для анонимных пользователей. Ответы с ETag
+# перепроверяются условными запросами.
+CATALOG_MAX_AGE = 60 * 5  # 5 minutes
+RECIPE_MAX_AGE = 60
+
+# Варианты изображений рецептов (api.images): наибольшая сторона
+# варианта, пикс., форматы, качество сжатия и колличество потоков обработки
+# (0 — обработка сразу после сохранения рецепта, без пула потоков).
+IMAGE_VARIANTS = {
+    'thumb': 160,
+    'card': 480,
+    'full': 1280,
+}
+IMAGE_VARIANT_FORMATS = ('webp', 'jpeg')
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_VARIANTS_DIR = 'recipe/variants/'
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', default=2))
+
+# Ограничения загружаемых изображений рецептов: размер файла, байт, и
+# наибольшая сторона, пикс. Размеры проверяются по заголовку файла до
+# декодирования изображения.
+IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024  # 20 MB
+IMAGE_MAX_DIMENSION = 8000
+
+# Файлы изображений без ссылок удаляются командой collect_images не ранее,
+# чем через этот срок после последнего изменения, сек.
+IMAGE_GC_GRACE_PERIOD = 60 * 60 * 24  # 1 day
+
+# Файлы из multipart/form-data запросов сразу пишутся во временный файл,
+# а не собираются в памяти.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Максимальное колличество id в одном запросе массового добавления/удаления
+# (избранное, корзина покупок, подписки).
+BULK_MAX_IDS = 100
+
+# Бюджеты эндпоинтов API (basename вьюсета-действие) для
+# api.middleware.PerformanceMiddleware: колличество SQL запросов
+# (с учётом проверки токена) и общее время, мс.
+API_PERFORMANCE_BUDGETS = {
+    'recipes-list': {'queries': 5, 'time': 500},
+    'recipes-retrieve': {'queries': 4, 'time': 300},
+    'recipes-download_shopping_cart': {'queries': 4},
+    'tags-list': {'queries': 3, 'time': 100},
+    'ingridients-list': {'queries': 2, 'time': 100},
+    'user-subscriptions': {'queries': 5, 'time': 300},
+}
+# Превышение бюджета — исключение, а не предупреждение в логе (в тестах
+# включается foodgram.test_runner).
+API_PERFORMANCE_BUDGETS_RAISE = False
+
+# Популярность рецептов (команда update_recipe_scores): вес добавления
+# в избранное и в корзину покупок и период полураспада вклада добавления
+# в популярность за последнее время (trending), сек.
+FAVORITE_SCORE_WEIGHT = 2
+CART_SCORE_WEIGHT = 1
+TRENDING_HALF_LIFE = 60 * 60 * 24 * 3  # 3 days
@@ -0,0 +1,48 @@
+import os
+
+from django.conf import settings
+from django.db import connections
+from django.test.runner import DiscoverRunner
+
+from foodgram.settings import BASE_DIR
+
+# Реплика для тестов чтения из реплик (api.tests.test_replica_routing):
+# отдельная от основной тестовая БД, а не её зеркало, чтобы тесты видели,
+# из какой БД прочитаны данные. Миграции в реплики не применяются
+# (ReplicaRouter.allow_migrate), таблицы создают тесты.
+TEST_REPLICA = 'replica'
+
+
+class FoodgramTestRunner(DiscoverRunner):
+    """
+    Запуск тестов (manage.py test) с настройками, нужными только тестам.
+    Тестовые БД SQLite создаются в файлах test_<alias>.sqlite3, а не в
+    памяти: общая БД в памяти блокирует таблицы при одновременной записи
+    из нескольких потоков без ожидания, и тесты конкурентных запросов
+    падают. Файлы удаляются после тестов.
+    Превышение бюджета эндпоинта (API_PERFORMANCE_BUDGETS) в тестах —
+    ошибка запроса, а не предупреждение в логе.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.API_PERFORMANCE_BUDGETS_RAISE = True
+
+    def setup_databases(self, **kwargs):
+        self.add_test_replica()
+        for alias in connections:
+            database = connections.databases[alias]
+            test = database.setdefault('TEST', {})
+            if (database['ENGINE'].endswith('sqlite3')
+                    and not test.get('NAME') and not test.get('MIRROR')):
+                test['NAME'] = os.path.join(BASE_DIR,
+                                            f'test_{alias}.sqlite3')
+        return super().setup_databases(**kwargs)
+
+    def add_test_replica(self) -> None:
+        """ Добавляет БД TEST_REPLICA с настройками основной БД."""
+        default = connections.databases['default']
+        replica = dict(default, TEST={})
+        if not default['ENGINE'].endswith('sqlite3'):
+            replica['TEST']['NAME'] = f'test_{default["NAME"]}_replica'
+        connections.databases.setdefault(TEST_REPLICA, replica)
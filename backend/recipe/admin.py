@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import (Favorit, Ingredient, Recipe, RecipeIngredient, RecipeTag,
+from .models import (Ingredient, Recipe, RecipeIngredient, RecipeTag,
                      ShoppingCartUser, Tag)
 
 admin.site.register(Tag)
@@ -20,14 +20,16 @@ class RecipeTagAdmin(admin.TabularInline):
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     """Настройки отображения данных таблицы Recipe."""
-    list_display = ('pk', 'name', 'author', 'in_favorits')
+    list_display = ('pk', 'name', 'author', 'in_favorits', 'cart_count')
     list_filter = ('name', 'author', 'tags')
     search_fields = ('name', 'author', 'tags')
+    list_select_related = ('author',)
     inlines = (RecipeIngredientAdmin, RecipeTagAdmin,)
 
     def in_favorits(self, obj):
-        return Favorit.objects.filter(recipe=obj).count()
+        return obj.favorites_count
     in_favorits.short_description = 'В избранном'
+    in_favorits.admin_order_field = 'favorites_count'
 
 
 @admin.register(Ingredient)
@@ -0,0 +1,346 @@
+import json
+import platform
+import random
+import re
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Exists, Max, Min, OuterRef
+from django.test import override_settings
+from django.urls import include, path
+from rest_framework import filters, viewsets
+from rest_framework.test import APIClient
+
+from api.middleware import QueryCounter
+from api.paginators import KeysetPagination
+from api.serializers import IngredientSerializer
+from foodgram.settings import DEFAULT_PAGE_SIZE
+from recipe.models import (Favorit, Ingredient, Recipe, RecipeIngredient,
+                           ShoppingCartUser, Tag)
+from user.models import Subscription
+
+User = get_user_model()
+
+DEFAULT_REQUESTS = 200
+DEFAULT_WARMUP = 10
+# Страница ленты для сравнения постраничной пагинации (OFFSET) и
+# пагинации по ключу на глубоких страницах.
+DEEP_PAGE = 1000
+# Колличество объектов каждого вида, из которых выбираются параметры
+# запросов.
+SAMPLE_SIZE = 100
+
+# Сценарий: (имя, требуется ли авторизация, шаблон пути). Поля шаблона
+# заменяются случайными значениями из выборок данных БД (см. samples).
+SCENARIOS = (
+    ('recipes', False, '/api/recipes/'),
+    ('recipes_page', False, '/api/recipes/?page={page}'),
+    ('recipes_cursor', False, '/api/recipes/?cursor='),
+    ('recipes_page_deep', False, '/api/recipes/?page={deep_page}'),
+    ('recipes_cursor_deep', False, '/api/recipes/?cursor={deep_cursor}'),
+    ('recipes_tags', False, '/api/recipes/?tags={tag}'),
+    ('recipes_author', False, '/api/recipes/?author={author}'),
+    ('recipes_favorited', True, '/api/recipes/?is_favorited=1'),
+    ('recipes_in_cart', True, '/api/recipes/?is_in_shopping_cart=1'),
+    ('recipes_popular', False, '/api/recipes/?ordering=popular'),
+    ('recipes_trending', False, '/api/recipes/?ordering=trending'),
+    ('recipes_search', False, '/api/recipes/?search={word}'),
+    ('recipes_cookable', False,
+     '/api/recipes/cookable/?ingredients={ingredients}'),
+    ('recipe_detail', False, '/api/recipes/{recipe}/'),
+    ('recipe_detail_auth', True, '/api/recipes/{recipe}/'),
+    ('subscriptions', True, '/api/users/subscriptions/'),
+    ('download_shopping_cart', True,
+     '/api/recipes/download_shopping_cart/'),
+    ('ingredients_autocomplete', False, '/api/ingredients/?name={prefix}'),
+    ('ingredients_search_filter', False,
+     '/benchmark/ingredients/?name={prefix}'),
+)
+SCENARIO_NAMES = tuple(name for name, _, _ in SCENARIOS)
+TEMPLATE_FIELD = re.compile(r'{(\w+)}')
+
+
+class IngredientSearchFilter(filters.SearchFilter):
+    search_param = 'name'
+
+
+class SearchFilterIngredientViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Автодополнение ингредиентов до индекса в памяти процесса: запрос
+    к БД с фильтром по началу названия (SearchFilter, ^name) на каждый
+    запрос. Для сравнения с IngredientViewSet в сценарии
+    ingredients_search_filter.
+    """
+    queryset = Ingredient.objects.all()
+    serializer_class = IngredientSerializer
+    pagination_class = None
+    filter_backends = (IngredientSearchFilter,)
+    search_fields = ('^name',)
+
+
+# Команда выполняет запросы с этим модулем в качестве ROOT_URLCONF:
+# к маршрутам проекта добавляются маршруты сценариев для сравнения.
+urlpatterns = [
+    path('benchmark/ingredients/',
+         SearchFilterIngredientViewSet.as_view({'get': 'list'})),
+    path('', include(settings.ROOT_URLCONF)),
+]
+
+
+def request_host() -> str:
+    """ Хост для запросов к API, разрешённый ALLOWED_HOSTS."""
+    if '*' in settings.ALLOWED_HOSTS or not settings.ALLOWED_HOSTS:
+        return 'localhost'
+    return settings.ALLOWED_HOSTS[0].lstrip('.')
+
+
+def percentile(values: list, fraction: float) -> float:
+    """ Перцентиль отсортированного списка (метод ближайшего ранга)."""
+    return values[max(int(len(values) * fraction + 0.5) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks the API in-process through the DRF test client: '
+        'runs each scenario (recipe list with every filter, detail, '
+        'subscriptions, shopping cart download, ingredient autocomplete) '
+        'and reports requests/sec, p50/p95/p99 latency and queries per '
+        'request as JSON. Fill the database with generate_data first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario', action='append', dest='scenarios',
+            choices=SCENARIO_NAMES,
+            help='Scenario to run, can be repeated. Defaults to all.'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=DEFAULT_REQUESTS,
+            help='Number of measured requests per scenario.'
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=DEFAULT_WARMUP,
+            help='Number of unmeasured requests per scenario made first.'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Random seed for request parameters and users.'
+        )
+        parser.add_argument(
+            '--output',
+            help='File to write the JSON report to. Defaults to stdout.'
+        )
+        parser.add_argument(
+            '--label',
+            help='Run label stored in the report, e.g. a commit or setup.'
+        )
+
+    def handle(self, *args, **options):
+        if options['requests'] <= 0 or options['warmup'] < 0:
+            raise CommandError(
+                '--requests must be positive and --warmup not negative.'
+            )
+        self.random = random.Random(options['seed'])
+        self.samples = self.get_samples()
+        # Отдельный клиент для анонимных запросов: сброс авторизации
+        # force_authenticate(None) выполняет logout и занимает больше
+        # времени, чем многие запросы.
+        self.anonymous_client = APIClient(HTTP_HOST=request_host())
+        self.client = APIClient(HTTP_HOST=request_host())
+
+        scenarios = [
+            scenario for scenario in SCENARIOS
+            if scenario[0] in (options['scenarios'] or SCENARIO_NAMES)
+        ]
+        results = {}
+        with override_settings(ROOT_URLCONF=__name__):
+            for name, auth, template in scenarios:
+                if auth and not self.samples['users']:
+                    self.stderr.write(f'{name}: skipped, no users.')
+                    continue
+                if any(not self.samples[field]
+                       for field in TEMPLATE_FIELD.findall(template)):
+                    self.stderr.write(f'{name}: skipped, no data.')
+                    continue
+                results[name] = self.run_scenario(
+                    auth, template, options['requests'], options['warmup']
+                )
+                self.stderr.write(
+                    f'{name}: {results[name]["requests_per_second"]} req/s, '
+                    f'p99 {results[name]["latency_ms"]["p99"]} ms, '
+                    f'{results[name]["queries_per_request"]["mean"]} queries.'
+                )
+
+        report = json.dumps({
+            'label': options['label'],
+            'started': datetime.now(timezone.utc).isoformat(),
+            'environment': self.get_environment(),
+            'options': {
+                'requests': options['requests'],
+                'warmup': options['warmup'],
+                'seed': options['seed'],
+            },
+            'scenarios': results,
+        }, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(report + '\n')
+        else:
+            self.stdout.write(report)
+        self.stderr.write(
+            self.style.SUCCESS('Benchmark_api executed successfully.')
+        )
+
+    def sample(self, queryset):
+        """
+        До SAMPLE_SIZE объектов queryset со случайными id, выбранными
+        генератором с заданным seed: на тех же данных выборка совпадает
+        между запусками, в отличие от order_by('?').
+        """
+        bounds = queryset.aggregate(low=Min('id'), high=Max('id'))
+        if bounds['low'] is None:
+            return queryset.none()
+        ids = range(bounds['low'], bounds['high'] + 1)
+        return queryset.filter(
+            id__in=self.random.sample(ids, min(len(ids), SAMPLE_SIZE * 10))
+        ).order_by('id')[:SAMPLE_SIZE]
+
+    def get_samples(self) -> dict:
+        """
+        Выборки данных БД для параметров запросов. Пользователи
+        выбираются среди тех, у кого есть избранное, список покупок и
+        подписки, чтобы запросы с авторизацией возвращали данные.
+        """
+        recipes = list(self.sample(Recipe.objects).values(
+            'id', 'author_id', 'name'
+        ))
+        users = list(self.sample(User.objects.filter(
+            Exists(Favorit.objects.filter(favoriter=OuterRef('pk'))),
+            Exists(ShoppingCartUser.objects.filter(owner=OuterRef('pk'))),
+            Exists(Subscription.objects.filter(user=OuterRef('pk'))),
+        )))
+        if not users:
+            users = list(self.sample(User.objects))
+        ingredients = {}
+        for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+            recipe_id__in=[recipe['id'] for recipe in recipes]
+        ).values_list('recipe_id', 'ingredient_id'):
+            ingredients.setdefault(recipe_id, []).append(str(ingredient_id))
+        recipes_count = Recipe.objects.count()
+        pages = recipes_count // DEFAULT_PAGE_SIZE or 1
+        deep_page = min(pages, DEEP_PAGE)
+        deep_cursor = ''
+        if deep_page > 1:
+            # Курсор страницы deep_page: последний рецепт предыдущей.
+            recipe = Recipe.objects.order_by('-pub_date', '-id').only(
+                'pub_date'
+            )[(deep_page - 1) * DEFAULT_PAGE_SIZE - 1]
+            deep_cursor = quote(KeysetPagination().encode_cursor(recipe),
+                                safe='')
+        return {
+            'users': users,
+            'page': list(range(1, min(pages, 10) + 1)),
+            'deep_page': [deep_page] if recipes_count else [],
+            'deep_cursor': [deep_cursor] if recipes_count else [],
+            'tag': list(self.sample(Tag.objects).values_list('slug',
+                                                             flat=True)),
+            'author': sorted({recipe['author_id'] for recipe in recipes}),
+            'recipe': [recipe['id'] for recipe in recipes],
+            'word': [
+                word
+                for recipe in recipes
+                for word in re.findall(r'\w{3,}', recipe['name'])[:1]
+            ],
+            'ingredients': [','.join(ids) for ids in ingredients.values()],
+            'prefix': [
+                name[:length]
+                for name in self.sample(Ingredient.objects).values_list(
+                    'name', flat=True
+                )
+                for length in (1, 3)
+            ],
+        }
+
+    def get_path(self, template: str) -> str:
+        return TEMPLATE_FIELD.sub(
+            lambda match: str(self.random.choice(self.samples[match[1]])),
+            template
+        )
+
+    def request(self, auth: bool, template: str) -> tuple:
+        """
+        Выполняет запрос сценария и возвращает время выполнения, включая
+        чтение потокового ответа, колличество запросов к БД и статус.
+        """
+        client = self.anonymous_client
+        if auth:
+            client = self.client
+            client.force_authenticate(
+                self.random.choice(self.samples['users'])
+            )
+        path = self.get_path(template)
+        # Счётчик PerformanceMiddleware без сохранения текста запросов,
+        # в отличие от CaptureQueriesContext, почти не влияет на задержку.
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(counter)
+                )
+            started = time.perf_counter()
+            response = client.get(path)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+        return elapsed, counter.count, response.status_code
+
+    def run_scenario(self, auth: bool, template: str, requests: int,
+                     warmup: int) -> dict:
+        for _ in range(warmup):
+            self.request(auth, template)
+        latencies, queries, errors = [], [], 0
+        started = time.perf_counter()
+        for _ in range(requests):
+            elapsed, count, status = self.request(auth, template)
+            latencies.append(elapsed * 1000)
+            queries.append(count)
+            errors += status >= 400
+        total = time.perf_counter() - started
+        latencies.sort()
+        return {
+            'requests': requests,
+            'errors': errors,
+            'requests_per_second': round(requests / total, 1),
+            'latency_ms': {
+                'mean': round(sum(latencies) / requests, 2),
+                'p50': round(percentile(latencies, 0.50), 2),
+                'p95': round(percentile(latencies, 0.95), 2),
+                'p99': round(percentile(latencies, 0.99), 2),
+                'max': round(latencies[-1], 2),
+            },
+            'queries_per_request': {
+                'mean': round(sum(queries) / requests, 2),
+                'max': max(queries),
+            },
+        }
+
+    def get_environment(self) -> dict:
+        return {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+            'cache': settings.CACHES['default']['BACKEND'],
+            'debug': settings.DEBUG,
+            'recipes': Recipe.objects.count(),
+            'users': User.objects.count(),
+            'ingredients': Ingredient.objects.count(),
+            'favorites': Favorit.objects.count(),
+        }
@@ -0,0 +1,236 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import requests
+from django.core.management import BaseCommand, CommandError
+
+from foodgram.settings import BASE_DIR
+from recipe.management.commands.benchmark_api import (percentile,
+                                                      request_host)
+from recipe.models import Recipe
+
+DEFAULT_CONCURRENCY = (1, 8, 32)
+DEFAULT_REQUESTS = 500
+DEFAULT_WORKERS = 2
+DEFAULT_PORT = 8100
+STARTUP_TIMEOUT = 30
+WARMUP_REQUESTS = 20
+
+# Команды запуска серверов: gunicorn с синхронными воркерами (WSGI) и с
+# воркерами uvicorn (foodgram.asgi, асинхронные читающие эндпоинты).
+# Процессами uvicorn управляет gunicorn, чтобы серверы отличались только
+# воркерами. Кроме того, в режиме uvicorn --workers сокеты соединений
+# остаются без TCP_NODELAY, и ответы на keep-alive соединениях
+# задерживаются на ~40 мс.
+# Сервер: (приложение, класс воркеров gunicorn).
+SERVERS = {
+    'gunicorn': ('foodgram.wsgi:application', 'sync'),
+    'uvicorn': ('foodgram.asgi:application',
+                'uvicorn.workers.UvicornWorker'),
+}
+
+
+@contextmanager
+def running_server(server: str, port: int, workers: int, headers: dict):
+    """
+    Запускает сервер на время замеров и возвращает его адрес, когда он
+    начинает отвечать. По выходе из блока with сервер останавливается.
+    """
+    application, worker_class = SERVERS[server]
+    log = tempfile.TemporaryFile()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', application,
+         '--worker-class', worker_class, '--workers', str(workers),
+         '--bind', f'127.0.0.1:{port}', '--log-level', 'warning'],
+        cwd=BASE_DIR, env=os.environ.copy(), stdout=log,
+        stderr=subprocess.STDOUT
+    )
+    try:
+        base_url = f'http://127.0.0.1:{port}'
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            try:
+                requests.get(f'{base_url}/api/tags/', headers=headers,
+                             timeout=1)
+                break
+            except requests.RequestException:
+                if (process.poll() is not None
+                        or time.monotonic() > deadline):
+                    log.seek(0)
+                    raise CommandError(
+                        f'{server} did not start:\n'
+                        + log.read().decode(errors='replace')[-2000:]
+                    )
+                time.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        log.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Starts the API under gunicorn with sync workers and with uvicorn '
+        '(ASGI) workers, the same number of each, on the current '
+        'database and compares throughput and latency of the read '
+        'endpoints at each concurrency level. Prints a JSON report.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--server', action='append', dest='servers', choices=SERVERS,
+            help='Server to benchmark, can be repeated. Defaults to all.'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=DEFAULT_WORKERS,
+            help='Number of server worker processes.'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, action='append',
+            help='Number of concurrent clients, can be repeated. '
+                 f'Defaults to {", ".join(map(str, DEFAULT_CONCURRENCY))}.'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=DEFAULT_REQUESTS,
+            help='Number of requests per concurrency level.'
+        )
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Path to request, can be repeated. Defaults to the '
+                 'recipe list and detail, tags and ingredients (and '
+                 'subscriptions with --token).'
+        )
+        parser.add_argument(
+            '--token',
+            help='Auth token the requests are made with.'
+        )
+        parser.add_argument(
+            '--port', type=int, default=DEFAULT_PORT,
+            help='Port the servers listen on.'
+        )
+        parser.add_argument(
+            '--output',
+            help='File to write the JSON report to. Defaults to stdout.'
+        )
+        parser.add_argument(
+            '--label',
+            help='Run label stored in the report.'
+        )
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency'] or DEFAULT_CONCURRENCY
+        if (options['requests'] <= 0 or options['workers'] <= 0
+                or min(concurrency) <= 0):
+            raise CommandError(
+                '--requests, --workers and --concurrency must be positive.'
+            )
+        self.headers = {'Host': request_host()}
+        if options['token']:
+            self.headers['Authorization'] = f'Token {options["token"]}'
+        paths = options['paths'] or self.default_paths(options['token'])
+
+        results = {}
+        for server in options['servers'] or SERVERS:
+            self.stderr.write(f'Starting {server}...')
+            with running_server(server, options['port'],
+                                options['workers'],
+                                self.headers) as base_url:
+                self.load(base_url, paths, 1, WARMUP_REQUESTS)
+                results[server] = {}
+                for clients in concurrency:
+                    result = self.load(base_url, paths, clients,
+                                       options['requests'])
+                    results[server][str(clients)] = result
+                    self.stderr.write(
+                        f'{server}, {clients} clients: '
+                        f'{result["requests_per_second"]} req/s, '
+                        f'p99 {result["latency_ms"]["p99"]} ms, '
+                        f'{result["errors"]} errors.'
+                    )
+
+        report = json.dumps({
+            'label': options['label'],
+            'started': datetime.now(timezone.utc).isoformat(),
+            'options': {
+                'workers': options['workers'],
+                'requests': options['requests'],
+                'paths': paths,
+            },
+            'servers': results,
+        }, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(report + '\n')
+        else:
+            self.stdout.write(report)
+        self.stderr.write(
+            self.style.SUCCESS('Benchmark_servers executed successfully.')
+        )
+
+    def default_paths(self, token) -> list:
+        paths = [
+            '/api/recipes/',
+            '/api/recipes/?page=2',
+            '/api/tags/',
+            '/api/ingredients/?name=а',
+        ]
+        recipe_id = Recipe.objects.values_list('id', flat=True).last()
+        if recipe_id is not None:
+            paths.append(f'/api/recipes/{recipe_id}/')
+        if token:
+            paths.append('/api/users/subscriptions/')
+        return paths
+
+    def load(self, base_url: str, paths: list, clients: int,
+             total: int) -> dict:
+        """
+        Выполняет total запросов clients параллельными клиентами: каждый
+        отправляет следующий запрос после ответа на предыдущий.
+        """
+        def client(number):
+            session = requests.Session()
+            session.headers.update(self.headers)
+            results = []
+            for index in range(number, total, clients):
+                started = time.perf_counter()
+                try:
+                    ok = session.get(
+                        base_url + paths[index % len(paths)]
+                    ).ok
+                except requests.RequestException:
+                    ok = False
+                results.append((time.perf_counter() - started, ok))
+            return results
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(clients) as executor:
+            results = [
+                result
+                for client_results in executor.map(client, range(clients))
+                for result in client_results
+            ]
+        elapsed = time.perf_counter() - started
+        latencies = sorted(latency * 1000 for latency, _ in results)
+        return {
+            'requests': len(results),
+            'errors': sum(1 for _, ok in results if not ok),
+            'requests_per_second': round(len(results) / elapsed, 1),
+            'latency_ms': {
+                'p50': round(percentile(latencies, 0.50), 2),
+                'p95': round(percentile(latencies, 0.95), 2),
+                'p99': round(percentile(latencies, 0.99), 2),
+                'max': round(latencies[-1], 2),
+            },
+        }
@@ -0,0 +1,36 @@
+from django.core.management import BaseCommand
+
+from api.images import process_recipe_image
+from recipe.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Builds thumb/card/full WebP and JPEG variants for recipe images '
+        'that do not have them yet (or for all images with --all).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Rebuild variants of all recipe images.'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').order_by('pk').only(
+            'id', 'image', 'image_variants'
+        )
+        processed = 0
+        for recipe in recipes.iterator():
+            variants = recipe.image_variants
+            if (
+                not options['all']
+                and variants.get('source') == recipe.image.name
+            ):
+                continue
+            process_recipe_image(recipe.id, recipe.image.name)
+            processed += 1
+        self.stdout.write(f'{processed} recipe images processed.')
+        self.stdout.write(
+            self.style.SUCCESS('Build_image_variants executed successfully.')
+        )
@@ -0,0 +1,134 @@
+from datetime import timedelta
+
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api.images import delete_image_files
+from foodgram.settings import IMAGE_GC_GRACE_PERIOD
+from recipe.models import ImageFile, Recipe
+
+DEFAULT_BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes recipe image files (and their variants) that no recipe '
+        'references any more, in batches. Files changed within the grace '
+        'period are kept.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Number of files deleted per batch.'
+        )
+        parser.add_argument(
+            '--grace', type=int, default=IMAGE_GC_GRACE_PERIOD,
+            help='Keep files changed within this many seconds.'
+        )
+        parser.add_argument(
+            '--orphans', action='store_true',
+            help='Also delete files in the images directory that are not '
+                 'tracked at all (uploaded before deduplication).'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report files that would be deleted.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size <= 0:
+            raise CommandError('--batch-size must be positive.')
+        self.storage = Recipe._meta.get_field('image').storage
+        self.cutoff = timezone.now() - timedelta(seconds=options['grace'])
+        self.dry_run = options['dry_run']
+
+        deleted = self.collect_unreferenced(batch_size)
+        self.stdout.write(f'{deleted} unreferenced files deleted.')
+        if options['orphans']:
+            deleted = self.collect_orphans(batch_size)
+            self.stdout.write(f'{deleted} untracked files deleted.')
+        if self.dry_run:
+            self.stdout.write(self.style.WARNING('Dry run: nothing deleted.'))
+        self.stdout.write(
+            self.style.SUCCESS('Collect_images executed successfully.')
+        )
+
+    def is_expired(self, name: str) -> bool:
+        """
+        Файл можно удалить, если его нет или он не изменялся в течение
+        срока ожидания (повторная загрузка того же файла обновляет время
+        его изменения).
+        """
+        if not self.storage.exists(name):
+            return True
+        return self.storage.get_modified_time(name) < self.cutoff
+
+    def collect_unreferenced(self, batch_size: int) -> int:
+        """
+        Проходит пачками записи ImageFile без ссылок, удаляет их файлы и
+        сами записи. Записи блокируются на время удаления, а их колличество
+        ссылок перепроверяется, чтобы не удалить файл, на который только что
+        сослался новый рецепт.
+        """
+        deleted = 0
+        last_pk = 0
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    ImageFile.objects.select_for_update().filter(
+                        pk__gt=last_pk,
+                        references__lte=0,
+                        updated__lt=self.cutoff
+                    ).order_by('pk')[:batch_size]
+                )
+                if not batch:
+                    return deleted
+                last_pk = batch[-1].pk
+                expired = [
+                    image for image in batch if self.is_expired(image.name)
+                ]
+                deleted += len(expired)
+                if self.dry_run:
+                    continue
+                for image in expired:
+                    delete_image_files(image.name)
+                ImageFile.objects.filter(
+                    pk__in=[image.pk for image in expired]
+                ).delete()
+
+    def collect_orphans(self, batch_size: int) -> int:
+        """
+        Удаляет файлы из каталога изображений рецептов, для которых нет
+        ни записи ImageFile, ни рецепта с таким изображением.
+        """
+        directory = Recipe._meta.get_field('image').upload_to
+        if not self.storage.exists(directory):
+            return 0
+        _, filenames = self.storage.listdir(directory)
+        deleted = 0
+        for start in range(0, len(filenames), batch_size):
+            names = [
+                directory + filename
+                for filename in filenames[start:start + batch_size]
+            ]
+            tracked = set(
+                ImageFile.objects.filter(name__in=names).values_list(
+                    'name', flat=True
+                )
+            ) | set(
+                Recipe.objects.filter(image__in=names).values_list(
+                    'image', flat=True
+                )
+            )
+            orphans = [
+                name for name in names
+                if name not in tracked and self.is_expired(name)
+            ]
+            deleted += len(orphans)
+            if not self.dry_run:
+                for name in orphans:
+                    delete_image_files(name)
+        return deleted
@@ -0,0 +1,236 @@
+import re
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipe.models import Recipe, RecipeIngredient, Tag
+
+User = get_user_model()
+
+DEFAULT_THRESHOLD = 1000
+# Строка плана SQLite: SCAN <таблица или псевдоним> [USING ...].
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(.*)$')
+SQL_ALIAS = re.compile(r'"(\w+)" (\w+)\b')
+
+
+class Command(BaseCommand):
+    help = (
+        'Replays the main API requests, runs EXPLAIN for every SELECT '
+        'they execute and reports sequential scans of tables with more '
+        'rows than the threshold (index advisor).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold', type=int, default=DEFAULT_THRESHOLD,
+            help='Report sequential scans of tables with at least this '
+                 'many rows.'
+        )
+        parser.add_argument(
+            '--user',
+            help='Username the requests are made as. Defaults to the '
+                 'first superuser or the first user.'
+        )
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='API path to replay, can be repeated. Defaults to the '
+                 'main recipe, user, tag and ingredient requests.'
+        )
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='Print the plan of every query.'
+        )
+
+    def handle(self, *args, **options):
+        if options['threshold'] < 0:
+            raise CommandError('--threshold must not be negative.')
+        self.threshold = options['threshold']
+        self.verbose_plans = options['verbose_plans']
+        self.table_rows = {}
+        user = self.get_user(options['user'])
+        client = APIClient()
+        client.force_authenticate(user)
+        host = 'localhost'
+        if '*' not in settings.ALLOWED_HOSTS and settings.ALLOWED_HOSTS:
+            host = settings.ALLOWED_HOSTS[0].lstrip('.')
+
+        flagged = 0
+        for path in options['paths'] or self.default_paths():
+            queries = self.replay(client, path, host)
+            self.stdout.write(f'GET {path}: {len(queries)} queries.')
+            for alias, sql in queries:
+                flagged += self.explain(alias, sql)
+        style = self.style.WARNING if flagged else self.style.SUCCESS
+        self.stdout.write(style(
+            f'{flagged} sequential scans over {self.threshold} rows.'
+        ))
+        self.stdout.write(
+            self.style.SUCCESS('Explain_queries executed successfully.')
+        )
+
+    def get_user(self, username):
+        users = User.objects.order_by('-is_superuser', 'id')
+        if username:
+            users = users.filter(username=username)
+        user = users.first()
+        if user is None:
+            raise CommandError('No user to make requests as.')
+        return user
+
+    def default_paths(self) -> list:
+        """
+        Основные запросы API с параметрами, взятыми из данных БД: первый
+        тэг, рецепт, его автор и ингредиенты.
+        """
+        paths = [
+            '/api/recipes/',
+            '/api/recipes/?cursor=',
+            '/api/recipes/?ordering=popular',
+            '/api/recipes/?is_favorited=1',
+            '/api/recipes/?is_in_shopping_cart=1',
+            '/api/recipes/download_shopping_cart/',
+            '/api/users/',
+            '/api/users/subscriptions/',
+            '/api/tags/',
+            '/api/ingredients/?name=а',
+        ]
+        tag = Tag.objects.values_list('slug', flat=True).first()
+        if tag is not None:
+            paths.append(f'/api/recipes/?tags={tag}')
+        recipe = Recipe.objects.values('id', 'author_id', 'name').first()
+        if recipe is not None:
+            paths.append(f'/api/recipes/{recipe["id"]}/')
+            paths.append(f'/api/recipes/?author={recipe["author_id"]}')
+            words = re.findall(r'\w+', recipe['name'])
+            if words:
+                paths.append(f'/api/recipes/?search={words[0]}')
+            ingredients = RecipeIngredient.objects.filter(
+                recipe_id=recipe['id']
+            ).values_list('ingredient_id', flat=True)
+            if ingredients:
+                paths.append(
+                    '/api/recipes/cookable/?ingredients='
+                    + ','.join(map(str, ingredients))
+                )
+        return paths
+
+    def replay(self, client, path: str, host: str) -> list:
+        """
+        Выполняет запрос и возвращает выполненные им SELECT без повторов
+        в виде пар (база данных, SQL).
+        """
+        with ExitStack() as stack:
+            contexts = {
+                alias: stack.enter_context(
+                    CaptureQueriesContext(connections[alias])
+                )
+                for alias in connections
+            }
+            response = client.get(path, HTTP_HOST=host)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        if response.status_code >= 400:
+            self.stdout.write(self.style.ERROR(
+                f'GET {path}: status {response.status_code}.'
+            ))
+        queries = []
+        for alias, context in contexts.items():
+            for query in context.captured_queries:
+                sql = query['sql']
+                if (sql.lstrip().upper().startswith('SELECT')
+                        and (alias, sql) not in queries):
+                    queries.append((alias, sql))
+        return queries
+
+    def explain(self, alias: str, sql: str) -> int:
+        """
+        Выполняет EXPLAIN запроса и выводит последовательные чтения
+        таблиц, в которых не меньше threshold строк.
+        Returns:
+            int: Колличество таких чтений.
+        """
+        connection = connections[alias]
+        if connection.vendor == 'postgresql':
+            plan, scans = self.explain_postgresql(connection, sql)
+        elif connection.vendor == 'sqlite':
+            plan, scans = self.explain_sqlite(connection, sql)
+        else:
+            return 0
+        if self.verbose_plans:
+            self.stdout.write(f'  {sql}\n    ' + '\n    '.join(plan))
+        flagged = 0
+        for table in scans:
+            rows = self.get_table_rows(connection, table)
+            if rows < self.threshold:
+                continue
+            flagged += 1
+            self.stdout.write(self.style.WARNING(
+                f'  Sequential scan of {table} (~{rows} rows) in: '
+                f'{sql[:300]}'
+            ))
+        return flagged
+
+    def explain_postgresql(self, connection, sql: str) -> tuple:
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql)
+            nodes = [cursor.fetchone()[0][0]['Plan']]
+        plan, scans = [], []
+        while nodes:
+            node = nodes.pop()
+            plan.append(
+                f'{node["Node Type"]} {node.get("Relation Name", "")} '
+                f'(rows={node["Plan Rows"]})'
+            )
+            if node['Node Type'] == 'Seq Scan':
+                scans.append(node['Relation Name'])
+            nodes.extend(node.get('Plans', ()))
+        return plan, scans
+
+    def explain_sqlite(self, connection, sql: str) -> tuple:
+        """
+        SQLite показывает в плане псевдонимы таблиц (U0, T3), поэтому они
+        сопоставляются с именами таблиц по тексту запроса.
+        """
+        aliases = dict(
+            (alias, table) for table, alias in SQL_ALIAS.findall(sql)
+        )
+        tables = set(connection.introspection.table_names())
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            plan = [row[-1] for row in cursor.fetchall()]
+        scans = []
+        for detail in plan:
+            match = SQLITE_SCAN.match(detail)
+            if match is None or 'USING' in match[2] or 'VIRTUAL' in match[2]:
+                continue
+            table = aliases.get(match[1], match[1])
+            if table in tables:
+                scans.append(table)
+        return plan, scans
+
+    def get_table_rows(self, connection, table: str) -> int:
+        """
+        Колличество строк таблицы: оценка статистики в PostgreSQL,
+        COUNT(*) в остальных БД.
+        """
+        key = (connection.alias, table)
+        if key not in self.table_rows:
+            with connection.cursor() as cursor:
+                if connection.vendor == 'postgresql':
+                    cursor.execute(
+                        'SELECT reltuples::bigint FROM pg_class '
+                        'WHERE relname = %s', [table]
+                    )
+                else:
+                    cursor.execute(
+                        'SELECT COUNT(*) FROM '
+                        + connection.ops.quote_name(table)
+                    )
+                row = cursor.fetchone()
+            self.table_rows[key] = max(row[0], 0) if row else 0
+        return self.table_rows[key]
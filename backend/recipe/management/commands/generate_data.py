@@ -0,0 +1,340 @@
+import random
+import time
+from collections import Counter
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import transaction
+from django.db.models import Max
+from PIL import Image
+
+from api.images import build_variants, change_image_references
+from api.utils import COUNTERS, update_counters
+from recipe.models import (Favorit, Ingredient, Recipe, RecipeIngredient,
+                           RecipeTag, ShoppingCartUser, Tag)
+from user.models import Subscription
+
+User = get_user_model()
+
+DEFAULT_BATCH_SIZE = 5000
+# Показатель распределения Ципфа: вес i-го по популярности объекта
+# пропорционален 1 / i ** ZIPF_EXPONENT.
+ZIPF_EXPONENT = 1.1
+UNITS = ('г', 'мл', 'шт.', 'ст. л.', 'ч. л.', 'по вкусу')
+DISHES = (
+    'суп', 'салат', 'пирог', 'омлет', 'рагу', 'запеканка', 'каша',
+    'плов', 'борщ', 'блины', 'котлеты', 'паста', 'ризотто', 'жаркое',
+)
+WORDS = (
+    'куриный', 'грибной', 'овощной', 'сырный', 'ёлочный', 'домашний',
+    'быстрый', 'летний', 'острый', 'сладкий', 'томатный', 'рыбный',
+    'картофельный', 'тыквенный', 'яблочный', 'творожный', 'лёгкий',
+    'нарезать', 'смешать', 'обжарить', 'запечь', 'отварить', 'посолить',
+    'добавить', 'подавать', 'горячим', 'минут', 'духовке', 'сковороде',
+)
+
+
+def zipf_weights(size: int) -> list:
+    """
+    Накопленные веса распределения Ципфа для random.choices: первые
+    объекты выбираются намного чаще остальных.
+    """
+    return list(accumulate(
+        1 / rank ** ZIPF_EXPONENT for rank in range(1, size + 1)
+    ))
+
+
+def placeholder_image() -> ContentFile:
+    """ Изображение-заглушка для рецептов в формате JPEG."""
+    buffer = BytesIO()
+    Image.new('RGB', (640, 480), (230, 180, 120)).save(buffer, 'JPEG')
+    return ContentFile(buffer.getvalue())
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates synthetic users, recipes, ingredient links, tags, '
+        'favorites, shopping carts and subscriptions with skewed (Zipf) '
+        'popularity for load tests. Rows are created with bulk inserts; '
+        'run it on a database without concurrent writes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=1000,
+            help='Number of users to create.'
+        )
+        parser.add_argument(
+            '--recipes', type=int, default=10000,
+            help='Number of recipes to create.'
+        )
+        parser.add_argument(
+            '--tags', type=int, default=10,
+            help='Minimal number of tags, missing tags are created.'
+        )
+        parser.add_argument(
+            '--ingredients', type=int, default=1000,
+            help='Minimal number of ingredients, missing ingredients are '
+                 'created.'
+        )
+        parser.add_argument(
+            '--recipe-ingredients', type=int, nargs=2, default=(3, 15),
+            metavar=('MIN', 'MAX'),
+            help='Range of the number of ingredients in a recipe.'
+        )
+        parser.add_argument(
+            '--favorites', type=int, default=20,
+            help='Average number of favorite recipes per user.'
+        )
+        parser.add_argument(
+            '--carts', type=int, default=5,
+            help='Average number of shopping cart recipes per user.'
+        )
+        parser.add_argument(
+            '--subscriptions', type=int, default=10,
+            help='Average number of subscriptions per user.'
+        )
+        parser.add_argument(
+            '--password',
+            help='Password of the created users. By default they can not '
+                 'log in.'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Random seed, the same seed generates the same data.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Number of rows per INSERT.'
+        )
+
+    def handle(self, *args, **options):
+        for option in ('users', 'recipes', 'batch_size'):
+            if options[option] <= 0:
+                raise CommandError(
+                    f'--{option.replace("_", "-")} must be positive.'
+                )
+        low, high = options['recipe_ingredients']
+        if not 0 < low <= high:
+            raise CommandError(
+                '--recipe-ingredients must be a positive range.'
+            )
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.counts = {}
+        started = time.monotonic()
+
+        with transaction.atomic():
+            self.ensure_tags(options['tags'])
+            self.ensure_ingredients(options['ingredients'])
+            recipe_authors = self.random.choices(
+                range(options['users']),
+                cum_weights=zipf_weights(options['users']),
+                k=options['recipes']
+            )
+            recipes_count = Counter(recipe_authors)
+            user_ids = self.create_users(
+                options['users'], recipes_count, options['password']
+            )
+            recipe_ids = self.create_recipes(
+                [user_ids[index] for index in recipe_authors]
+            )
+            self.create_recipe_links(recipe_ids, low, high)
+            # Рецепты и авторы упорядочены по убыванию популярности в
+            # случайном порядке, не совпадающем с порядком id.
+            popular_recipes = self.random.sample(recipe_ids,
+                                                 len(recipe_ids))
+            popular_authors = [
+                user_ids[index]
+                for index, _ in recipes_count.most_common()
+            ]
+            self.create_relations(
+                Favorit, 'favoriter', user_ids, popular_recipes,
+                options['favorites']
+            )
+            self.create_relations(
+                ShoppingCartUser, 'owner', user_ids, popular_recipes,
+                options['carts']
+            )
+            self.create_relations(
+                Subscription, 'user', user_ids, popular_authors,
+                options['subscriptions']
+            )
+
+        call_command('update_recipe_scores', stdout=self.stdout)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            'Created ' + ', '.join(f'{name}: {count}'
+                                   for name, count in self.counts.items())
+            + f' in {elapsed:.2f}s.'
+        )
+        self.stdout.write(
+            self.style.SUCCESS('Generate_data executed successfully.')
+        )
+
+    def bulk_create(self, model, objects: list) -> None:
+        model.objects.bulk_create(objects, batch_size=self.batch_size)
+        self.counts[model.__name__] = (
+            self.counts.get(model.__name__, 0) + len(objects)
+        )
+
+    def bulk_create_with_ids(self, model, objects: list) -> list:
+        """
+        Создаёт объекты пачками по batch_size и возвращает их id.
+        SQLite не возвращает id созданных строк, поэтому они читаются
+        после вставки: это id больше прежнего максимального, выданные
+        по порядку вставки.
+        """
+        last_id = model.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        self.bulk_create(model, objects)
+        if not objects or objects[0].pk is not None:
+            return [obj.pk for obj in objects]
+        return list(
+            model.objects.filter(id__gt=last_id).order_by('id').values_list(
+                'id', flat=True
+            )
+        )
+
+    def ensure_tags(self, count: int) -> None:
+        existing = Tag.objects.count()
+        missing = max(count - existing, 0)
+        if missing:
+            self.bulk_create(Tag, [
+                Tag(name=f'тэг {number}', slug=f'tag-{number}',
+                    color=f'#{self.random.randrange(0x1000000):06X}')
+                for number in range(existing + 1, existing + missing + 1)
+            ])
+        self.tag_ids = list(Tag.objects.values_list('id', flat=True))
+
+    def ensure_ingredients(self, count: int) -> None:
+        existing = Ingredient.objects.count()
+        missing = max(count - existing, 0)
+        if missing:
+            self.bulk_create(Ingredient, [
+                Ingredient(name=f'ингредиент {number}',
+                           measurement_unit=self.random.choice(UNITS))
+                for number in range(existing + 1, existing + missing + 1)
+            ])
+        ingredient_ids = list(
+            Ingredient.objects.values_list('id', flat=True)
+        )
+        self.random.shuffle(ingredient_ids)
+        self.ingredient_ids = ingredient_ids
+
+    def create_users(self, count: int, recipes_count: Counter,
+                     password) -> list:
+        first = (User.objects.aggregate(last_id=Max('id'))['last_id']
+                 or 0) + 1
+        password = make_password(password)
+        return self.bulk_create_with_ids(User, [
+            User(
+                username=f'user{first + index}',
+                email=f'user{first + index}@example.com',
+                first_name='Имя',
+                last_name=f'Фамилия {first + index}',
+                password=password,
+                recipes_count=recipes_count[index],
+            )
+            for index in range(count)
+        ])
+
+    def text(self, words: int) -> str:
+        return ' '.join(self.random.choices(WORDS, k=words))
+
+    def create_recipes(self, authors: list) -> list:
+        storage = Recipe._meta.get_field('image').storage
+        image = storage.save(Recipe._meta.get_field('image').upload_to
+                             + 'generated.jpg', placeholder_image())
+        with storage.open(image) as source:
+            image_variants = build_variants(source)
+        image_variants['source'] = image
+        change_image_references(image, len(authors))
+        return self.bulk_create_with_ids(Recipe, [
+            Recipe(
+                author_id=author_id,
+                name=(f'{self.text(self.random.randint(1, 2))} '
+                      f'{self.random.choice(DISHES)}').capitalize(),
+                text=self.text(self.random.randint(10, 60)),
+                image=image,
+                image_variants=image_variants,
+                cooking_time=self.random.randint(5, 180),
+            )
+            for author_id in authors
+        ])
+
+    def create_recipe_links(self, recipe_ids: list, low: int,
+                            high: int) -> None:
+        """
+        Ингредиенты и тэги рецептов: частые ингредиенты (соль, вода)
+        встречаются в большинстве рецептов, редкие — в единицах.
+        """
+        ingredient_weights = zipf_weights(len(self.ingredient_ids))
+        tag_weights = zipf_weights(len(self.tag_ids))
+        links, tags = [], []
+        for recipe_id in recipe_ids:
+            for ingredient_id in set(self.random.choices(
+                self.ingredient_ids, cum_weights=ingredient_weights,
+                k=self.random.randint(low, high)
+            )):
+                links.append(RecipeIngredient(
+                    recipe_id=recipe_id, ingredient_id=ingredient_id,
+                    amount=self.random.randint(1, 500)
+                ))
+            for tag_id in set(self.random.choices(
+                self.tag_ids, cum_weights=tag_weights,
+                k=self.random.randint(1, 3)
+            )):
+                tags.append(RecipeTag(recipe_id=recipe_id, tag_id=tag_id))
+            if len(links) >= self.batch_size:
+                self.bulk_create(RecipeIngredient, links)
+                self.bulk_create(RecipeTag, tags)
+                links, tags = [], []
+        self.bulk_create(RecipeIngredient, links)
+        self.bulk_create(RecipeTag, tags)
+
+    def create_relations(self, model, user_field: str, user_ids: list,
+                         targets: list, average: int) -> None:
+        """
+        Создаёт записи model (избранное, список покупок, подписки)
+        пользователей user_ids на объекты targets, упорядоченные по
+        убыванию популярности. Колличество записей пользователя
+        распределено экспоненциально со средним average: большинство
+        пользователей активны мало, немногие — очень.
+        Счётчики связанных объектов (favorites_count и др.) обновляются
+        одним UPDATE на каждое встретившееся значение прироста.
+        """
+        if average <= 0 or not targets:
+            return
+        target_field = f'{COUNTERS[model][0]}_id'
+        weights = zipf_weights(len(targets))
+        added = Counter()
+        batch = []
+        for user_id in user_ids:
+            count = min(round(self.random.expovariate(1 / average)),
+                        len(targets))
+            chosen = set(self.random.choices(
+                targets, cum_weights=weights, k=count
+            ))
+            if model is Subscription:
+                chosen.discard(user_id)
+            for target_id in chosen:
+                batch.append(model(**{f'{user_field}_id': user_id,
+                                      target_field: target_id}))
+            added.update(chosen)
+            if len(batch) >= self.batch_size:
+                self.bulk_create(model, batch)
+                batch = []
+        self.bulk_create(model, batch)
+
+        by_delta = {}
+        for target_id, delta in added.items():
+            by_delta.setdefault(delta, []).append(target_id)
+        for delta, ids in by_delta.items():
+            for start in range(0, len(ids), self.batch_size):
+                update_counters(model, delta,
+                                ids[start:start + self.batch_size])
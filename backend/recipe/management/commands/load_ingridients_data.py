@@ -1,23 +1,137 @@
-from csv import DictReader
+import csv
+import json
+import os
+import time
+from itertools import islice
 
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
 
+from foodgram.settings import BASE_DIR
 from recipe.models import Ingredient
 
+DATA_DIRS = (
+    os.path.join(BASE_DIR, 'data'),
+    os.path.join(os.path.dirname(BASE_DIR), 'data'),
+)
+DEFAULT_FILENAME = 'ingredients.csv'
+DEFAULT_BATCH_SIZE = 1000
+
+
+def read_csv(file):
+    """
+    Построчно читает CSV без заголовка: название, ед-ца измерения.
+    Пустые строки пропускаются, строка без названия или единицы
+    измерения прерывает загрузку с номером строки в файле.
+    """
+    reader = csv.reader(file)
+    for row in reader:
+        if not any(field.strip() for field in row):
+            continue
+        if len(row) < 2 or not row[0].strip() or not row[1].strip():
+            raise CommandError(
+                f'Line {reader.line_num}: expected name and measurement '
+                f'unit, got {row!r}.'
+            )
+        yield row[0], row[1]
+
+
+def read_json(file):
+    """
+    Читает JSON список объектов с полями name, measurement_unit.
+    Объект без этих полей прерывает загрузку с его номером в списке.
+    """
+    for number, item in enumerate(json.load(file), start=1):
+        try:
+            name, measurement_unit = item['name'], item['measurement_unit']
+        except (KeyError, TypeError):
+            raise CommandError(
+                f'Item {number}: expected name and measurement_unit, '
+                f'got {item!r}.'
+            )
+        yield name, measurement_unit
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
 
 class Command(BaseCommand):
-    help = "Loads data from ingredients.csv"
+    help = (
+        'Loads ingredients from data/ingredients.csv (or a given CSV/JSON '
+        'file) with bulk inserts. Ingredients that already exist are '
+        'skipped, so the command can be re-run safely.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            help='Path to a CSV or JSON file. Defaults to '
+                 f'data/{DEFAULT_FILENAME}.'
+        )
+        parser.add_argument(
+            '--format', choices=READERS,
+            help='File format. Defaults to the file extension.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Number of ingredients per INSERT.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Run the import and roll it back.'
+        )
+
+    def get_path(self, path):
+        if path is not None:
+            return path
+        for data_dir in DATA_DIRS:
+            path = os.path.join(data_dir, DEFAULT_FILENAME)
+            if os.path.exists(path):
+                return path
+        raise CommandError(f'{DEFAULT_FILENAME} not found in {DATA_DIRS}.')
 
     def handle(self, *args, **options):
+        path = self.get_path(options['path'])
+        file_format = (
+            options['format'] or os.path.splitext(path)[1].lstrip('.')
+        )
+        if file_format not in READERS:
+            raise CommandError(f'Unsupported file format: {file_format}.')
+        batch_size = options['batch_size']
+        if batch_size <= 0:
+            raise CommandError('--batch-size must be positive.')
 
-        with open('./static/data/ingredients.csv', encoding='utf-8') as f:
-            for row in DictReader(f):
-                ingredient = Ingredient(
-                    name=row['абрикосовое варенье'],
-                    measurement_unit=row['г']
-                )
-                ingredient.save()
+        started = time.monotonic()
+        rows = 0
+        with open(path, encoding='utf-8') as file, transaction.atomic():
+            count_before = Ingredient.objects.count()
+            ingredients = (
+                Ingredient(name=name.strip(),
+                           measurement_unit=measurement_unit.strip())
+                for name, measurement_unit in READERS[file_format](file)
+            )
+            while True:
+                batch = list(islice(ingredients, batch_size))
+                if not batch:
+                    break
+                Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+                rows += len(batch)
+            created = Ingredient.objects.count() - count_before
+            if options['dry_run']:
+                transaction.set_rollback(True)
 
+        elapsed = time.monotonic() - started
+        rate = rows / elapsed if elapsed else rows
+        self.stdout.write(
+            f'{rows} rows read, {created} ingredients created, '
+            f'{rows - created} skipped in {elapsed:.2f}s ({rate:.0f} rows/s).'
+        )
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run: rolled back.'))
+            return
         self.stdout.write(
             self.style.SUCCESS(
                 'Load_ingridients_data executed successfully.'
@@ -0,0 +1,95 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management import BaseCommand, CommandError
+
+DEFAULT_PATHS = ('/api/recipes/', '/api/tags/', '/api/ingredients/?name=а')
+
+
+class Command(BaseCommand):
+    help = (
+        'Sends GET requests to a running server and reports requests/sec '
+        'and latency. Run it against the server started with '
+        'DB_CONN_MAX_AGE=0 and with persistent connections to compare.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', default='http://localhost:8000',
+            help='Server base URL.'
+        )
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help=f'Path to request, can be repeated. Defaults to '
+                 f'{", ".join(DEFAULT_PATHS)}.'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=1000,
+            help='Total number of requests.'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=10,
+            help='Number of concurrent clients.'
+        )
+        parser.add_argument(
+            '--token',
+            help='Auth token. For an admin token the connection reuse '
+                 'report of the server (/api/connections/) is printed too.'
+        )
+
+    def handle(self, *args, **options):
+        if options['requests'] <= 0 or options['concurrency'] <= 0:
+            raise CommandError(
+                '--requests and --concurrency must be positive.'
+            )
+        base_url = options['url'].rstrip('/')
+        paths = options['paths'] or DEFAULT_PATHS
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+
+        def client(number):
+            session = requests.Session()
+            session.headers.update(headers)
+            results = []
+            for index in range(number, options['requests'],
+                               options['concurrency']):
+                started = time.perf_counter()
+                try:
+                    ok = session.get(
+                        base_url + paths[index % len(paths)]
+                    ).ok
+                except requests.RequestException:
+                    ok = False
+                results.append((time.perf_counter() - started, ok))
+            return results
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            results = [
+                result
+                for client_results in executor.map(
+                    client, range(options['concurrency'])
+                )
+                for result in client_results
+            ]
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency * 1000 for latency, _ in results)
+        errors = sum(1 for _, ok in results if not ok)
+        self.stdout.write(
+            f'{len(results)} requests in {elapsed:.2f}s: '
+            f'{len(results) / elapsed:.1f} requests/sec, {errors} errors.'
+        )
+        self.stdout.write(
+            f'Latency, ms: median {statistics.median(latencies):.1f}, '
+            f'p95 {latencies[int(len(latencies) * 0.95) - 1]:.1f}, '
+            f'max {latencies[-1]:.1f}.'
+        )
+        if options['token']:
+            response = requests.get(f'{base_url}/api/connections/',
+                                    headers=headers)
+            if response.ok:
+                self.stdout.write(f'Connections: {response.json()}')
@@ -0,0 +1,85 @@
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+
+from api.utils import actual_count
+from recipe.models import Favorit, Recipe, ShoppingCartUser
+from user.models import Subscription
+
+User = get_user_model()
+
+DEFAULT_BATCH_SIZE = 1000
+
+# (модель, счётчик, модель связи, поле связи со счётчиком)
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorit, 'recipe'),
+    (Recipe, 'cart_count', ShoppingCartUser, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscription, 'author'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalculates denormalized counters (Recipe.favorites_count, '
+        'Recipe.cart_count, User.recipes_count, User.followers_count) '
+        'in batches and fixes the ones that drifted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Number of objects checked per query.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report drifted counters.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size <= 0:
+            raise CommandError('--batch-size must be positive.')
+        for model, counter, related_model, field in COUNTERS:
+            fixed = self.reconcile(model, counter, related_model, field,
+                                   batch_size, options['dry_run'])
+            self.stdout.write(
+                f'{model.__name__}.{counter}: {fixed} drifted.'
+            )
+        self.stdout.write(
+            self.style.SUCCESS('Reconcile_counters executed successfully.')
+        )
+
+    def reconcile(self, model, counter, related_model, field, batch_size,
+                  dry_run):
+        """
+        Проходит объекты model пачками по первичному ключу, находит
+        объекты со счётчиком, отличным от фактического, и пересчитывает
+        его одним UPDATE на пачку.
+        Returns:
+            int: Колличество объектов с неверным счётчиком.
+        """
+        fixed = 0
+        last_pk = None
+        while True:
+            queryset = model.objects.order_by('pk')
+            if last_pk is not None:
+                queryset = queryset.filter(pk__gt=last_pk)
+            batch = list(queryset.values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                return fixed
+            last_pk = batch[-1]
+            drifted = list(
+                model.objects.filter(pk__in=batch).annotate(
+                    actual=actual_count(related_model, field)
+                ).exclude(
+                    **{counter: F('actual')}
+                ).values_list('pk', flat=True)
+            )
+            fixed += len(drifted)
+            if drifted and not dry_run:
+                with transaction.atomic():
+                    model.objects.filter(pk__in=drifted).update(
+                        **{counter: actual_count(related_model, field)}
+                    )
@@ -0,0 +1,121 @@
+import math
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from foodgram.settings import (CART_SCORE_WEIGHT, FAVORITE_SCORE_WEIGHT,
+                               TRENDING_HALF_LIFE)
+from recipe.models import Favorit, Recipe, ScoreWatermark, ShoppingCartUser
+
+DEFAULT_BATCH_SIZE = 5000
+
+# Точка отсчёта времени для trending_score.
+SCORE_EPOCH = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+SOURCES = (
+    ('favorit', Favorit, FAVORITE_SCORE_WEIGHT),
+    ('shoppingcartuser', ShoppingCartUser, CART_SCORE_WEIGHT),
+)
+
+
+def log2_add(a: float, b: float) -> float:
+    """ log2(2**a + 2**b) без переполнения."""
+    if a < b:
+        a, b = b, a
+    return a + math.log2(1 + 2 ** (b - a))
+
+
+def trending_exponent(created: datetime, weight: int) -> float:
+    """
+    log2 вклада добавления в trending_score: weight * 2 ** (t / T), где
+    t — время добавления от SCORE_EPOCH, T — период полураспада.
+    Вклад старых добавлений относительно новых убывает вдвое каждые
+    TRENDING_HALF_LIFE секунд, поэтому порядок рецептов по сумме вкладов
+    совпадает с порядком по затухающей популярности на любой момент
+    времени, и накопленную сумму не нужно пересчитывать со временем.
+    Сумма хранится логарифмом, чтобы не переполнять float.
+    """
+    age = (created - SCORE_EPOCH).total_seconds()
+    return age / TRENDING_HALF_LIFE + math.log2(weight)
+
+
+class Command(BaseCommand):
+    help = (
+        'Updates Recipe.popular_score and Recipe.trending_score with '
+        'favorites and shopping cart additions made since the last run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Number of new rows processed per transaction.'
+        )
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Reset all scores and recalculate them from scratch '
+                 '(also drops removed favorites and cart additions).'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size <= 0:
+            raise CommandError('--batch-size must be positive.')
+        if options['full']:
+            with transaction.atomic():
+                Recipe.objects.update(popular_score=0, trending_score=0)
+                ScoreWatermark.objects.update(last_id=0)
+        for source, model, weight in SOURCES:
+            processed = 0
+            while True:
+                rows = self.process_batch(source, model, weight, batch_size)
+                if not rows:
+                    break
+                processed += rows
+            self.stdout.write(f'{source}: {processed} new rows.')
+        self.stdout.write(
+            self.style.SUCCESS('Update_recipe_scores executed successfully.')
+        )
+
+    @transaction.atomic
+    def process_batch(self, source, model, weight, batch_size) -> int:
+        """
+        Учитывает в популярности рецептов очередную пачку записей model,
+        добавленных после отметки source, и сдвигает отметку.
+        Returns:
+            int: Колличество обработанных записей.
+        """
+        watermark, _ = ScoreWatermark.objects.select_for_update(
+        ).get_or_create(source=source)
+        rows = list(
+            model.objects.filter(
+                id__gt=watermark.last_id
+            ).order_by('id').values_list('id', 'recipe_id', 'created')[
+                :batch_size
+            ]
+        )
+        if not rows:
+            return 0
+        popular = defaultdict(int)
+        trending = defaultdict(list)
+        for _, recipe_id, created in rows:
+            popular[recipe_id] += weight
+            trending[recipe_id].append(trending_exponent(created, weight))
+        recipes = list(
+            Recipe.objects.select_for_update().filter(
+                id__in=popular
+            ).only('id', 'popular_score', 'trending_score')
+        )
+        for recipe in recipes:
+            recipe.popular_score += popular[recipe.id]
+            for exponent in trending[recipe.id]:
+                recipe.trending_score = log2_add(
+                    recipe.trending_score, exponent
+                )
+        Recipe.objects.bulk_update(
+            recipes, ['popular_score', 'trending_score']
+        )
+        watermark.last_id = rows[-1][0]
+        watermark.save(update_fields=['last_id'])
+        return len(rows)
@@ -0,0 +1,62 @@
+# Generated by Django 3.2.18 on 2026-10-18 05:54
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+AMOUNT_MAX = 32767
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """
+    Объединяет ингредиенты с одинаковыми названием и единицей измерения
+    перед добавлением ограничения уникальности: связи рецептов переносятся
+    на ингредиент с наименьшим id, остальные удаляются. Если в рецепте
+    были оба ингредиента, их колличество складывается.
+    """
+    Ingredient = apps.get_model('recipe', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipe', 'RecipeIngredient')
+    duplicates = Ingredient.objects.order_by().values(
+        'name', 'measurement_unit'
+    ).annotate(count=Count('id'), keep=Min('id')).filter(count__gt=1)
+    for duplicate in duplicates:
+        extra_ids = list(Ingredient.objects.filter(
+            name=duplicate['name'],
+            measurement_unit=duplicate['measurement_unit']
+        ).exclude(id=duplicate['keep']).values_list('id', flat=True))
+        kept = {
+            recipe_ingredient.recipe_id: recipe_ingredient
+            for recipe_ingredient in RecipeIngredient.objects.filter(
+                ingredient_id=duplicate['keep']
+            )
+        }
+        for recipe_ingredient in RecipeIngredient.objects.filter(
+            ingredient_id__in=extra_ids
+        ).order_by('id'):
+            survivor = kept.get(recipe_ingredient.recipe_id)
+            if survivor is None:
+                recipe_ingredient.ingredient_id = duplicate['keep']
+                recipe_ingredient.save(update_fields=['ingredient'])
+                kept[recipe_ingredient.recipe_id] = recipe_ingredient
+                continue
+            survivor.amount = min(
+                survivor.amount + recipe_ingredient.amount, AMOUNT_MAX
+            )
+            survivor.save(update_fields=['amount'])
+            recipe_ingredient.delete()
+        Ingredient.objects.filter(id__in=extra_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0002_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_ingredients,
+                             migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_name_measurement_unit'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+COUNTERS = (
+    ('recipe', 'Recipe', 'favorites_count', 'recipe', 'Favorit', 'recipe'),
+    ('recipe', 'Recipe', 'cart_count', 'recipe', 'ShoppingCartUser',
+     'recipe'),
+    ('user', 'User', 'recipes_count', 'recipe', 'Recipe', 'author'),
+    ('user', 'User', 'followers_count', 'user', 'Subscription', 'author'),
+)
+
+
+def populate_counters(apps, schema_editor):
+    for (app_label, model_name, counter,
+         related_app_label, related_model_name, field) in COUNTERS:
+        model = apps.get_model(app_label, model_name)
+        related_model = apps.get_model(related_app_label, related_model_name)
+        count = related_model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(count=Count('pk')).values('count')
+        model.objects.update(**{counter: Coalesce(
+            Subquery(count, output_field=IntegerField()), 0
+        )})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0004_counters'),
+        ('user', '0002_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 3.2.18 on 2026-10-18 05:59
+
+import datetime
+
+from django.db import migrations, models
+
+# Дата добавления существующих записей избранного и списков покупок
+# неизвестна. Им проставляется точка отсчёта trending_score
+# (SCORE_EPOCH команды update_recipe_scores), а не время миграции:
+# иначе все старые добавления посчитались бы сделанными только что и
+# подняли бы в популярном за последнее время давно популярные рецепты.
+# Вклад таких записей в trending_score пренебрежимо мал по сравнению с
+# новыми, в popular_score они учитываются полностью.
+UNKNOWN_CREATED = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0005_populate_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreWatermark',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=50, unique=True, verbose_name='Источник')),
+                ('last_id', models.BigIntegerField(default=0, verbose_name='Последняя учтённая запись')),
+            ],
+            options={
+                'verbose_name': 'отметка пересчёта популярности',
+                'verbose_name_plural': 'отметки пересчёта популярности',
+            },
+        ),
+        migrations.AddField(
+            model_name='favorit',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=UNKNOWN_CREATED, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='popular_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Популярность'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Популярность за последнее время'),
+        ),
+        migrations.AddField(
+            model_name='shoppingcartuser',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=UNKNOWN_CREATED, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-popular_score', '-id'], name='recipe_popular_score_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-trending_score', '-id'], name='recipe_trending_score_id_idx'),
+        ),
+    ]
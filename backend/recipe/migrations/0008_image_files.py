@@ -0,0 +1,36 @@
+# Generated by Django 3.2.18 on 2026-10-18 06:07
+
+from django.db import migrations, models
+import recipe.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0007_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageFile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Файл')),
+                ('references', models.IntegerField(default=0, verbose_name='Колличество ссылок')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Изменён')),
+            ],
+            options={
+                'verbose_name': 'файл изображения',
+                'verbose_name_plural': 'файлы изображений',
+            },
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(help_text='Добавьте изображение готового блюда.', storage=recipe.storage.ContentAddressedStorage(), upload_to='recipe/images/'),
+        ),
+        migrations.AddIndex(
+            model_name='imagefile',
+            index=models.Index(fields=['references', 'updated'], name='imagefile_references_idx'),
+        ),
+    ]
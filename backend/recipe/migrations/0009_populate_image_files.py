@@ -0,0 +1,29 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def populate_image_files(apps, schema_editor):
+    Recipe = apps.get_model('recipe', 'Recipe')
+    ImageFile = apps.get_model('recipe', 'ImageFile')
+    images = Recipe.objects.exclude(image='').order_by().values(
+        'image'
+    ).annotate(references=Count('pk'))
+    ImageFile.objects.bulk_create(
+        (
+            ImageFile(name=image['image'], references=image['references'])
+            for image in images.iterator()
+        ),
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0008_image_files'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_image_files, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,123 @@
+import django.contrib.postgres.search
+from django.db import migrations
+
+# DDL поискового индекса на момент миграции. Миграция не импортирует
+# api.search, чтобы последующие изменения индекса не меняли её.
+POSTGRES_CREATE = (
+    """
+    CREATE OR REPLACE FUNCTION recipe_recipe_search_vector_update()
+    RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := setweight(
+            to_tsvector('russian', replace(replace(
+                coalesce(NEW.name, ''), 'ё', 'е'), 'Ё', 'Е')),
+            'A'
+        ) || setweight(
+            to_tsvector('russian', replace(replace(
+                coalesce(NEW.text, ''), 'ё', 'е'), 'Ё', 'Е')),
+            'B'
+        );
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER recipe_recipe_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, text ON recipe_recipe
+    FOR EACH ROW EXECUTE PROCEDURE recipe_recipe_search_vector_update()
+    """,
+    'UPDATE recipe_recipe SET name = name',
+    """
+    CREATE INDEX recipe_recipe_search_vector_idx
+    ON recipe_recipe USING GIN (search_vector)
+    """,
+)
+POSTGRES_DROP = (
+    'DROP INDEX IF EXISTS recipe_recipe_search_vector_idx',
+    'DROP TRIGGER IF EXISTS recipe_recipe_search_vector_trigger '
+    'ON recipe_recipe',
+    'DROP FUNCTION IF EXISTS recipe_recipe_search_vector_update()',
+)
+SQLITE_CREATE = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS recipe_recipe_fts USING fts5(
+        name, text, tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipe_recipe_fts_insert
+    AFTER INSERT ON recipe_recipe BEGIN
+        INSERT INTO recipe_recipe_fts(rowid, name, text) VALUES (
+            new.id,
+            replace(replace(new.name, 'ё', 'е'), 'Ё', 'Е'),
+            replace(replace(new.text, 'ё', 'е'), 'Ё', 'Е')
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipe_recipe_fts_delete
+    AFTER DELETE ON recipe_recipe BEGIN
+        DELETE FROM recipe_recipe_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipe_recipe_fts_update
+    AFTER UPDATE OF name, text ON recipe_recipe BEGIN
+        DELETE FROM recipe_recipe_fts WHERE rowid = old.id;
+        INSERT INTO recipe_recipe_fts(rowid, name, text) VALUES (
+            new.id,
+            replace(replace(new.name, 'ё', 'е'), 'Ё', 'Е'),
+            replace(replace(new.text, 'ё', 'е'), 'Ё', 'Е')
+        );
+    END
+    """,
+    'DELETE FROM recipe_recipe_fts',
+    """
+    INSERT INTO recipe_recipe_fts(rowid, name, text)
+    SELECT id,
+           replace(replace(name, 'ё', 'е'), 'Ё', 'Е'),
+           replace(replace(text, 'ё', 'е'), 'Ё', 'Е')
+    FROM recipe_recipe
+    """,
+)
+SQLITE_DROP = (
+    'DROP TRIGGER IF EXISTS recipe_recipe_fts_insert',
+    'DROP TRIGGER IF EXISTS recipe_recipe_fts_delete',
+    'DROP TRIGGER IF EXISTS recipe_recipe_fts_update',
+    'DROP TABLE IF EXISTS recipe_recipe_fts',
+)
+
+
+def execute(schema_editor, statements: dict) -> None:
+    for statement in statements.get(schema_editor.connection.vendor, ()):
+        schema_editor.execute(statement, params=None)
+
+
+def create_index(apps, schema_editor):
+    execute(schema_editor, {
+        'postgresql': POSTGRES_CREATE,
+        'sqlite': SQLITE_CREATE,
+    })
+
+
+def drop_index(apps, schema_editor):
+    execute(schema_editor, {
+        'postgresql': POSTGRES_DROP,
+        'sqlite': SQLITE_DROP,
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0010_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, help_text='Заполняется триггером БД из названия и описания.', null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -1,8 +1,11 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ValidationError
 from django.core.validators import MinLengthValidator, MinValueValidator
 from django.db import models
 
+from recipe.storage import content_addressed_storage
+
 User = get_user_model()
 
 
@@ -25,6 +28,9 @@ class Tag(models.Model):
         verbose_name='slug',
         unique=True
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения', auto_now=True, db_index=True
+    )
 
     class Meta:
         verbose_name = 'тэг'
@@ -41,22 +47,32 @@ class Tag(models.Model):
 
 
 class Ingredient(models.Model):
-    """ Модель для описания ингредиентов."""
+    """ Модель для описания ингредиентов.
+    Поиск по названию обслуживает индекс ограничения
+    unique_name_measurement_unit (название — его первый столбец), поэтому
+    отдельных индексов у полей нет."""
     name = models.CharField(
         max_length=200,
-        db_index=True,
         verbose_name='Название'
     )
     measurement_unit = models.CharField(
         max_length=24,
-        db_index=True,
         verbose_name='Ед-ца измерения'
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения', auto_now=True, db_index=True
+    )
 
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ('id', )
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_name_measurement_unit'
+            )
+        ]
 
     def __str__(self):
         return self.name
@@ -69,11 +85,19 @@ class Ingredient(models.Model):
         super().clean()
 
 
+class RecipeManager(models.Manager):
+    """ Не загружает поисковый вектор рецепта: он нужен только в запросе."""
+
+    def get_queryset(self):
+        return super().get_queryset().defer('search_vector')
+
+
 class Recipe(models.Model):
     """ Модель для описания рецептов."""
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_index=False,
         verbose_name='Автор',
         related_name='recipes',
         help_text='Добавьте автора рецепта.'
@@ -86,6 +110,7 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         upload_to='recipe/images/',
+        storage=content_addressed_storage,
         help_text='Добавьте изображение готового блюда.'
     )
     text = models.TextField(
@@ -107,16 +132,72 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         'Дата публикации', auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения', auto_now=True
+    )
     cooking_time = models.PositiveSmallIntegerField(
         'Время готовки',
         validators=[MinValueValidator(1)],
         help_text='Оцените время, потраченное на приготовление рецепта.'
     )
+    favorites_count = models.PositiveIntegerField(
+        'В избранном',
+        default=0,
+        editable=False
+    )
+    cart_count = models.PositiveIntegerField(
+        'В корзинах покупок',
+        default=0,
+        editable=False
+    )
+    popular_score = models.FloatField(
+        'Популярность',
+        default=0,
+        editable=False
+    )
+    trending_score = models.FloatField(
+        'Популярность за последнее время',
+        default=0,
+        editable=False
+    )
+    image_variants = models.JSONField(
+        'Варианты изображения',
+        default=dict,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False,
+        help_text='Заполняется триггером БД из названия и описания.'
+    )
+
+    objects = RecipeManager()
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'рецепт'
         verbose_name_plural = 'рецепты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['-popular_score', '-id'],
+                name='recipe_popular_score_id_idx'
+            ),
+            models.Index(
+                fields=['-trending_score', '-id'],
+                name='recipe_trending_score_id_idx'
+            ),
+            # Рецепты автора в порядке ленты: фильтр author и рецепты
+            # в подписках. Заменяет индекс внешнего ключа author.
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -132,12 +213,57 @@ class Recipe(models.Model):
         ]
         RecipeIngredient.objects.bulk_create(lst_ingrd)
 
+    def update_ingredients(self, ingredients):
+        """
+        Приводит ингредиенты рецепта к переданному списку, записывая в БД
+        только отличия: новые ингредиенты добавляются, у оставшихся
+        обновляется колличество, если оно изменилось, отсутствующие в
+        списке удаляются.
+        """
+        current = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in RecipeIngredient.objects.filter(
+                recipe=self
+            )
+        }
+        new = {
+            ingredient['id'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+        to_create = []
+        to_update = []
+        for ingredient_id, amount in new.items():
+            recipe_ingredient = current.get(ingredient_id)
+            if recipe_ingredient is None:
+                to_create.append(RecipeIngredient(
+                    ingredient_id=ingredient_id,
+                    amount=amount,
+                    recipe=self,
+                ))
+            elif recipe_ingredient.amount != amount:
+                recipe_ingredient.amount = amount
+                to_update.append(recipe_ingredient)
+        to_delete = [
+            recipe_ingredient.id
+            for ingredient_id, recipe_ingredient in current.items()
+            if ingredient_id not in new
+        ]
+        if to_delete:
+            RecipeIngredient.objects.filter(id__in=to_delete).delete()
+        if to_update:
+            RecipeIngredient.objects.bulk_update(to_update, ['amount'])
+        if to_create:
+            RecipeIngredient.objects.bulk_create(to_create)
+
 
 class RecipeIngredient(models.Model):
-    """ Модель для сопоставления связи рецепта и ингридиентов."""
+    """ Модель для сопоставления связи рецепта и ингридиентов.
+    Запросы по recipe обслуживает индекс ограничения
+    unique_recipe_ingredient, отдельного индекса у поля нет."""
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
+        db_index=False,
         verbose_name='Рецепт',
         related_name='ingredient',
     )
@@ -165,15 +291,19 @@ class RecipeIngredient(models.Model):
 
 
 class RecipeTag(models.Model):
-    """ Модель для сопоставления связи рецепта и тэгов."""
+    """ Модель для сопоставления связи рецепта и тэгов.
+    Запросы по recipe обслуживает индекс ограничения unique_recipe_tag,
+    по tag — индекс recipetag_tag_recipe_idx."""
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
+        db_index=False,
         verbose_name='Рецепт'
     )
     tag = models.ForeignKey(
         Tag,
         on_delete=models.PROTECT,
+        db_index=False,
         verbose_name='Тэг'
     )
 
@@ -187,13 +317,24 @@ class RecipeTag(models.Model):
                 name='unique_recipe_tag'
             )
         ]
+        indexes = [
+            # Фильтр рецептов по тэгам: id рецептов берутся из индекса
+            # без чтения таблицы. Заменяет индекс внешнего ключа tag.
+            models.Index(
+                fields=['tag', 'recipe'],
+                name='recipetag_tag_recipe_idx'
+            ),
+        ]
 
 
 class Favorit(models.Model):
-    """ Модель для добавления рецептов в избранное пользователя."""
+    """ Модель для добавления рецептов в избранное пользователя.
+    Запросы по favoriter обслуживает индекс ограничения
+    unique_favoriter_recipe, отдельного индекса у поля нет."""
     favoriter = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='favorits',
         verbose_name='Избиратель'
     )
@@ -204,6 +345,10 @@ class Favorit(models.Model):
         related_name='favorited',
         verbose_name='Рецепты'
     )
+    created = models.DateTimeField(
+        'Дата добавления',
+        auto_now_add=True
+    )
 
     class Meta:
         ordering = ['favoriter']
@@ -221,10 +366,13 @@ class Favorit(models.Model):
 
 
 class ShoppingCartUser(models.Model):
-    """ Модель для добавления рецептов в корзину покупок."""
+    """ Модель для добавления рецептов в корзину покупок.
+    Запросы по owner обслуживает индекс ограничения unique_owner_recipe,
+    отдельного индекса у поля нет."""
     owner = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_index=False,
         verbose_name='Владелец',
         related_name='shopping_cart_owner',
     )
@@ -234,6 +382,10 @@ class ShoppingCartUser(models.Model):
         related_name='in_shopping_cart',
         verbose_name='Рецепты'
     )
+    created = models.DateTimeField(
+        'Дата добавления',
+        auto_now_add=True
+    )
 
     class Meta:
         ordering = ['recipe']
@@ -248,3 +400,58 @@ class ShoppingCartUser(models.Model):
 
     def __str__(self):
         return f'{self.owner} -> {self.recipe}'
+
+
+class ScoreWatermark(models.Model):
+    """
+    Последняя запись источника (избранное, корзина покупок), учтённая
+    в популярности рецептов командой update_recipe_scores.
+    """
+    source = models.CharField(
+        'Источник',
+        max_length=50,
+        unique=True
+    )
+    last_id = models.BigIntegerField(
+        'Последняя учтённая запись',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = 'отметка пересчёта популярности'
+        verbose_name_plural = 'отметки пересчёта популярности'
+
+    def __str__(self):
+        return f'{self.source}: {self.last_id}'
+
+
+class ImageFile(models.Model):
+    """
+    Файл изображения в хранилище ContentAddressedStorage и колличество
+    рецептов, которые на него ссылаются. Файлы без ссылок удаляются
+    командой collect_images.
+    """
+    name = models.CharField(
+        'Файл',
+        max_length=255,
+        unique=True
+    )
+    references = models.IntegerField(
+        'Колличество ссылок',
+        default=0
+    )
+    updated = models.DateTimeField(
+        'Изменён',
+        auto_now=True
+    )
+
+    class Meta:
+        verbose_name = 'файл изображения'
+        verbose_name_plural = 'файлы изображений'
+        indexes = [
+            models.Index(fields=['references', 'updated'],
+                         name='imagefile_references_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name}: {self.references}'
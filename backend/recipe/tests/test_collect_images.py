@@ -0,0 +1,68 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase
+
+from api.images import build_variants, change_image_references
+from api.tests.factories import image_file, use_temporary_media
+from recipe.models import ImageFile
+from recipe.storage import content_addressed_storage
+
+
+class CollectImagesTest(TestCase):
+    """
+    Удаление файлов изображений без ссылок рецептов вместе с вариантами
+    (collect_images) и учёт ссылок (change_image_references).
+    """
+
+    def setUp(self):
+        use_temporary_media(self)
+
+    def save_image(self, color: str, references: int) -> tuple:
+        """ Сохраняет изображение с вариантами и ссылками references."""
+        name = content_addressed_storage.save(
+            'recipe/images/image.png', image_file(color=color)
+        )
+        with content_addressed_storage.open(name) as source:
+            variants = build_variants(source)
+        change_image_references(name, references)
+        return name, [
+            path for formats in variants.values() for path in formats.values()
+        ]
+
+    def collect(self):
+        call_command('collect_images', grace=0, stdout=StringIO())
+
+    def test_references(self):
+        name, _ = self.save_image('red', 1)
+        change_image_references(name, 2)
+        change_image_references(name, -1)
+        self.assertEqual(ImageFile.objects.get(name=name).references, 2)
+
+    def test_unreferenced_deleted_with_variants(self):
+        unused, unused_variants = self.save_image('red', 0)
+        used, used_variants = self.save_image('blue', 1)
+        # Хэш для имён вариантов берётся из имени файла без его чтения.
+        with mock.patch.object(content_addressed_storage, 'open') as open_:
+            self.collect()
+        open_.assert_not_called()
+        self.assertFalse(content_addressed_storage.exists(unused))
+        for path in unused_variants:
+            self.assertFalse(default_storage.exists(path))
+        self.assertTrue(content_addressed_storage.exists(used))
+        for path in used_variants:
+            self.assertTrue(default_storage.exists(path))
+        self.assertEqual(
+            list(ImageFile.objects.values_list('name', flat=True)), [used]
+        )
+
+    def test_released_file_deleted(self):
+        name, variants = self.save_image('green', 1)
+        self.collect()
+        self.assertTrue(content_addressed_storage.exists(name))
+        change_image_references(name, -1)
+        self.collect()
+        self.assertFalse(content_addressed_storage.exists(name))
+        self.assertFalse(ImageFile.objects.exists())
@@ -0,0 +1,78 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+
+from api.tests.factories import (create_ingredient, create_recipe,
+                                 create_tag, create_user)
+from recipe.management.commands.explain_queries import Command
+from recipe.models import ShoppingCartUser
+
+
+class ExplainQueriesTest(TestCase):
+    """
+    Советник по индексам (explain_queries): повторяет запросы API и
+    выводит последовательные чтения больших таблиц.
+    """
+    # Команда перехватывает запросы всех соединений.
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        cls.recipe = create_recipe(create_user(), tags=[create_tag()],
+                                   ingredients={create_ingredient(): 10})
+        ShoppingCartUser.objects.create(owner=cls.user, recipe=cls.recipe)
+
+    def explain_queries(self, *args) -> str:
+        out = StringIO()
+        call_command('explain_queries', *args, stdout=out)
+        return out.getvalue()
+
+    def test_default_paths(self):
+        output = self.explain_queries('--threshold', '1000000',
+                                      '--user', self.user.username)
+        for path in (f'/api/recipes/{self.recipe.id}/',
+                     f'/api/recipes/?author={self.recipe.author_id}',
+                     '/api/recipes/cookable/?ingredients=',
+                     '/api/tags/'):
+            with self.subTest(path=path):
+                self.assertIn(f'GET {path}', output)
+        self.assertNotIn('status', output)
+        self.assertIn('0 sequential scans over 1000000 rows.', output)
+        self.assertIn('Explain_queries executed successfully.', output)
+
+    def test_sequential_scans_reported(self):
+        # Список пользователей читает всю таблицу user_user (2 строки).
+        args = ('--path', '/api/users/', '--user', self.user.username)
+        output = self.explain_queries('--threshold', '2', *args)
+        self.assertIn('Sequential scan of user_user (~2 rows)', output)
+        self.assertIn('1 sequential scans over 2 rows.', output)
+        output = self.explain_queries('--threshold', '3', *args)
+        self.assertNotIn('Sequential scan', output)
+
+    def test_aliases_resolved(self):
+        """
+        Псевдонимы таблиц подзапросов в плане SQLite заменяются именами
+        таблиц.
+        """
+        if connection.vendor != 'sqlite':
+            self.skipTest('Plan format of SQLite.')
+        plan, scans = Command().explain_sqlite(connection, (
+            'SELECT "recipe_recipe"."id" FROM "recipe_recipe" '
+            'WHERE "recipe_recipe"."id" IN (SELECT U0."recipe_id" '
+            'FROM "recipe_recipeingredient" U0 WHERE U0."amount" > 1)'
+        ))
+        self.assertTrue(plan)
+        self.assertIn('recipe_recipeingredient', scans)
+        self.assertNotIn('U0', scans)
+
+    def test_invalid_arguments(self):
+        for args, message in (
+            (('--threshold', '-1'), '--threshold must not be negative.'),
+            (('--user', 'unknown'), 'No user to make requests as.'),
+        ):
+            with self.subTest(args=args):
+                with self.assertRaisesMessage(CommandError, message):
+                    self.explain_queries(*args)
@@ -0,0 +1,44 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from recipe.models import Ingredient
+
+
+class LoadIngridientsDataTest(TestCase):
+    """ Загрузка ингредиентов из CSV/JSON (load_ingridients_data)."""
+
+    def load(self, content: str, suffix: str = '.csv') -> str:
+        with tempfile.NamedTemporaryFile(
+            'w', suffix=suffix, encoding='utf-8', delete=False
+        ) as file:
+            file.write(content)
+        self.addCleanup(os.remove, file.name)
+        stdout = StringIO()
+        call_command('load_ingridients_data', path=file.name, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_blank_lines_skipped(self):
+        output = self.load('соль,г\n\n , \nсахар,г\nсоль,г\n')
+        self.assertIn('3 rows read, 2 ingredients created, 1 skipped',
+                      output)
+        self.assertEqual(
+            set(Ingredient.objects.values_list('name', flat=True)),
+            {'соль', 'сахар'}
+        )
+
+    def test_short_row(self):
+        for row in ('перец', 'перец,', ',г'):
+            with self.subTest(row=row):
+                with self.assertRaisesMessage(CommandError, 'Line 3:'):
+                    self.load(f'соль,г\n\n{row}\nсахар,г\n')
+                self.assertFalse(Ingredient.objects.exists())
+
+    def test_json_item_without_fields(self):
+        with self.assertRaisesMessage(CommandError, 'Item 2:'):
+            self.load('[{"name": "соль", "measurement_unit": "г"}, '
+                      '{"name": "перец"}]', suffix='.json')
+        self.assertFalse(Ingredient.objects.exists())
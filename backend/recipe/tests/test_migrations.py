@@ -0,0 +1,146 @@
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from foodgram.settings import CART_SCORE_WEIGHT, FAVORITE_SCORE_WEIGHT
+from recipe.management.commands.update_recipe_scores import (
+    SCORE_EPOCH, trending_exponent)
+
+
+class MigrationTestCase(TransactionTestCase):
+    """
+    Откатывает миграции приложения к migrate_from (миграции остальных
+    приложений остаются последними), передаёт модели этого состояния
+    в setUpBeforeMigration и применяет миграцию migrate_to.
+    После теста применяет все миграции.
+    """
+    migrate_from = None
+    migrate_to = None
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        targets = [target] + [
+            node for node in executor.loader.graph.leaf_nodes()
+            if node[0] != target[0]
+        ]
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def setUp(self):
+        self.setUpBeforeMigration(self.migrate(self.migrate_from))
+        self.apps = self.migrate(self.migrate_to)
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def setUpBeforeMigration(self, apps):
+        pass
+
+
+class MergeDuplicateIngredientsTest(MigrationTestCase):
+    migrate_from = ('recipe', '0002_recipe_pub_date_id_idx')
+    migrate_to = ('recipe', '0003_ingredient_unique_name_measurement_unit')
+
+    def setUpBeforeMigration(self, apps):
+        User = apps.get_model('user', 'User')
+        Ingredient = apps.get_model('recipe', 'Ingredient')
+        Recipe = apps.get_model('recipe', 'Recipe')
+        RecipeIngredient = apps.get_model('recipe', 'RecipeIngredient')
+        author = User.objects.create(username='author',
+                                     email='author@example.com')
+        self.flour, flour_copy, flour_copy_2 = (
+            Ingredient.objects.create(name='мука', measurement_unit='г')
+            for _ in range(3)
+        )
+        self.salt = Ingredient.objects.create(name='соль',
+                                              measurement_unit='г')
+        self.first, self.second = (
+            Recipe.objects.create(author=author, name=name, text=name,
+                                  image='recipe/images/1.jpg',
+                                  cooking_time=1)
+            for name in ('блины', 'хлеб')
+        )
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=self.first, ingredient=self.flour,
+                             amount=100),
+            RecipeIngredient(recipe=self.first, ingredient=flour_copy,
+                             amount=50),
+            RecipeIngredient(recipe=self.first, ingredient=self.salt,
+                             amount=5),
+            RecipeIngredient(recipe=self.second, ingredient=flour_copy_2,
+                             amount=300),
+        ])
+
+    def test_duplicates_merged(self):
+        Ingredient = self.apps.get_model('recipe', 'Ingredient')
+        RecipeIngredient = self.apps.get_model('recipe', 'RecipeIngredient')
+        self.assertEqual(
+            list(Ingredient.objects.order_by('id').values_list('id',
+                                                               flat=True)),
+            [self.flour.id, self.salt.id]
+        )
+        self.assertEqual(
+            set(RecipeIngredient.objects.values_list(
+                'recipe_id', 'ingredient_id', 'amount'
+            )),
+            {(self.first.id, self.flour.id, 150),
+             (self.first.id, self.salt.id, 5),
+             (self.second.id, self.flour.id, 300)}
+        )
+
+
+class BackfillCreatedTest(MigrationTestCase):
+    migrate_from = ('recipe', '0005_populate_counters')
+    migrate_to = ('recipe', '0006_recipe_scores')
+
+    def setUpBeforeMigration(self, apps):
+        User = apps.get_model('user', 'User')
+        Recipe = apps.get_model('recipe', 'Recipe')
+        Favorit = apps.get_model('recipe', 'Favorit')
+        ShoppingCartUser = apps.get_model('recipe', 'ShoppingCartUser')
+        user = User.objects.create(username='user', email='user@example.com')
+        recipe = Recipe.objects.create(author=user, name='блины',
+                                       text='блины', cooking_time=1,
+                                       image='recipe/images/1.jpg')
+        Favorit.objects.create(favoriter=user, recipe=recipe)
+        ShoppingCartUser.objects.create(owner=user, recipe=recipe)
+
+    def test_old_rows_do_not_count_as_recent(self):
+        for model_name in ('Favorit', 'ShoppingCartUser'):
+            model = self.apps.get_model('recipe', model_name)
+            self.assertEqual(
+                set(model.objects.values_list('created', flat=True)),
+                {SCORE_EPOCH}
+            )
+        self.assertLess(
+            2 ** trending_exponent(SCORE_EPOCH, FAVORITE_SCORE_WEIGHT),
+            2 ** trending_exponent(timezone.now(), CART_SCORE_WEIGHT)
+            / 10 ** 6
+        )
+
+
+class RecipeSearchIndexTest(MigrationTestCase):
+    migrate_from = ('recipe', '0010_recipe_updated_at')
+    migrate_to = ('recipe', '0011_recipe_search')
+
+    def setUpBeforeMigration(self, apps):
+        User = apps.get_model('user', 'User')
+        Recipe = apps.get_model('recipe', 'Recipe')
+        author = User.objects.create(username='author',
+                                     email='author@example.com')
+        self.recipe = Recipe.objects.create(
+            author=author, name='Ёлочный пирог', text='с ёжевикой',
+            cooking_time=1, image='recipe/images/1.jpg'
+        )
+
+    def test_existing_recipes_indexed(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('FTS5 index is created on SQLite only.')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT rowid FROM recipe_recipe_fts '
+                'WHERE recipe_recipe_fts MATCH %s', ['"елочный" "еж"*']
+            )
+            self.assertEqual(cursor.fetchall(), [(self.recipe.id,)])
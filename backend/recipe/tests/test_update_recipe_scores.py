@@ -0,0 +1,94 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.tests.factories import create_recipe, create_user
+from foodgram.settings import CART_SCORE_WEIGHT, FAVORITE_SCORE_WEIGHT
+from recipe.models import Favorit, Recipe, ShoppingCartUser
+
+
+class UpdateRecipeScoresTest(TestCase):
+    """
+    Популярность рецептов (update_recipe_scores) и сортировка по ней
+    (?ordering=popular, ?ordering=trending).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user()
+        cls.users = [create_user() for _ in range(3)]
+        cls.old = create_recipe(author)
+        cls.cart = create_recipe(author)
+        cls.recent = create_recipe(author)
+        now = timezone.now()
+        for user in cls.users:
+            cls.add(Favorit, favoriter=user, recipe=cls.old,
+                    created=now - timedelta(days=30))
+        for user in cls.users:
+            cls.add(ShoppingCartUser, owner=user, recipe=cls.cart,
+                    created=now - timedelta(days=2))
+        cls.add(Favorit, favoriter=cls.users[0], recipe=cls.recent,
+                created=now)
+
+    @staticmethod
+    def add(model, created, **fields):
+        """ Создаёт запись с заданным временем добавления."""
+        record = model.objects.create(**fields)
+        model.objects.filter(pk=record.pk).update(created=created)
+
+    def update_scores(self, *args):
+        call_command('update_recipe_scores', *args, stdout=StringIO())
+
+    def scores(self) -> dict:
+        return dict(
+            (recipe_id, (popular, trending))
+            for recipe_id, popular, trending in Recipe.objects.values_list(
+                'id', 'popular_score', 'trending_score'
+            )
+        )
+
+    def ordering(self, value: str) -> list:
+        response = APIClient().get('/api/recipes/', {'ordering': value})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_ordering(self):
+        self.update_scores()
+        scores = self.scores()
+        self.assertEqual(scores[self.old.id][0], 3 * FAVORITE_SCORE_WEIGHT)
+        self.assertEqual(scores[self.cart.id][0], 3 * CART_SCORE_WEIGHT)
+        self.assertEqual(scores[self.recent.id][0], FAVORITE_SCORE_WEIGHT)
+        self.assertEqual(self.ordering('popular'),
+                         [self.old.id, self.cart.id, self.recent.id])
+        # Старые добавления затухают: недавние важнее большего числа.
+        self.assertEqual(self.ordering('trending'),
+                         [self.recent.id, self.cart.id, self.old.id])
+
+    def test_incremental_update(self):
+        self.update_scores()
+        scores = self.scores()
+        self.update_scores()
+        self.assertEqual(self.scores(), scores)
+        self.add(Favorit, favoriter=self.users[1], recipe=self.cart,
+                 created=timezone.now())
+        self.update_scores()
+        popular, trending = self.scores()[self.cart.id]
+        self.assertEqual(popular,
+                         3 * CART_SCORE_WEIGHT + FAVORITE_SCORE_WEIGHT)
+        self.assertGreater(trending, scores[self.cart.id][1])
+        self.assertEqual(self.ordering('trending')[0], self.cart.id)
+        self.assertEqual(self.scores()[self.old.id], scores[self.old.id])
+
+    def test_full_recalculation(self):
+        self.update_scores()
+        Favorit.objects.filter(recipe=self.old).delete()
+        self.update_scores()
+        self.assertEqual(self.scores()[self.old.id][0],
+                         3 * FAVORITE_SCORE_WEIGHT)
+        self.update_scores('--full')
+        self.assertEqual(self.scores()[self.old.id], (0, 0))
+        self.assertEqual(self.ordering('popular')[-1], self.old.id)
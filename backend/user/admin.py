@@ -6,7 +6,8 @@ from .models import Subscription, User
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
     """Настройки отображения данных таблицы User."""
-    list_display = ('id', 'first_name', 'last_name', 'email', 'username')
+    list_display = ('id', 'first_name', 'last_name', 'email', 'username',
+                    'recipes_count', 'followers_count')
     list_filter = ('email', 'username')
 
 
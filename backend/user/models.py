@@ -34,6 +34,16 @@ class User(AbstractUser):
         max_length=100,
         validators=[MinLengthValidator(8)]
     )
+    recipes_count = models.PositiveIntegerField(
+        'Рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        'Подписчиков',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ['id']
@@ -45,9 +55,13 @@ class User(AbstractUser):
 
 
 class Subscription(models.Model):
+    """ Подписка пользователя на автора.
+    Запросы по user обслуживает индекс ограничения unique_user_author,
+    по author — индекс subscription_author_user_idx."""
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='follower',
         verbose_name='Подписчик'
     )
@@ -55,6 +69,7 @@ class Subscription(models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='following',
         verbose_name='Автор'
     )
@@ -69,6 +84,14 @@ class Subscription(models.Model):
                 name='unique_user_author'
             ),
         ]
+        indexes = [
+            # Подписчики автора: id подписчиков берутся из индекса без
+            # чтения таблицы. Заменяет индекс внешнего ключа author.
+            models.Index(
+                fields=['author', 'user'],
+                name='subscription_author_user_idx'
+            ),
+        ]
 
     def clean(self):
         if self.user == self.author: